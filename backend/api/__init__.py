@@ -7,11 +7,15 @@ from .expenses import router as expenses_router
 from .incomes import router as incomes_router
 from .savings import router as savings_router
 from .stats import router as stats_router
+from .export import router as export_router
+from .imports import router as imports_router
 
 __all__ = [
     "auth_router",
     "expenses_router", 
     "incomes_router",
     "savings_router",
-    "stats_router"
+    "stats_router",
+    "export_router",
+    "imports_router"
 ]
\ No newline at end of file
@@ -1,13 +1,17 @@
 """
 API endpoints para gestión de gastos
 """
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from typing import List
+from fastapi import APIRouter, Depends, Header, HTTPException, status, Query
+from typing import List, Optional
 from odmantic import AIOEngine
 from db.database import get_database
 from services.expense_service import ExpenseService
-from models.schemas import ExpenseCreate, ExpenseUpdate, ExpenseResponse
+from services.idempotency import IDEMPOTENCY_HEADER, IdempotencyService
+from models.schemas import BulkCreate, BulkCreateResponse, ExpenseCreate, ExpenseUpdate, ExpenseResponse
 from core.security import get_current_active_user
+from core.pagination import NEXT_CURSOR_HEADER, next_cursor
+from core.fields import parse_fields
+from core.serialization import json_response
 from models.models import User
 
 # Router para endpoints de gastos
@@ -16,6 +20,7 @@ router = APIRouter(prefix="/expenses", tags=["Gastos"])
 @router.post("", response_model=ExpenseResponse, status_code=status.HTTP_201_CREATED)
 async def create_expense(
     expense_data: ExpenseCreate,
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_HEADER, max_length=255),
     current_user: User = Depends(get_current_active_user),
     db: AIOEngine = Depends(get_database)
 ):
@@ -28,25 +33,63 @@ async def create_expense(
     - **payment_type**: Tipo de pago (efectivo, tarjeta_debito, tarjeta_credito, transferencia, paypal, otro)
     - **category**: Categoría del gasto (opcional)
     - **notes**: Notas adicionales (opcional)
+    
+    Con el header `Idempotency-Key` una repetición de la misma alta (reintentos del
+    cliente) recibe la respuesta original sin crear otro gasto
+    """
+    expense_service = ExpenseService(db)
+    return await IdempotencyService(db).run(
+        idempotency_key, current_user, "expenses", expense_data,
+        lambda: expense_service.create_expense(expense_data, current_user)
+    )
+
+@router.post("/bulk", response_model=BulkCreateResponse)
+async def create_expenses_bulk(
+    bulk_data: BulkCreate,
+    current_user: User = Depends(get_current_active_user),
+    db: AIOEngine = Depends(get_database)
+):
+    """
+    Crear muchos gastos en una sola request
+    
+    - **items**: Lista de gastos con los mismos campos que `POST /expenses` (máximo configurable, 10000 por defecto)
+    - **ordered**: Si es true, la escritura se detiene en el primer error y los siguientes se omiten
+    
+    Cada elemento se valida por separado; la respuesta incluye el resultado de cada uno
+    en el orden recibido (`created`, `invalid`, `error` o `skipped`)
     """
     expense_service = ExpenseService(db)
-    return await expense_service.create_expense(expense_data, current_user)
+    return await expense_service.create_expenses_bulk(bulk_data, current_user)
 
 @router.get("", response_model=List[ExpenseResponse])
 async def get_user_expenses(
     skip: int = Query(0, ge=0, description="Número de registros a omitir"),
     limit: int = Query(100, ge=1, le=1000, description="Número máximo de registros a retornar"),
+    after: Optional[str] = Query(None, description="Cursor de la página anterior (header X-Next-Cursor)"),
+    fields: Optional[str] = Query(None, description="Campos a devolver separados por comas (id y date siempre se incluyen)"),
     current_user: User = Depends(get_current_active_user),
     db: AIOEngine = Depends(get_database)
 ):
     """
-    Obtener lista de gastos del usuario actual
+    Obtener lista de gastos del usuario actual, más recientes primero
     
+    - **after**: Cursor devuelto en el header `X-Next-Cursor` de la página anterior (paginación recomendada)
     - **skip**: Número de registros a omitir (paginación)
     - **limit**: Número máximo de registros a retornar (máximo 1000)
+    - **fields**: Campos a devolver, ej. `amount,description` (por defecto todos)
+    
+    Si hay más registros, la respuesta incluye el header `X-Next-Cursor` con el cursor de la siguiente página
     """
+    selected_fields = parse_fields(fields, ExpenseResponse)
     expense_service = ExpenseService(db)
-    return await expense_service.get_user_expenses(current_user, skip, limit)
+    expenses = await expense_service.get_user_expenses(current_user, skip, limit, after, selected_fields)
+    
+    # Serializado directo desde los documentos; response_model solo documenta el esquema
+    response = json_response(expenses)
+    cursor = next_cursor(expenses, limit)
+    if cursor:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
+    return response
 
 @router.get("/{expense_id}", response_model=ExpenseResponse)
 async def get_expense_by_id(
@@ -0,0 +1,54 @@
+"""
+API endpoints para exportar el historial del usuario
+"""
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.responses import StreamingResponse
+from typing import Optional
+from datetime import datetime
+from odmantic import AIOEngine
+from db.database import get_database
+from services.export_service import ExportService, ExportKind, ExportFormat, MEDIA_TYPES
+from core.security import get_current_active_user
+from models.models import User
+
+# Router para endpoints de exportación
+router = APIRouter(prefix="/export", tags=["Exportación"])
+
+@router.get("/{kind}")
+async def export_history(
+    kind: ExportKind,
+    format: ExportFormat = Query(ExportFormat.CSV, description="Formato de salida: csv o ndjson"),
+    start_date: Optional[datetime] = Query(None, description="Fecha inicial (inclusive)"),
+    end_date: Optional[datetime] = Query(None, description="Fecha final (inclusive)"),
+    gzip: bool = Query(False, description="Comprimir la respuesta con gzip"),
+    current_user: User = Depends(get_current_active_user),
+    db: AIOEngine = Depends(get_database)
+):
+    """
+    Exportar el historial completo de gastos, ingresos o ahorros
+
+    - **kind**: expenses, incomes o savings
+    - **format**: csv (por defecto) o ndjson (un objeto JSON por línea)
+    - **start_date** / **end_date**: Rango de fechas opcional
+    - **gzip**: Si es true, la respuesta se envía con `Content-Encoding: gzip`
+
+    Los registros se envían en orden cronológico conforme se leen de la base de datos,
+    sin cargar el historial completo en memoria
+    """
+    if start_date and end_date and start_date > end_date:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="La fecha inicial debe ser anterior a la final"
+        )
+
+    export_service = ExportService(db)
+    filename = f"{kind.value}.{format.value}"
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+
+    return StreamingResponse(
+        export_service.stream(kind, current_user, format, start_date, end_date, compress=gzip),
+        media_type=MEDIA_TYPES[format],
+        headers=headers
+    )
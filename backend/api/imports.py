@@ -0,0 +1,48 @@
+"""
+API endpoints para importar estados de cuenta bancarios
+"""
+from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File
+from fastapi.responses import StreamingResponse
+from typing import Optional
+import json
+from odmantic import AIOEngine
+from db.database import get_database
+from services.import_service import ImportService, ImportFormat
+from core.security import get_current_active_user
+from models.models import User
+
+# Router para endpoints de importación
+router = APIRouter(prefix="/import", tags=["Importación"])
+
+@router.post("")
+async def import_statement(
+    file: UploadFile = File(..., description="Estado de cuenta en CSV u OFX"),
+    format: Optional[ImportFormat] = Query(None, description="csv u ofx (por defecto según la extensión)"),
+    current_user: User = Depends(get_current_active_user),
+    db: AIOEngine = Depends(get_database)
+):
+    """
+    Importar un estado de cuenta como gastos e ingresos
+
+    - **file**: Archivo CSV (columnas fecha, descripción y monto, o cargo/abono) u OFX
+    - **format**: csv u ofx; si se omite se detecta por la extensión del archivo
+
+    Los montos negativos (cargos) se registran como gastos con categoría y tipo de pago
+    inferidos de la descripción; los positivos (abonos) como ingresos.
+
+    La respuesta es NDJSON: un evento `progress` por cada lote insertado y un evento
+    final `done` (o `error`) con los totales y los primeros errores por fila
+    """
+    import_service = ImportService(db)
+    import_format = format or import_service.detect_format(file.filename)
+    if import_format is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Formato no reconocido; usa un archivo .csv u .ofx o indica ?format="
+        )
+
+    async def events():
+        async for event in import_service.run(file, import_format, current_user):
+            yield json.dumps(event, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
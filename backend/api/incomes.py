@@ -1,13 +1,17 @@
 """
 API endpoints para gestión de ingresos
 """
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from typing import List
+from fastapi import APIRouter, Depends, Header, HTTPException, status, Query
+from typing import List, Optional
 from odmantic import AIOEngine
 from db.database import get_database
 from services.income_service import IncomeService
-from models.schemas import IncomeCreate, IncomeUpdate, IncomeResponse
+from services.idempotency import IDEMPOTENCY_HEADER, IdempotencyService
+from models.schemas import BulkCreate, BulkCreateResponse, IncomeCreate, IncomeUpdate, IncomeResponse
 from core.security import get_current_active_user
+from core.pagination import NEXT_CURSOR_HEADER, next_cursor
+from core.fields import parse_fields
+from core.serialization import json_response
 from models.models import User
 
 # Router para endpoints de ingresos
@@ -16,6 +20,7 @@ router = APIRouter(prefix="/incomes", tags=["Ingresos"])
 @router.post("", response_model=IncomeResponse, status_code=status.HTTP_201_CREATED)
 async def create_income(
     income_data: IncomeCreate,
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_HEADER, max_length=255),
     current_user: User = Depends(get_current_active_user),
     db: AIOEngine = Depends(get_database)
 ):
@@ -27,25 +32,63 @@ async def create_income(
     - **amount**: Cantidad del ingreso (debe ser positiva)
     - **source**: Fuente del ingreso (opcional)
     - **notes**: Notas adicionales (opcional)
+    
+    Con el header `Idempotency-Key` una repetición de la misma alta (reintentos del
+    cliente) recibe la respuesta original sin crear otro ingreso
+    """
+    income_service = IncomeService(db)
+    return await IdempotencyService(db).run(
+        idempotency_key, current_user, "incomes", income_data,
+        lambda: income_service.create_income(income_data, current_user)
+    )
+
+@router.post("/bulk", response_model=BulkCreateResponse)
+async def create_incomes_bulk(
+    bulk_data: BulkCreate,
+    current_user: User = Depends(get_current_active_user),
+    db: AIOEngine = Depends(get_database)
+):
+    """
+    Crear muchos ingresos en una sola request
+    
+    - **items**: Lista de ingresos con los mismos campos que `POST /incomes` (máximo configurable, 10000 por defecto)
+    - **ordered**: Si es true, la escritura se detiene en el primer error y los siguientes se omiten
+    
+    Cada elemento se valida por separado; la respuesta incluye el resultado de cada uno
+    en el orden recibido (`created`, `invalid`, `error` o `skipped`)
     """
     income_service = IncomeService(db)
-    return await income_service.create_income(income_data, current_user)
+    return await income_service.create_incomes_bulk(bulk_data, current_user)
 
 @router.get("", response_model=List[IncomeResponse])
 async def get_user_incomes(
     skip: int = Query(0, ge=0, description="Número de registros a omitir"),
     limit: int = Query(100, ge=1, le=1000, description="Número máximo de registros a retornar"),
+    after: Optional[str] = Query(None, description="Cursor de la página anterior (header X-Next-Cursor)"),
+    fields: Optional[str] = Query(None, description="Campos a devolver separados por comas (id y date siempre se incluyen)"),
     current_user: User = Depends(get_current_active_user),
     db: AIOEngine = Depends(get_database)
 ):
     """
-    Obtener lista de ingresos del usuario actual
+    Obtener lista de ingresos del usuario actual, más recientes primero
     
+    - **after**: Cursor devuelto en el header `X-Next-Cursor` de la página anterior (paginación recomendada)
     - **skip**: Número de registros a omitir (paginación)
     - **limit**: Número máximo de registros a retornar (máximo 1000)
+    - **fields**: Campos a devolver, ej. `amount,description` (por defecto todos)
+    
+    Si hay más registros, la respuesta incluye el header `X-Next-Cursor` con el cursor de la siguiente página
     """
+    selected_fields = parse_fields(fields, IncomeResponse)
     income_service = IncomeService(db)
-    return await income_service.get_user_incomes(current_user, skip, limit)
+    incomes = await income_service.get_user_incomes(current_user, skip, limit, after, selected_fields)
+    
+    # Serializado directo desde los documentos; response_model solo documenta el esquema
+    response = json_response(incomes)
+    cursor = next_cursor(incomes, limit)
+    if cursor:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
+    return response
 
 @router.get("/{income_id}", response_model=IncomeResponse)
 async def get_income_by_id(
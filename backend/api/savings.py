@@ -1,13 +1,17 @@
 """
 API endpoints para gestión de ahorros
 """
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from typing import List
+from fastapi import APIRouter, Depends, Header, HTTPException, status, Query
+from typing import List, Optional
 from odmantic import AIOEngine
 from db.database import get_database
 from services.saving_service import SavingService
-from models.schemas import SavingCreate, SavingUpdate, SavingResponse
+from services.idempotency import IDEMPOTENCY_HEADER, IdempotencyService
+from models.schemas import BulkCreate, BulkCreateResponse, SavingCreate, SavingUpdate, SavingResponse
 from core.security import get_current_active_user
+from core.pagination import NEXT_CURSOR_HEADER, next_cursor
+from core.fields import parse_fields
+from core.serialization import json_response
 from models.models import User
 
 # Router para endpoints de ahorros
@@ -16,6 +20,7 @@ router = APIRouter(prefix="/savings", tags=["Ahorros"])
 @router.post("", response_model=SavingResponse, status_code=status.HTTP_201_CREATED)
 async def create_saving(
     saving_data: SavingCreate,
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_HEADER, max_length=255),
     current_user: User = Depends(get_current_active_user),
     db: AIOEngine = Depends(get_database)
 ):
@@ -27,25 +32,63 @@ async def create_saving(
     - **purpose**: Propósito o meta del ahorro
     - **goal_amount**: Meta de ahorro total (opcional)
     - **notes**: Notas adicionales (opcional)
+    
+    Con el header `Idempotency-Key` una repetición de la misma alta (reintentos del
+    cliente) recibe la respuesta original sin crear otro ahorro
+    """
+    saving_service = SavingService(db)
+    return await IdempotencyService(db).run(
+        idempotency_key, current_user, "savings", saving_data,
+        lambda: saving_service.create_saving(saving_data, current_user)
+    )
+
+@router.post("/bulk", response_model=BulkCreateResponse)
+async def create_savings_bulk(
+    bulk_data: BulkCreate,
+    current_user: User = Depends(get_current_active_user),
+    db: AIOEngine = Depends(get_database)
+):
+    """
+    Crear muchos ahorros en una sola request
+    
+    - **items**: Lista de ahorros con los mismos campos que `POST /savings` (máximo configurable, 10000 por defecto)
+    - **ordered**: Si es true, la escritura se detiene en el primer error y los siguientes se omiten
+    
+    Cada elemento se valida por separado; la respuesta incluye el resultado de cada uno
+    en el orden recibido (`created`, `invalid`, `error` o `skipped`)
     """
     saving_service = SavingService(db)
-    return await saving_service.create_saving(saving_data, current_user)
+    return await saving_service.create_savings_bulk(bulk_data, current_user)
 
 @router.get("", response_model=List[SavingResponse])
 async def get_user_savings(
     skip: int = Query(0, ge=0, description="Número de registros a omitir"),
     limit: int = Query(100, ge=1, le=1000, description="Número máximo de registros a retornar"),
+    after: Optional[str] = Query(None, description="Cursor de la página anterior (header X-Next-Cursor)"),
+    fields: Optional[str] = Query(None, description="Campos a devolver separados por comas (id y date siempre se incluyen)"),
     current_user: User = Depends(get_current_active_user),
     db: AIOEngine = Depends(get_database)
 ):
     """
-    Obtener lista de ahorros del usuario actual
+    Obtener lista de ahorros del usuario actual, más recientes primero
     
+    - **after**: Cursor devuelto en el header `X-Next-Cursor` de la página anterior (paginación recomendada)
     - **skip**: Número de registros a omitir (paginación)
     - **limit**: Número máximo de registros a retornar (máximo 1000)
+    - **fields**: Campos a devolver, ej. `amount,description` (por defecto todos)
+    
+    Si hay más registros, la respuesta incluye el header `X-Next-Cursor` con el cursor de la siguiente página
     """
+    selected_fields = parse_fields(fields, SavingResponse)
     saving_service = SavingService(db)
-    return await saving_service.get_user_savings(current_user, skip, limit)
+    savings = await saving_service.get_user_savings(current_user, skip, limit, after, selected_fields)
+    
+    # Serializado directo desde los documentos; response_model solo documenta el esquema
+    response = json_response(savings)
+    cursor = next_cursor(savings, limit)
+    if cursor:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
+    return response
 
 @router.get("/{saving_id}", response_model=SavingResponse)
 async def get_saving_by_id(
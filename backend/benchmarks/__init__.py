@@ -0,0 +1,4 @@
+"""
+Benchmarks reproducibles del backend
+Se corren desde backend/ con `python -m benchmarks.<nombre>`
+"""
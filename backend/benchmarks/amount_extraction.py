@@ -0,0 +1,62 @@
+"""
+Benchmark del extractor de montos en texto libre
+
+Con el corpus sintético de benchmarks.message_classifier mide los mensajes por
+segundo y cuántos montos se reconocen con:
+- whole-string: el parse_amount anterior, que solo aceptaba el texto completo como número
+- find_amount: el tokenizador de mcp_utils.utils, como corre el bot
+
+Además mide find_amount sobre textos de largo creciente con el monto al final,
+para comprobar que el costo crece linealmente con el texto.
+
+Solo mide CPU.
+
+Uso (desde backend/):
+    python -m benchmarks.amount_extraction
+    python -m benchmarks.amount_extraction --messages 20000 --lengths 1000 100000
+"""
+import argparse
+import random
+from typing import Optional
+from benchmarks.common import print_table
+from benchmarks.message_classifier import corpus, throughput
+from mcp_utils.utils import find_amount
+
+FILLER = "pagué la renta del departamento y la cuenta de la luz "
+
+def whole_string_amount(text: str) -> Optional[float]:
+    """parse_amount anterior: quitar $, pesos, MXN y comas y convertir todo el texto"""
+    text = text.replace("$", "").replace("pesos", "").replace("MXN", "")
+    text = text.replace(",", "").strip()
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+def main() -> None:
+    arguments = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arguments.add_argument("--messages", type=int, default=5000)
+    arguments.add_argument("--lengths", type=int, nargs="+", default=[100, 1000, 10000])
+    arguments.add_argument("--repeat", type=int, default=5)
+    options = arguments.parse_args()
+
+    messages = corpus(options.messages, random.Random(42))
+    rows = []
+    for name, func in (("whole-string", whole_string_amount), ("find_amount", find_amount)):
+        found = sum(func(message) is not None for message in messages)
+        rate = throughput(func, messages, options.repeat)
+        rows.append((name, round(rate), 1_000_000 / rate, f"{found}/{len(messages)}"))
+    print_table(("camino", "mensajes/s", "µs/mensaje", "montos encontrados"), rows)
+    print()
+
+    rows = []
+    for length in options.lengths:
+        text = (FILLER * (length // len(FILLER) + 1))[:length] + " $1,500.50 MXN"
+        assert find_amount(text).value == 1500.50
+        rate = throughput(find_amount, [text] * 100, options.repeat)
+        microseconds = 1_000_000 / rate
+        rows.append((len(text), microseconds, microseconds / len(text) * 1000))
+    print_table(("caracteres", "µs/texto", "ns/carácter"), rows)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Utilidades compartidas por los benchmarks: base de datos, medición y tablas
+"""
+import argparse
+import statistics
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence
+from motor.motor_asyncio import AsyncIOMotorClient
+from odmantic import AIOEngine
+
+BENCH_DATABASE = "control_gastos_bench"
+
+def parser(description: str) -> argparse.ArgumentParser:
+    """Argumentos comunes: --mongo-url para medir contra un MongoDB real"""
+    arguments = argparse.ArgumentParser(description=description)
+    arguments.add_argument(
+        "--mongo-url",
+        default=None,
+        help="MongoDB real (p. ej. mongodb://localhost:27017); por defecto mongomock en memoria"
+    )
+    return arguments
+
+async def create_engine(mongo_url: Optional[str] = None) -> AIOEngine:
+    """
+    Base de datos del benchmark, vacía
+
+    Sin mongo_url se usa mongomock: sirve para comparar caminos de código del
+    backend, pero las consultas corren en Python y no reflejan la latencia de MongoDB
+    """
+    if mongo_url:
+        client = AsyncIOMotorClient(mongo_url)
+        await client.drop_database(BENCH_DATABASE)
+    else:
+        from mongomock_motor import AsyncMongoMockClient
+        client = AsyncMongoMockClient()
+    return AIOEngine(client=client, database=BENCH_DATABASE)
+
+async def measure(func: Callable[[], Awaitable[object]], repeat: int) -> List[float]:
+    """Tiempos en milisegundos de `repeat` llamadas consecutivas"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        await func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+def measure_sync(func: Callable[[], object], repeat: int) -> List[float]:
+    """Versión síncrona de measure"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+def percentile(samples: Sequence[float], fraction: float) -> float:
+    """Percentil por rango más cercano"""
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def summarize(samples: Sequence[float]) -> Dict[str, float]:
+    """Mediana, p99 y media en milisegundos"""
+    return {
+        "p50_ms": statistics.median(samples),
+        "p99_ms": percentile(samples, 0.99),
+        "mean_ms": statistics.fmean(samples)
+    }
+
+def print_table(headers: Sequence[str], rows: Sequence[Sequence[object]]) -> None:
+    """Imprimir una tabla alineada; los float se muestran con 3 decimales"""
+    cells = [[f"{value:.3f}" if isinstance(value, float) else str(value) for value in row] for row in rows]
+    widths = [max(len(str(header)), *(len(row[i]) for row in cells)) for i, header in enumerate(headers)]
+    print("  ".join(str(header).rjust(width) for header, width in zip(headers, widths)))
+    for row in cells:
+        print("  ".join(cell.rjust(width) for cell, width in zip(row, widths)))
@@ -0,0 +1,71 @@
+"""
+Benchmark de la serialización de una página de gastos
+
+Convierte N documentos crudos de Motor en el JSON de la respuesta por dos caminos:
+- pydantic: el anterior, Expense.model_validate_doc + ExpenseResponse por fila y
+  la validación de response_model de FastAPI antes de generar el JSON
+- encoder: SchemaEncoder (el de expense_service) + orjson, como corre la API
+
+Solo mide CPU: no usa base de datos.
+
+Uso (desde backend/):
+    python -m benchmarks.list_serialization
+    python -m benchmarks.list_serialization --rows 100 1000 --repeat 50
+"""
+import argparse
+import random
+from typing import List
+import orjson
+from odmantic import ObjectId
+from pydantic import TypeAdapter
+from benchmarks.common import measure_sync, print_table, summarize
+from benchmarks.stats_summary import documents
+from models.models import Expense
+from models.schemas import ExpenseResponse
+from services.expense_service import RESPONSE_ENCODER
+
+RESPONSE_ADAPTER = TypeAdapter(List[ExpenseResponse])
+
+def pydantic_page(rows: list) -> bytes:
+    """Camino anterior: modelo ODMantic, esquema de respuesta y response_model"""
+    responses = []
+    for document in rows:
+        expense = Expense.model_validate_doc(document)
+        responses.append(ExpenseResponse(
+            id=str(expense.id),
+            user_id=str(expense.user_id),
+            date=expense.date,
+            description=expense.description,
+            amount=expense.amount,
+            payment_type=expense.payment_type,
+            category=expense.category,
+            notes=expense.notes,
+            created_at=expense.created_at,
+            updated_at=expense.updated_at
+        ))
+    return RESPONSE_ADAPTER.dump_json(RESPONSE_ADAPTER.validate_python(responses))
+
+def encoder_page(rows: list) -> bytes:
+    """Camino actual: documento crudo → dict → orjson"""
+    return orjson.dumps(RESPONSE_ENCODER.rows(rows))
+
+def main() -> None:
+    arguments = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arguments.add_argument("--rows", type=int, nargs="+", default=[100, 1000])
+    arguments.add_argument("--repeat", type=int, default=30)
+    options = arguments.parse_args()
+
+    rng = random.Random(42)
+    table = []
+    for size in options.rows:
+        rows = documents(ObjectId(), size, rng)[Expense]
+        # Los dos caminos deben producir el mismo JSON
+        assert orjson.loads(pydantic_page(rows)) == orjson.loads(encoder_page(rows))
+        for name, func in (("pydantic", pydantic_page), ("encoder", encoder_page)):
+            result = summarize(measure_sync(lambda: func(rows), options.repeat))
+            table.append((size, name, result["p50_ms"], result["p99_ms"]))
+
+    print_table(("filas", "camino", "p50 ms", "p99 ms"), table)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Benchmark de lecturas de /expenses durante una ráfaga de logins
+
+Un cliente lee GET /expenses en serie durante unos segundos mientras otros hacen
+POST /auth/login sin pausa; se reporta la latencia de las lecturas (p50/p99) en tres escenarios:
+- idle: sin logins
+- inline: logins con scrypt en el event loop (como antes del pool de hash)
+- pool: logins con el pool de hash (PasswordHasher), como corre la API
+
+Uso (desde backend/):
+    python -m benchmarks.login_storm
+    python -m benchmarks.login_storm --seconds 10 --logins 16
+"""
+import asyncio
+from datetime import datetime
+import httpx
+from fastapi import FastAPI
+from odmantic import ObjectId
+from api.auth import router as auth_router
+from api.expenses import router as expenses_router
+from benchmarks.common import create_engine, parser, print_table, summarize
+from core.security import SecurityUtils, password_hasher, pwd_context
+from db.database import get_database
+from models.models import Expense, User
+
+EMAIL = "bench@example.com"
+PASSWORD = "secreta123"
+
+async def verify_password_inline(plain_password: str, hashed_password: str) -> bool:
+    """Verificación síncrona en el event loop, como antes del pool"""
+    return pwd_context.verify(plain_password, hashed_password)
+
+async def storm(client: httpx.AsyncClient, stop: asyncio.Event) -> int:
+    """Un cliente que inicia sesión sin pausa hasta que terminen las lecturas"""
+    count = 0
+    while not stop.is_set():
+        response = await client.post("/auth/login", json={"email": EMAIL, "password": PASSWORD})
+        response.raise_for_status()
+        count += 1
+    return count
+
+async def scenario(app: FastAPI, token: str, seconds: float, logins: int) -> tuple:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        headers = {"Authorization": f"Bearer {token}"}
+        stop = asyncio.Event()
+        stormers = [asyncio.create_task(storm(client, stop)) for _ in range(logins)]
+        await asyncio.sleep(0.1)  # Dejar que la ráfaga arranque
+
+        samples = []
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + seconds
+        while loop.time() < deadline:
+            start = loop.time()
+            response = await client.get("/expenses", headers=headers)
+            response.raise_for_status()
+            samples.append((loop.time() - start) * 1000)
+
+        stop.set()
+        completed = sum(await asyncio.gather(*stormers))
+    return samples, completed
+
+async def run(seconds: float, logins: int, mongo_url: str) -> None:
+    db = await create_engine(mongo_url)
+    user = User(email=EMAIL, username="bench", full_name="Bench", hashed_password=pwd_context.hash(PASSWORD))
+    await db.get_collection(User).insert_one(user.model_dump_doc())  # mongomock no admite sesiones
+    moment = datetime(2026, 1, 5)
+    await db.get_collection(Expense).insert_many([
+        {
+            "_id": ObjectId(), "user_id": user.id, "date": moment, "description": "Gasto",
+            "amount": 10.0 + i, "payment_type": "efectivo", "category": "Comida", "notes": None,
+            "created_at": moment, "updated_at": moment
+        }
+        for i in range(50)
+    ])
+
+    app = FastAPI()
+    app.include_router(auth_router)
+    app.include_router(expenses_router)
+    app.dependency_overrides[get_database] = lambda: db
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        response = await client.post("/auth/login", json={"email": EMAIL, "password": PASSWORD})
+        token = response.json()["access_token"]
+
+    pooled = SecurityUtils.verify_password_async
+    rows = []
+    for name, verify, storm_size in (
+        ("idle", pooled, 0),
+        ("inline", verify_password_inline, logins),
+        ("pool", pooled, logins),
+    ):
+        SecurityUtils.verify_password_async = staticmethod(verify)
+        try:
+            samples, completed = await scenario(app, token, seconds, storm_size)
+        finally:
+            SecurityUtils.verify_password_async = pooled
+        result = summarize(samples)
+        rows.append((name, storm_size, completed, len(samples), result["p50_ms"], result["p99_ms"]))
+
+    print_table(("escenario", "clientes login", "logins", "lecturas", "lectura p50 ms", "lectura p99 ms"), rows)
+    print(f"pool de hash: {password_hasher.stats()}")
+    password_hasher.shutdown()
+
+def main() -> None:
+    arguments = parser(__doc__.strip().splitlines()[0])
+    arguments.add_argument("--seconds", type=float, default=5, help="Duración de las lecturas por escenario")
+    arguments.add_argument("--logins", type=int, default=8, help="Clientes haciendo login en paralelo")
+    options = arguments.parse_args()
+    asyncio.run(run(options.seconds, options.logins, options.mongo_url))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark del clasificador de mensajes de Telegram/MCP
+
+Clasifica un corpus sintético de mensajes (intención, categoría, tipo de pago,
+tipo de ahorro y recurrencia) por dos caminos y verifica que coincidan:
+- scan: el anterior, `any(palabra in texto ...)` sobre las listas de palabras clave
+- matcher: la regex compilada de mcp_utils.utils (KeywordMatcher)
+Además mide classify_message completo (palabras clave y monto en una pasada).
+
+Solo mide CPU.
+
+Uso (desde backend/):
+    python -m benchmarks.message_classifier
+    python -m benchmarks.message_classifier --messages 20000
+"""
+import argparse
+import random
+import time
+from typing import Dict, List
+from benchmarks.common import print_table
+from mcp_utils.utils import _KEYWORDS, _MATCHER, classify_message
+
+VERBS = ["Gasté", "Compré", "Pagué", "Recibí", "Cobré", "Deposita", "Retiro", "Ahorro", "Quiero ver", ""]
+OBJECTS = [
+    "en gasolina", "en el super", "de comida", "el uber", "en la farmacia", "de internet",
+    "un libro", "zapatos", "muebles nuevos", "mi sueldo", "salario mensual", "para emergencia",
+    "boletos de cine", "la consulta del médico", "mi balance", "mis gastos", "algo"
+]
+PAYMENTS = ["con tarjeta de crédito", "con débito", "en efectivo", "por transferencia", "con paypal", ""]
+AMOUNTS = ["$200", "1,500.50", "1.500,50 MXN", "2k", "3 mil pesos", "USD 40", "350", ""]
+
+def corpus(size: int, rng: random.Random) -> List[str]:
+    """Mensajes combinando verbos, objetos, montos y formas de pago"""
+    return [
+        " ".join(part for part in (
+            rng.choice(VERBS), rng.choice(AMOUNTS), rng.choice(OBJECTS), rng.choice(PAYMENTS)
+        ) if part)
+        for _ in range(size)
+    ]
+
+def scan(text: str) -> Dict[str, str]:
+    """Clasificación anterior: una búsqueda de subcadena por palabra y etiqueta"""
+    text_lower = text.lower()
+    found = {}
+    for dimension, labels in _KEYWORDS.items():
+        for label, keywords in labels:
+            if any(keyword in text_lower for keyword in keywords):
+                found[dimension] = label
+                break
+    return found
+
+def throughput(func, messages: List[str], repeat: int) -> float:
+    """Mensajes por segundo (mejor de `repeat` pasadas sobre el corpus)"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for message in messages:
+            func(message)
+        best = min(best, time.perf_counter() - start)
+    return len(messages) / best
+
+def main() -> None:
+    arguments = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arguments.add_argument("--messages", type=int, default=5000)
+    arguments.add_argument("--repeat", type=int, default=5)
+    options = arguments.parse_args()
+
+    messages = corpus(options.messages, random.Random(42))
+    mismatches = sum(scan(message) != _MATCHER.match(message) for message in messages)
+
+    rows = []
+    for name, func in (("scan", scan), ("matcher", _MATCHER.match), ("classify_message", classify_message)):
+        rate = throughput(func, messages, options.repeat)
+        rows.append((name, round(rate), 1_000_000 / rate))
+
+    print_table(("camino", "mensajes/s", "µs/mensaje"), rows)
+    print(f"{len(messages)} mensajes, {mismatches} clasificaciones distintas entre scan y matcher")
+
+if __name__ == "__main__":
+    main()
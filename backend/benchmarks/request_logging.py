@@ -0,0 +1,129 @@
+"""
+Benchmark del costo por request del middleware de logging
+
+Sirve GET /ping en una app mínima y mide la latencia media por request con:
+- none: sin middleware de logging
+- passthrough: un middleware http que solo llama a call_next (costo del middleware en sí)
+- sync: el middleware anterior (dos líneas con la URL completa) con un
+  FileHandler síncrono en el event loop
+- queue: main.log_requests con la cola y el hilo escritor (JSON, archivo rotativo)
+- queue-sampled: igual, registrando solo una fracción de las requests exitosas
+
+Los archivos se escriben en un directorio temporal; la consola queda fuera de
+todos los escenarios para no mezclarla con la salida del benchmark. El hilo
+escritor comparte el GIL con el event loop: con un disco rápido el formateo JSON
+en ese hilo también cuenta; la cola gana cuando la escritura a disco se demora.
+
+Uso (desde backend/):
+    python -m benchmarks.request_logging
+    python -m benchmarks.request_logging --requests 20000 --sample-rate 0.05
+"""
+import argparse
+import asyncio
+import logging
+import logging.handlers
+import os
+import queue
+import tempfile
+import time
+import httpx
+from fastapi import FastAPI, Request
+from benchmarks.common import print_table
+
+LOG_DIR = tempfile.mkdtemp(prefix="bench-logging-")
+# Antes de importar main: su setup_logging no debe escribir app.log en backend/
+os.environ["LOG_FILE"] = os.path.join(LOG_DIR, "main.log")
+
+from core.config import settings  # noqa: E402
+from core.logging_config import DeferredQueueHandler, JSONFormatter  # noqa: E402
+import main as app_main  # noqa: E402
+
+logger = logging.getLogger("benchmarks.request_logging")
+
+async def log_requests_sync(request: Request, call_next):
+    """Middleware de logging anterior a la cola"""
+    start_time = time.perf_counter()
+    logger.info(f"🔄 {request.method} {request.url}")
+    response = await call_next(request)
+    process_time_ms = round((time.perf_counter() - start_time) * 1000, 2)
+    logger.info(f"✅ {request.method} {request.url} - {response.status_code} - {process_time_ms}ms")
+    return response
+
+async def passthrough(request: Request, call_next):
+    return await call_next(request)
+
+def build_app(middleware) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    if middleware is not None:
+        app.middleware("http")(middleware)
+    return app
+
+def configure_sync() -> None:
+    handler = logging.FileHandler(os.path.join(LOG_DIR, "sync.log"))
+    handler.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+    logging.getLogger().handlers = [handler]
+
+def configure_queue() -> logging.handlers.QueueListener:
+    handler = logging.handlers.RotatingFileHandler(
+        os.path.join(LOG_DIR, "queue.log"),
+        maxBytes=settings.log_max_bytes,
+        backupCount=settings.log_backup_count,
+        encoding="utf-8"
+    )
+    handler.setFormatter(JSONFormatter())
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, handler)
+    logging.getLogger().handlers = [DeferredQueueHandler(log_queue)]
+    listener.start()
+    return listener
+
+async def per_request_us(app: FastAPI, requests: int) -> float:
+    """Latencia media por request en microsegundos"""
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for _ in range(min(requests // 10, 200)):  # Calentamiento
+            await client.get("/ping?user=bench&page=1")
+        start = time.perf_counter()
+        for _ in range(requests):
+            await client.get("/ping?user=bench&page=1")
+        return (time.perf_counter() - start) / requests * 1_000_000
+
+async def run(requests: int, sample_rate: float) -> None:
+    app_main.log_listener.stop()
+    logging.getLogger().setLevel(logging.INFO)
+
+    rows = []
+    baseline = None
+    for name, middleware, configure, rate in (
+        ("none", None, configure_sync, 1.0),
+        ("passthrough", passthrough, configure_sync, 1.0),
+        ("sync", log_requests_sync, configure_sync, 1.0),
+        ("queue", app_main.log_requests, configure_queue, 1.0),
+        ("queue-sampled", app_main.log_requests, configure_queue, sample_rate),
+    ):
+        listener = configure()
+        settings.log_success_sample_rate = rate
+        try:
+            elapsed = await per_request_us(build_app(middleware), requests)
+        finally:
+            if listener is not None:
+                listener.stop()
+        baseline = elapsed if baseline is None else baseline
+        rows.append((name, rate, elapsed, elapsed - baseline))
+
+    print_table(("escenario", "muestreo", "µs/request", "sobrecosto µs"), rows)
+    print(f"logs en {LOG_DIR}")
+
+def main() -> None:
+    arguments = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arguments.add_argument("--requests", type=int, default=5000)
+    arguments.add_argument("--sample-rate", type=float, default=0.1, help="Muestreo del escenario queue-sampled")
+    options = arguments.parse_args()
+    asyncio.run(run(options.requests, options.sample_rate))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Benchmark de las consultas de estadísticas en serie vs en paralelo
+
+Mide StatsService.get_monthly_report y compute_rollup (la reconstrucción del
+acumulado que respalda /stats/summary) con las consultas de cada colección:
+- sequential: una tras otra, como antes
+- concurrent: en paralelo con StatsService._fan_out, como corre la API
+
+mongomock responde sin red, así que cada consulta espera además --rtt-ms
+(5 ms por defecto) para simular el viaje de ida y vuelta a MongoDB. Con
+--mongo-url se usa la latencia real y --rtt-ms vale 0 por defecto.
+
+Uso (desde backend/):
+    python -m benchmarks.stats_fan_out
+    python -m benchmarks.stats_fan_out --rtt-ms 10 --records 1000
+"""
+import asyncio
+import random
+from typing import Any, Awaitable, Dict, List, Tuple
+from benchmarks.common import create_engine, measure, parser, print_table, summarize
+from benchmarks.stats_summary import documents
+from models.models import User
+from services.stats_service import StatsService
+
+class RoundTripStatsService(StatsService):
+    """StatsService con un retardo por consulta y fan-out en serie o en paralelo"""
+
+    def __init__(self, db, round_trip: float, concurrent: bool):
+        super().__init__(db)
+        self.round_trip = round_trip
+        self.concurrent = concurrent
+
+    async def _delayed(self, query: Awaitable[Any]) -> Any:
+        await asyncio.sleep(self.round_trip)
+        return await query
+
+    async def _fan_out(self, queries: Dict[str, Awaitable[Any]]) -> Tuple[Dict[str, Any], List[str]]:
+        delayed = {name: self._delayed(query) for name, query in queries.items()}
+        if self.concurrent:
+            return await super()._fan_out(delayed)
+        return {name: await query for name, query in delayed.items()}, []
+
+async def run(records: int, repeat: int, rtt_ms: float, mongo_url: str) -> None:
+    db = await create_engine(mongo_url)
+    user = User(email="bench@example.com", username="bench", full_name="Bench", hashed_password="x")
+    for model, docs in documents(user.id, records, random.Random(42)).items():
+        await db.get_collection(model).insert_many(docs)
+
+    rows = []
+    for concurrent in (False, True):
+        stats = RoundTripStatsService(db, rtt_ms / 1000, concurrent)
+        mode = "concurrent" if concurrent else "sequential"
+        for name, func in (
+            ("monthly_report", lambda: stats.get_monthly_report(user, 2024, 6, limit=50)),
+            ("compute_rollup", lambda: stats.compute_rollup(user.id)),
+        ):
+            result = summarize(await measure(func, repeat))
+            rows.append((name, mode, result["p50_ms"], result["p99_ms"]))
+
+    print_table(("consulta", "modo", "p50 ms", "p99 ms"), rows)
+
+def main() -> None:
+    arguments = parser(__doc__.strip().splitlines()[0])
+    arguments.add_argument("--records", type=int, default=60, help="Registros por colección (un año)")
+    arguments.add_argument("--repeat", type=int, default=20)
+    arguments.add_argument("--rtt-ms", type=float, default=None, help="Retardo simulado por consulta")
+    options = arguments.parse_args()
+    rtt_ms = options.rtt_ms if options.rtt_ms is not None else (0 if options.mongo_url else 5)
+    asyncio.run(run(options.records, options.repeat, rtt_ms, options.mongo_url))
+
+if __name__ == "__main__":
+    main()
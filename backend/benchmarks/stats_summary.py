@@ -0,0 +1,107 @@
+"""
+Benchmark de /stats/summary según la cantidad de registros del usuario
+
+Compara tres caminos:
+- python: el cálculo anterior, cargar todos los documentos con db.find y sumar en Python
+- aggregation: los pipelines de StatsService.compute_rollup (las sumas en MongoDB)
+- rollup: StatsService.get_financial_summary, que lee el acumulado ya construido
+
+Uso (desde backend/):
+    python -m benchmarks.stats_summary
+    python -m benchmarks.stats_summary --sizes 1000 50000 --mongo-url mongodb://localhost:27017
+
+Con mongomock los pipelines también corren en Python; para ver la latencia del
+pipeline plana frente al número de registros usar --mongo-url con un MongoDB real.
+"""
+import asyncio
+import random
+from datetime import datetime, timedelta
+from odmantic import AIOEngine, ObjectId
+from benchmarks.common import create_engine, measure, parser, print_table, summarize
+from models.models import Expense, Income, PaymentType, Saving, SavingType, User
+from services.stats_service import StatsService
+
+CATEGORIES = ["Comida", "Transporte", "Servicios", "Entretenimiento", None]
+
+def documents(user_id: ObjectId, count: int, rng: random.Random) -> dict:
+    """Gastos, ingresos y ahorros sintéticos (count de cada uno)"""
+    start = datetime(2024, 1, 1)
+    def base() -> dict:
+        moment = start + timedelta(minutes=rng.randrange(60 * 24 * 365))
+        return {
+            "_id": ObjectId(),
+            "user_id": user_id,
+            "date": moment,
+            "amount": round(rng.uniform(1, 5000), 2),
+            "notes": None,
+            "created_at": moment,
+            "updated_at": moment
+        }
+    return {
+        Expense: [
+            {**base(), "description": "Gasto", "payment_type": rng.choice(list(PaymentType)).value, "category": rng.choice(CATEGORIES)}
+            for _ in range(count)
+        ],
+        Income: [
+            {**base(), "description": "Ingreso", "source": "Sueldo", "is_recurring": False}
+            for _ in range(count)
+        ],
+        Saving: [
+            {**base(), "purpose": "Meta", "transaction_type": rng.choice(list(SavingType)).value, "goal_amount": None}
+            for _ in range(count)
+        ]
+    }
+
+async def python_summary(db: AIOEngine, user_id: ObjectId) -> dict:
+    """Resumen como se calculaba antes de las agregaciones"""
+    expenses = await db.find(Expense, Expense.user_id == user_id)
+    incomes = await db.find(Income, Income.user_id == user_id)
+    savings = await db.find(Saving, Saving.user_id == user_id)
+    by_category: dict = {}
+    by_payment_type: dict = {}
+    for expense in expenses:
+        category = expense.category or "Sin categoría"
+        by_category[category] = by_category.get(category, 0) + expense.amount
+        by_payment_type[expense.payment_type.value] = by_payment_type.get(expense.payment_type.value, 0) + expense.amount
+    return {
+        "total_expenses": sum(expense.amount for expense in expenses),
+        "total_incomes": sum(income.amount for income in incomes),
+        "total_savings": sum(
+            saving.amount if saving.transaction_type == SavingType.DEPOSITO else -saving.amount
+            for saving in savings
+        ),
+        "expenses_by_category": by_category,
+        "expenses_by_payment_type": by_payment_type
+    }
+
+async def run(sizes: list, repeat: int, mongo_url: str) -> None:
+    rng = random.Random(42)
+    rows = []
+    for size in sizes:
+        db = await create_engine(mongo_url)
+        user = User(email="bench@example.com", username="bench", full_name="Bench", hashed_password="x")
+        for model, docs in documents(user.id, size, rng).items():
+            await db.get_collection(model).insert_many(docs)
+
+        stats = StatsService(db)
+        await stats.rebuild_rollup(user.id)
+        for name, func in (
+            ("python", lambda: python_summary(db, user.id)),
+            ("aggregation", lambda: stats.compute_rollup(user.id)),
+            ("rollup", lambda: stats.get_financial_summary(user)),
+        ):
+            result = summarize(await measure(func, repeat))
+            rows.append((size, name, result["p50_ms"], result["p99_ms"]))
+        db.client.close()
+
+    print_table(("registros/colección", "camino", "p50 ms", "p99 ms"), rows)
+
+def main() -> None:
+    arguments = parser(__doc__.strip().splitlines()[0])
+    arguments.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000])
+    arguments.add_argument("--repeat", type=int, default=3)
+    options = arguments.parse_args()
+    asyncio.run(run(options.sizes, options.repeat, options.mongo_url))
+
+if __name__ == "__main__":
+    main()
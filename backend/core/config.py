@@ -22,11 +22,45 @@ class Settings(BaseSettings):
     # Configuración de MongoDB
     mongodb_url: str = "mongodb://localhost:27017"
     database_name: str = "control_gastos"
+    create_indexes_on_startup: bool = True  # Desactivar en workers que no deben tocar índices
     
     # Configuración de seguridad
     secret_key: str = "tu_clave_secreta_super_segura_cambiala_en_produccion"
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
+    password_hash_workers: int = 4  # Hilos máximos para hash/verificación de contraseñas
+    
+    # Estadísticas
+    stats_query_timeout_seconds: float = 5.0  # Tiempo límite de cada consulta en paralelo
+    rollup_pending_lease_seconds: int = 30  # Tras este tiempo una escritura pendiente en acumulados se da por abandonada
+    
+    # Altas masivas (POST /bulk)
+    bulk_max_items: int = 10000
+    
+    # Exportación (GET /export)
+    export_batch_size: int = 500  # Documentos por lote leídos del cursor
+    
+    # Importación de estados de cuenta (POST /import)
+    import_batch_size: int = 1000  # Documentos por insert_many
+    
+    # Claves de idempotencia (header Idempotency-Key en las altas)
+    idempotency_store: str = "mongo"  # mongo (compartido entre procesos) o memory (un solo proceso)
+    idempotency_ttl_seconds: int = 86400  # Tiempo que se guarda la respuesta de una clave
+    idempotency_lock_seconds: int = 60  # Tras este tiempo una clave en proceso se puede retomar
+    idempotency_cache_size: int = 10000  # Claves máximas en modo memory
+    
+    # Caché de usuarios autenticados
+    user_cache_size: int = 10000
+    user_cache_ttl_seconds: int = 60
+    
+    # Configuración de logging
+    log_level: str = "INFO"
+    log_format: str = "json"  # "json" o "text"
+    log_file: str = "app.log"
+    log_max_bytes: int = 10 * 1024 * 1024  # Rotar al llegar a 10 MB
+    log_backup_count: int = 5
+    log_success_sample_rate: float = 1.0  # Fracción de requests exitosas que se registran
+    log_slow_request_ms: float = 1000  # Las requests más lentas se registran siempre
     
     # Configuración de CORS - se parseará desde string separado por comas
     allowed_origins: str = "http://localhost:3000,http://localhost:5173,http://127.0.0.1:3000,http://127.0.0.1:5173"
@@ -0,0 +1,54 @@
+"""
+Selección de campos (fields=) para los listados
+Los campos pedidos se envían a MongoDB como proyección y los documentos se
+devuelven como diccionarios (ver core.serialization), sin construir modelos
+ODMantic ni de respuesta
+"""
+from typing import Any, Dict, List, Optional, Type
+from fastapi import HTTPException, status
+from odmantic import AIOEngine, query
+from pydantic import BaseModel
+from core.serialization import SchemaEncoder
+
+# Campos que siempre se devuelven: identifican el registro y forman el cursor de paginación
+ALWAYS_INCLUDED = ("id", "date")
+
+def parse_fields(fields: Optional[str], schema: Type[BaseModel]) -> Optional[List[str]]:
+    """
+    Convertir el parámetro fields=a,b,c en la lista de campos a devolver
+
+    Solo se aceptan campos del esquema de respuesta; retorna None si no se pidió selección
+    """
+    if not fields:
+        return None
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = set(requested) - set(schema.model_fields)
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Campos no válidos: {', '.join(sorted(unknown))}"
+        )
+    return list(dict.fromkeys([*ALWAYS_INCLUDED, *requested]))
+
+async def find_projected(
+    engine: AIOEngine,
+    model: Any,
+    *queries: Any,
+    encoder: SchemaEncoder,
+    fields: Optional[List[str]] = None,
+    sort: tuple = (),
+    skip: int = 0,
+    limit: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """
+    Equivalente a engine.find que trae solo los campos del esquema (o los pedidos)
+    y retorna diccionarios listos para serializar
+    """
+    cursor = engine.get_collection(model).find(
+        query.and_(*queries) if len(queries) > 1 else (queries[0] if queries else {}),
+        encoder.projection(fields),
+        sort=[item for expression in sort for item in expression.items()] or None,
+        skip=skip,
+        limit=limit or 0
+    )
+    return [encoder.row(document, fields) async for document in cursor]
@@ -0,0 +1,85 @@
+"""
+Configuración de logging no bloqueante
+Los handlers que escriben a disco y consola corren en un hilo aparte (QueueListener);
+el event loop solo encola el registro mediante un QueueHandler
+"""
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+from datetime import datetime, timezone
+from core.config import settings
+
+# Atributos estándar de LogRecord que no se copian como campos extra
+_RESERVED_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+class JSONFormatter(logging.Formatter):
+    """
+    Formatea cada registro como una línea JSON
+    Los campos pasados con `extra=` se incluyen como llaves de primer nivel
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler que deja todo el formato al hilo escritor
+
+    El QueueHandler estándar formatea el registro al encolarlo, mete la traza en
+    el mensaje y borra exc_info (así JSONFormatter no llenaba `exception`). Aquí
+    solo se resuelven los argumentos del mensaje, sobre una copia del registro;
+    exc_info y los campos de `extra=` llegan intactos al hilo escritor.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+def setup_logging() -> logging.handlers.QueueListener:
+    """
+    Configurar el logging raíz con una cola y un hilo escritor
+
+    Retorna el QueueListener para detenerlo (y vaciar la cola) al cerrar la aplicación
+    """
+    if settings.log_format == "json":
+        formatter = JSONFormatter()
+    else:
+        formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    file_handler = logging.handlers.RotatingFileHandler(
+        settings.log_file,
+        maxBytes=settings.log_max_bytes,
+        backupCount=settings.log_backup_count,
+        encoding="utf-8"
+    )
+    for handler in (stream_handler, file_handler):
+        handler.setFormatter(formatter)
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(
+        log_queue, stream_handler, file_handler, respect_handler_level=True
+    )
+
+    root = logging.getLogger()
+    root.handlers = [DeferredQueueHandler(log_queue)]
+    root.setLevel(settings.log_level.upper())
+
+    listener.start()
+    return listener
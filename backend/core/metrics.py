@@ -0,0 +1,224 @@
+"""
+Métricas en proceso con formato de exposición de Prometheus
+Contadores, gauges e histogramas mínimos, sin dependencias ni colector externo;
+se publican en el endpoint /metrics
+"""
+import asyncio
+import functools
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# Límites por defecto de los histogramas de latencia (segundos)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _escape(value: Any) -> str:
+    """Escapar el valor de una etiqueta"""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    """Formatear etiquetas como {a="x",b="y"}"""
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class _Metric(ABC):
+    """Base de las métricas: nombre, ayuda y nombres de etiquetas"""
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}"
+        ]
+
+    @abstractmethod
+    def render(self) -> List[str]:
+        """Líneas de exposición de la métrica (encabezado incluido)"""
+
+class Counter(_Metric):
+    """Contador monotónico"""
+    type_name = "counter"
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for key, value in self._values.items():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+class Gauge(_Metric):
+    """
+    Valor que sube y baja
+    Con `callback` el valor se obtiene al momento de exponer las métricas
+    """
+    type_name = "gauge"
+
+    def __init__(self, *args: Any, callback: Optional[Callable[[], Dict[Tuple[str, ...], float]]] = None, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._callback = callback
+
+    def set(self, value: float, **labels: Any) -> None:
+        self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: Any) -> None:
+        self.inc(-amount, **labels)
+
+    def render(self) -> List[str]:
+        values = self._callback() if self._callback else self._values
+        lines = self.header()
+        for key, value in values.items():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+class Histogram(_Metric):
+    """Histograma acumulativo con suma y conteo"""
+    type_name = "histogram"
+
+    def __init__(self, *args: Any, buckets: Tuple[float, ...] = DEFAULT_BUCKETS, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        # Por combinación de etiquetas: [conteos por bucket..., +Inf], suma
+        self._values: Dict[Tuple[str, ...], List[Any]] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        entry = self._values.get(key)
+        if entry is None:
+            entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+        counts = entry[0]
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[index] += 1
+                break
+        else:
+            counts[-1] += 1
+        entry[1] += value
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for key, (counts, total) in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                bucket_labels = _format_labels(self.labelnames, key, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+class Registry:
+    """Conjunto de métricas que se exponen juntas"""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+# Registro global
+registry = Registry()
+
+# === MÉTRICAS HTTP ===
+
+http_requests_total = registry.register(Counter(
+    "http_requests_total", "Total de requests HTTP", ("method", "route", "status")
+))
+http_request_duration_seconds = registry.register(Histogram(
+    "http_request_duration_seconds", "Latencia de requests HTTP en segundos", ("method", "route")
+))
+http_requests_in_flight = registry.register(Gauge(
+    "http_requests_in_flight", "Requests HTTP en proceso"
+))
+
+# === MÉTRICAS DE BASE DE DATOS ===
+
+db_operations_total = registry.register(Counter(
+    "db_operations_total", "Operaciones de MongoDB por método de servicio", ("operation", "status")
+))
+db_operation_duration_seconds = registry.register(Histogram(
+    "db_operation_duration_seconds", "Duración de operaciones de MongoDB por método de servicio", ("operation",)
+))
+
+# === MÉTRICAS DEL EVENT LOOP ===
+
+event_loop_lag_seconds = registry.register(Gauge(
+    "event_loop_lag_seconds", "Último retraso medido del event loop en segundos"
+))
+event_loop_lag_histogram = registry.register(Histogram(
+    "event_loop_lag_histogram_seconds", "Distribución del retraso del event loop en segundos",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+))
+
+def route_template(scope: Dict[str, Any]) -> str:
+    """
+    Ruta plantilla de la request (p. ej. /api/v1/expenses/{expense_id})
+    Se usa en lugar de la URL para no crear una serie por cada id
+    """
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+def track_db_operation(func: Callable) -> Callable:
+    """
+    Decorador para métodos async de servicios: cuenta y mide sus operaciones
+    de base de datos bajo el nombre Clase.método
+    """
+    operation = func.__qualname__
+
+    @functools.wraps(func)
+    async def wrapper(*args: Any, **kwargs: Any) -> Any:
+        start = time.perf_counter()
+        status = "ok"
+        try:
+            return await func(*args, **kwargs)
+        except Exception:
+            status = "error"
+            raise
+        finally:
+            db_operation_duration_seconds.observe(time.perf_counter() - start, operation=operation)
+            db_operations_total.inc(operation=operation, status=status)
+
+    return wrapper
+
+async def monitor_event_loop_lag(interval: float = 0.5) -> None:
+    """
+    Medir periódicamente cuánto tarda el event loop en retomar una tarea dormida
+    Se ejecuta como tarea en segundo plano durante la vida de la aplicación
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        lag = max(loop.time() - start - interval, 0.0)
+        event_loop_lag_seconds.set(lag)
+        event_loop_lag_histogram.observe(lag)
@@ -0,0 +1,69 @@
+"""
+Paginación por cursor (keyset) para los listados
+El cursor codifica la fecha y el id del último registro de la página, de modo que
+la siguiente página se obtiene con un rango sobre el índice (user_id, date, _id)
+y cuesta lo mismo sin importar qué tan profunda sea
+"""
+import base64
+import binascii
+from datetime import datetime
+from typing import Any, Optional, Tuple
+from fastapi import HTTPException, status
+from odmantic import ObjectId, query
+from bson.errors import InvalidId
+
+# Header con el cursor de la siguiente página
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(date: datetime, object_id: Any) -> str:
+    """
+    Codificar la posición (fecha, id) de un registro como cursor opaco
+    """
+    raw = f"{date.isoformat()}|{object_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    """
+    Decodificar un cursor generado por encode_cursor
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        date_str, object_id = base64.urlsafe_b64decode(padded).decode().split("|")
+        return datetime.fromisoformat(date_str), ObjectId(object_id)
+    except (ValueError, UnicodeDecodeError, binascii.Error, InvalidId):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cursor de paginación inválido"
+        )
+
+def keyset_sort(model) -> Tuple:
+    """
+    Orden estable de los listados: más recientes primero, desempate por id
+    """
+    return (query.desc(model.date), query.desc(model.id))
+
+def keyset_filter(model, cursor: Optional[str]) -> Tuple:
+    """
+    Filtro para obtener los registros posteriores al cursor en el orden de keyset_sort
+    """
+    if not cursor:
+        return ()
+    date, object_id = decode_cursor(cursor)
+    return (
+        query.or_(
+            model.date < date,
+            query.and_(model.date == date, model.id < object_id)
+        ),
+    )
+
+def next_cursor(items: list, limit: int) -> Optional[str]:
+    """
+    Cursor de la siguiente página, o None si esta fue la última
+    """
+    if len(items) < limit:
+        return None
+    last = items[-1]
+    if isinstance(last, dict):
+        # Registros serializados desde documentos crudos, con el id como string
+        return encode_cursor(last["date"], last["id"])
+    return encode_cursor(last.date, last.id)
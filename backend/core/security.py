@@ -2,14 +2,19 @@
 Utilidades de seguridad para autenticación y autorización
 Incluye funciones para hash de contraseñas, JWT tokens, y validación de usuarios
 """
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Any, Callable, Dict, Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from odmantic import ObjectId
 from core.config import settings
+from core.cache import TTLCache
+from core.metrics import registry, Gauge
 from db.database import get_database
 from models.models import User
 from models.schemas import TokenData
@@ -24,6 +29,101 @@ pwd_context = CryptContext(schemes=["scrypt"], deprecated="auto")
 # Configuración de autenticación Bearer
 security = HTTPBearer()
 
+class PasswordHasher:
+    """
+    Ejecuta el hash y la verificación de contraseñas fuera del event loop
+    
+    scrypt tarda decenas de milisegundos por operación; en un pool de hilos
+    acotado (hashlib.scrypt libera el GIL) un login no bloquea al resto de
+    requests del worker. Lleva contadores de concurrencia y profundidad de cola.
+    """
+    
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.pending = 0  # Operaciones enviadas al pool que no han terminado
+        self.running = 0  # Operaciones ejecutándose en un hilo
+        self.completed = 0
+        self.max_queue_depth = 0
+    
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="password-hash"
+            )
+        return self._executor
+    
+    def _track(self, func: Callable[..., Any], *args: Any) -> Any:
+        """Ejecutar una operación dentro del pool registrando los hilos ocupados"""
+        with self._lock:
+            self.running += 1
+        try:
+            return func(*args)
+        finally:
+            with self._lock:
+                self.running -= 1
+    
+    async def run(self, func: Callable[..., Any], *args: Any) -> Any:
+        """
+        Ejecutar una función de hash en el pool sin bloquear el event loop
+        """
+        loop = asyncio.get_running_loop()
+        self.pending += 1
+        # Esta operación aún no empieza: esperan las que excedan los hilos del pool
+        self.max_queue_depth = max(self.max_queue_depth, self.pending - self.max_workers)
+        try:
+            return await loop.run_in_executor(self._get_executor(), self._track, func, *args)
+        finally:
+            self.pending -= 1
+            self.completed += 1
+    
+    @property
+    def queue_depth(self) -> int:
+        """Operaciones esperando un hilo libre"""
+        return max(self.pending - self.running, 0)
+    
+    def stats(self) -> Dict[str, int]:
+        """Métricas del pool de hash"""
+        return {
+            "max_workers": self.max_workers,
+            "running": self.running,
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "completed": self.completed
+        }
+    
+    def shutdown(self) -> None:
+        """Liberar los hilos del pool (al cerrar la aplicación)"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+# Pool global para hash de contraseñas
+password_hasher = PasswordHasher(max_workers=settings.password_hash_workers)
+
+# Caché de usuarios autenticados (evita una consulta a la base de datos por request)
+# Guarda copias propias: cada request recibe otra copia, así que modificar el
+# usuario de un request nunca altera lo que ven los demás
+user_cache = TTLCache(maxsize=settings.user_cache_size, ttl=settings.user_cache_ttl_seconds)
+
+registry.register(Gauge(
+    "password_hash_pool", "Estado del pool de hash de contraseñas", ("stat",),
+    callback=lambda: {(stat,): value for stat, value in password_hasher.stats().items()}
+))
+registry.register(Gauge(
+    "user_cache", "Estado de la caché de usuarios autenticados", ("stat",),
+    callback=lambda: {(stat,): value for stat, value in user_cache.stats().items()}
+))
+
+def invalidate_cached_user(user_id: Any) -> None:
+    """
+    Quitar un usuario de la caché de autenticación
+    Llamar siempre que cambien sus datos, su contraseña o su estado activo
+    """
+    user_cache.pop(str(user_id))
+
 class SecurityUtils:
     """
     Clase con utilidades de seguridad
@@ -44,6 +144,20 @@ class SecurityUtils:
         """
         return pwd_context.hash(password)
     
+    @staticmethod
+    async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+        """
+        Verificar una contraseña en el pool de hash, sin bloquear el event loop
+        """
+        return await password_hasher.run(pwd_context.verify, plain_password, hashed_password)
+    
+    @staticmethod
+    async def get_password_hash_async(password: str) -> str:
+        """
+        Generar el hash de una contraseña en el pool de hash, sin bloquear el event loop
+        """
+        return await password_hasher.run(pwd_context.hash, password)
+    
     @staticmethod
     def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
         """
@@ -110,7 +224,7 @@ async def authenticate_user(email: str, password: str, db) -> Optional[User]:
         if not user:
             return None
         
-        if not security_utils.verify_password(password, user.hashed_password):
+        if not await security_utils.verify_password_async(password, user.hashed_password):
             return None
         
         return user
@@ -140,8 +254,16 @@ async def get_current_user(
                 headers={"WWW-Authenticate": "Bearer"},
             )
         
-        # Buscar usuario en la base de datos
-        user = await db.find_one(User, User.id == ObjectId(token_data.user_id))
+        # Buscar usuario en la caché y, si no está, en la base de datos
+        cached_user = user_cache.get(token_data.user_id)
+        if cached_user is not None:
+            user = cached_user.model_copy()
+        else:
+            user = await db.find_one(User, User.id == ObjectId(token_data.user_id))
+            
+            # Solo se cachean usuarios activos
+            if user is not None and user.is_active:
+                user_cache.set(token_data.user_id, user.model_copy())
         
         if user is None:
             raise HTTPException(
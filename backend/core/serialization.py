@@ -0,0 +1,87 @@
+"""
+Serialización rápida de listados
+Los documentos crudos de Motor se convierten directamente en JSON con orjson
+mediante un codificador precompilado por esquema de respuesta, sin construir
+un modelo ODMantic ni un modelo Pydantic por registro
+"""
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Type
+import orjson
+from fastapi import Response
+from odmantic import ObjectId
+from pydantic import BaseModel
+
+class SchemaEncoder:
+    """
+    Codificador de documentos de MongoDB con la forma de un esquema de respuesta
+
+    Las llaves del esquema se resuelven una sola vez (id → _id); por registro solo
+    se copian los valores y se convierten los ObjectId a string. Las fechas y
+    números los serializa orjson con el mismo formato que Pydantic.
+
+    Los campos que faltan en un documento (registros anteriores a un campo nuevo)
+    toman el valor por defecto de `model`, el modelo ODMantic guardado, igual que
+    al cargar el documento con ODMantic; sin valor por defecto quedan en None.
+    """
+
+    def __init__(self, schema: Type[BaseModel], model: Optional[Type[BaseModel]] = None):
+        self.schema = schema
+        self.fields: List[str] = list(schema.model_fields)
+        self._defaults = self._collect_defaults(schema, model)
+        self._all_keys = self._compile(self.fields)
+        self._keys_cache: Dict[Tuple[str, ...], List[Tuple[str, str, bool, Any]]] = {}
+
+    @staticmethod
+    def _collect_defaults(schema: Type[BaseModel], model: Optional[Type[BaseModel]]) -> Dict[str, Any]:
+        # Solo valores por defecto fijos: ODMantic tampoco aplica default_factory al leer
+        defaults = {}
+        for field, schema_field in schema.model_fields.items():
+            source = model.model_fields.get(field, schema_field) if model is not None else schema_field
+            if not source.is_required() and source.default_factory is None:
+                # Los enums se guardan por su valor
+                defaults[field] = getattr(source.default, "value", source.default)
+        return defaults
+
+    def _compile(self, fields: Iterable[str]) -> List[Tuple[str, str, bool, Any]]:
+        # (llave de salida, llave en el documento, convertir ObjectId, valor si falta)
+        return [
+            (field, "_id" if field == "id" else field, field == "id" or field.endswith("_id"), self._defaults.get(field))
+            for field in fields
+        ]
+
+    def _keys(self, fields: Optional[List[str]]) -> List[Tuple[str, str, bool, Any]]:
+        if fields is None:
+            return self._all_keys
+        key = tuple(fields)
+        compiled = self._keys_cache.get(key)
+        if compiled is None:
+            compiled = self._keys_cache[key] = self._compile(fields)
+        return compiled
+
+    def projection(self, fields: Optional[List[str]] = None) -> Dict[str, int]:
+        """Proyección de MongoDB con los campos del esquema (o solo los pedidos)"""
+        return {document_key: 1 for _, document_key, _, _ in self._keys(fields)}
+
+    def row(self, document: Dict[str, Any], fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Convertir un documento crudo en un diccionario serializable"""
+        row = {}
+        for field, document_key, is_object_id, default in self._keys(fields):
+            value = document.get(document_key, default)
+            if is_object_id and isinstance(value, ObjectId):
+                value = str(value)
+            row[field] = value
+        return row
+
+    def rows(self, documents: Iterable[Dict[str, Any]], fields: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Convertir varios documentos crudos"""
+        return [self.row(document, fields) for document in documents]
+
+def json_response(content: Any, headers: Optional[Dict[str, str]] = None, status_code: int = 200) -> Response:
+    """
+    Respuesta JSON serializada con orjson (datetime, float y None nativos)
+    """
+    return Response(
+        content=orjson.dumps(content),
+        status_code=status_code,
+        media_type="application/json",
+        headers=headers
+    )
@@ -5,6 +5,7 @@ Maneja la conexión y operaciones básicas con la base de datos
 from motor.motor_asyncio import AsyncIOMotorClient
 from odmantic import AIOEngine
 from core.config import settings
+from db.indexes import ensure_indexes
 import logging
 from typing import Optional
 
@@ -21,10 +22,13 @@ class Database:
 # Instancia global de la base de datos
 database = Database()
 
-async def connect_to_mongo():
+async def connect_to_mongo(create_indexes: Optional[bool] = None):
     """
     Establece conexión con MongoDB
     Se ejecuta al iniciar la aplicación
+    
+    Crea o verifica los índices de los modelos salvo que se desactive con
+    create_indexes=False o con CREATE_INDEXES_ON_STARTUP=false (p. ej. en workers)
     """
     try:
         database.client = AsyncIOMotorClient(settings.mongodb_url)
@@ -37,6 +41,11 @@ async def connect_to_mongo():
         await database.client.admin.command('ping')
         logger.info(f"Conectado a MongoDB: {settings.database_name}")
         
+        if create_indexes is None:
+            create_indexes = settings.create_indexes_on_startup
+        if create_indexes:
+            await ensure_indexes(database.engine)
+        
     except Exception as e:
         logger.error(f"❌ Error conectando a MongoDB: {e}")
         raise e
@@ -0,0 +1,135 @@
+"""
+Gestión de índices de MongoDB
+Los índices se declaran junto a los modelos (Field(unique=True) y model_config["indexes"])
+y aquí se crean al iniciar la aplicación y se verifica que cubran las consultas de los servicios
+
+Uso:
+    python -m db.indexes           # Crear o verificar índices
+    python -m db.indexes --check   # Además, verificar con explain que las consultas usan índices
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from odmantic import AIOEngine, ObjectId
+from models.models import User, Expense, Income, Saving
+from core.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Modelos cuyos índices se crean al iniciar
+INDEXED_MODELS = [User, Expense, Income, Saving]
+
+# Etapas de un plan de ejecución que indican una consulta no cubierta por un índice
+UNCOVERED_STAGES = {"COLLSCAN", "SORT"}
+
+def _service_queries() -> List[Tuple[str, Any, Dict[str, Any], Optional[List[Tuple[str, int]]]]]:
+    """
+    Consultas que emiten los servicios: (nombre, modelo, filtro, orden)
+    Los valores son de ejemplo; explain solo necesita la forma de la consulta
+    """
+    user_id = ObjectId()
+    month_range = {"$gte": datetime(2025, 1, 1), "$lte": datetime(2025, 1, 31, 23, 59, 59)}
+
+    queries = [
+        ("login por email", User, {"email": "usuario@example.com"}, None),
+        ("username único", User, {"username": "usuario"}, None),
+    ]
+    for name, model in (("gastos", Expense), ("ingresos", Income), ("ahorros", Saving)):
+        queries.extend([
+            (f"listado de {name}", model, {"user_id": user_id}, [("date", -1), ("_id", -1)]),
+            (f"página siguiente de {name}", model, {
+                "user_id": user_id,
+                "$or": [
+                    {"date": {"$lt": month_range["$lte"]}},
+                    {"date": month_range["$lte"], "_id": {"$lt": user_id}}
+                ]
+            }, [("date", -1), ("_id", -1)]),
+            (f"reporte mensual de {name}", model, {"user_id": user_id, "date": month_range}, [("date", -1), ("_id", -1)]),
+            (f"exportación de {name}", model, {"user_id": user_id, "date": month_range}, [("date", 1), ("_id", 1)]),
+        ])
+    return queries
+
+async def ensure_indexes(engine: AIOEngine) -> None:
+    """
+    Crear los índices declarados en los modelos (no hace nada si ya existen)
+    """
+    for model in INDEXED_MODELS:
+        try:
+            await engine.configure_database([model])
+        except Exception as e:
+            # Un índice único sobre datos duplicados no debe impedir el arranque
+            logger.error(f"❌ Error creando índices de {model.__collection__}: {e}")
+            continue
+
+        index_names = await engine.get_collection(model).index_information()
+        logger.info(f"Índices de {model.__collection__}: {', '.join(sorted(index_names))}")
+
+    # Las claves de idempotencia expiran solas (colección sin modelo ODMantic)
+    # Importación local: services depende de db.database, que importa este módulo
+    from services.idempotency import IDEMPOTENCY_COLLECTION
+    try:
+        await engine.database[IDEMPOTENCY_COLLECTION].create_index(
+            "created_at", expireAfterSeconds=settings.idempotency_ttl_seconds, name="created_at_ttl"
+        )
+    except Exception as e:
+        logger.error(f"❌ Error creando índice TTL de {IDEMPOTENCY_COLLECTION}: {e}")
+
+def _plan_stages(plan: Any) -> List[str]:
+    """Recolectar todas las etapas de un plan de ejecución"""
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for value in plan.values():
+            stages.extend(_plan_stages(value))
+    elif isinstance(plan, list):
+        for item in plan:
+            stages.extend(_plan_stages(item))
+    return stages
+
+async def check_query_coverage(engine: AIOEngine) -> List[str]:
+    """
+    Verificar con explain que las consultas de los servicios usan índices
+
+    Retorna la lista de consultas no cubiertas (vacía si todas lo están)
+    """
+    uncovered = []
+    for name, model, query, sort in _service_queries():
+        cursor = engine.get_collection(model).find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        explain = await cursor.explain()
+
+        stages = _plan_stages(explain.get("queryPlanner", {}).get("winningPlan", {}))
+        bad_stages = UNCOVERED_STAGES.intersection(stages)
+        if bad_stages:
+            uncovered.append(f"{name}: {', '.join(sorted(bad_stages))}")
+            logger.warning(f"⚠️ Consulta sin índice ({name}): {' -> '.join(stages)}")
+
+    return uncovered
+
+if __name__ == "__main__":
+    import argparse
+    import asyncio
+    import sys
+    from db.database import connect_to_mongo, close_mongo_connection, get_database
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    parser = argparse.ArgumentParser(description="Crear y verificar índices de MongoDB")
+    parser.add_argument("--check", action="store_true", help="Fallar si alguna consulta no usa índices")
+    args = parser.parse_args()
+
+    async def main() -> int:
+        await connect_to_mongo(create_indexes=True)
+        try:
+            if not args.check:
+                return 0
+            uncovered = await check_query_coverage(get_database())
+            for problem in uncovered:
+                print(f"NO CUBIERTA - {problem}")
+            return 1 if uncovered else 0
+        finally:
+            await close_mongo_connection()
+
+    sys.exit(asyncio.run(main()))
@@ -4,27 +4,35 @@ Sistema de gestión de finanzas personales con autenticación JWT
 """
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from contextlib import asynccontextmanager
+import asyncio
+import contextlib
 import logging
-import sys
+import random
+import time
 from datetime import datetime
 
-# Configurar logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.StreamHandler(sys.stdout),
-        logging.FileHandler("app.log")
-    ]
-)
+# Importaciones de la aplicación
+from core.config import settings
+from core.logging_config import setup_logging
+
+# Configurar logging (los handlers escriben desde un hilo aparte)
+log_listener = setup_logging()
 
 logger = logging.getLogger(__name__)
 
-# Importaciones de la aplicación
-from core.config import settings
 from db.database import connect_to_mongo, close_mongo_connection
+from core.pagination import NEXT_CURSOR_HEADER
+from core.security import password_hasher, user_cache
+from core.metrics import (
+    registry,
+    route_template,
+    monitor_event_loop_lag,
+    http_requests_total,
+    http_request_duration_seconds,
+    http_requests_in_flight
+)
 
 # Importar routers
 from api.auth import router as auth_router
@@ -32,6 +40,8 @@ from api.expenses import router as expenses_router
 from api.incomes import router as incomes_router
 from api.savings import router as savings_router
 from api.stats import router as stats_router
+from api.export import router as export_router
+from api.imports import router as imports_router
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -43,10 +53,15 @@ async def lifespan(app: FastAPI):
         # Inicialización
         logger.info("Iniciando aplicación Control de Gastos...")
         await connect_to_mongo()
+        loop_lag_task = asyncio.create_task(monitor_event_loop_lag())
         logger.info("Aplicación iniciada correctamente")
         
         yield
         
+        loop_lag_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await loop_lag_task
+        
     except Exception as e:
         logger.error(f"Error en inicialización: {e}")
         raise
@@ -54,7 +69,9 @@ async def lifespan(app: FastAPI):
         # Limpieza al cerrar
         logger.info("Cerrando aplicación...")
         await close_mongo_connection()
+        password_hasher.shutdown()
         logger.info("✅ Aplicación cerrada correctamente")
+        log_listener.stop()
 
 # Crear instancia de FastAPI
 app = FastAPI(
@@ -100,31 +117,67 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 # Middleware para logging de requests
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
     """
-    Middleware para logging de todas las requests
-    """
-    start_time = datetime.now()
+    Middleware para logging de requests
     
-    # Log de request
-    logger.info(f"🔄 {request.method} {request.url}")
+    Emite un único registro estructurado por request. Las exitosas se muestrean
+    según LOG_SUCCESS_SAMPLE_RATE; errores y requests lentas se registran siempre.
+    """
+    start_time = time.perf_counter()
     
     # Procesar request
     response = await call_next(request)
     
     # Calcular tiempo de procesamiento
-    process_time = datetime.now() - start_time
-    process_time_ms = round(process_time.total_seconds() * 1000, 2)
+    process_time_ms = round((time.perf_counter() - start_time) * 1000, 2)
+    
+    is_success = response.status_code < 400 and process_time_ms < settings.log_slow_request_ms
+    if is_success and random.random() >= settings.log_success_sample_rate:
+        return response
     
-    # Log de response
-    logger.info(f"✅ {request.method} {request.url} - {response.status_code} - {process_time_ms}ms")
+    logger.log(
+        logging.INFO if response.status_code < 500 else logging.ERROR,
+        "%s %s - %s - %sms",
+        request.method, request.url.path, response.status_code, process_time_ms,
+        extra={
+            "method": request.method,
+            "path": request.url.path,
+            "status_code": response.status_code,
+            "duration_ms": process_time_ms
+        }
+    )
     
     return response
 
+# Middleware para métricas de requests
+@app.middleware("http")
+async def track_request_metrics(request: Request, call_next):
+    """
+    Middleware para métricas por ruta: conteo, latencia y requests en proceso
+    
+    Las rutas se etiquetan por su plantilla (p. ej. /api/v1/expenses/{expense_id})
+    """
+    start_time = time.perf_counter()
+    http_requests_in_flight.inc()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        http_requests_in_flight.dec()
+        route = route_template(request.scope)
+        http_request_duration_seconds.observe(
+            time.perf_counter() - start_time, method=request.method, route=route
+        )
+        http_requests_total.inc(method=request.method, route=route, status=status_code)
+
 # Manejador global de excepciones
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
@@ -153,6 +206,8 @@ app.include_router(expenses_router, prefix="/api/v1")
 app.include_router(incomes_router, prefix="/api/v1")
 app.include_router(savings_router, prefix="/api/v1")
 app.include_router(stats_router, prefix="/api/v1")
+app.include_router(export_router, prefix="/api/v1")
+app.include_router(imports_router, prefix="/api/v1")
 
 # Endpoint raíz
 @app.get("/", tags=["Información"])
@@ -187,9 +242,22 @@ async def health_check():
         "status": "🟢 Saludable",
         "timestamp": datetime.now().isoformat(),
         "version": settings.app_version,
-        "database": "� Conectado"
+        "database": "� Conectado",
+        "password_hashing": password_hasher.stats(),
+        "user_cache": user_cache.stats()
     }
 
+# Endpoint de métricas
+@app.get("/metrics", tags=["Información"], response_class=PlainTextResponse)
+async def metrics():
+    """
+    Métricas de la aplicación en formato de exposición de Prometheus
+    """
+    return PlainTextResponse(
+        registry.render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
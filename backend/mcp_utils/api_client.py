@@ -2,37 +2,300 @@
 Cliente HTTP para comunicación con el backend de Control de Gastos
 """
 import httpx
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
 from datetime import datetime
+import asyncio
+import copy
+import logging
 import os
+import random
+import time
+import uuid
 from dotenv import load_dotenv
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# Métodos que se pueden repetir sin riesgo de duplicar registros
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+# Respuestas que indican un problema pasajero del backend
+RETRYABLE_STATUS = frozenset({502, 503, 504})
+
+def _env_flag(name: str) -> bool:
+    return os.getenv(name, "").strip().lower() in ("1", "true", "yes")
+
+class CircuitOpenError(Exception):
+    """El backend falló demasiadas veces seguidas; se rechaza la petición sin enviarla"""
+
+class CircuitBreaker:
+    """
+    Circuit breaker para el backend
+
+    Tras `failure_threshold` fallas seguidas se abre y rechaza peticiones durante
+    `reset_timeout` segundos; después deja pasar una petición de prueba
+    (semiabierto) y se cierra si tiene éxito.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def before_request(self) -> bool:
+        """
+        Lanzar CircuitOpenError si no se debe contactar al backend
+        Retorna True si la petición es la de prueba (hay que cerrarla con end_probe)
+        """
+        state = self.state
+        if state == "open" or (state == "half_open" and self._probing):
+            raise CircuitOpenError("El servidor no está disponible en este momento, intenta más tarde")
+        if state == "half_open":
+            self._probing = True
+            return True
+        return False
+
+    def end_probe(self) -> None:
+        """Liberar la prueba aunque haya terminado sin resultado (cancelada o con otro error)"""
+        self._probing = False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._probing = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
 class APIClient:
-    """Cliente para interactuar con el backend API"""
+    """
+    Cliente para interactuar con el backend API
+
+    Todas las instancias comparten un único httpx.AsyncClient por proceso, con
+    conexiones keep-alive; cada instancia solo guarda la URL base y su token.
+    Límites del pool configurables con API_MAX_CONNECTIONS, API_MAX_KEEPALIVE y
+    API_KEEPALIVE_EXPIRY; HTTP/2 opcional con API_HTTP2=true (requiere httpx[http2]).
+
+    Las fallas pasajeras se reintentan con backoff exponencial con jitter
+    (API_MAX_RETRIES, API_RETRY_BACKOFF, API_RETRY_MAX_BACKOFF). Las altas llevan
+    un header Idempotency-Key que se conserva entre reintentos, así que también se
+    reintentan sin riesgo de duplicarse; los demás POST solo se reintentan si la
+    conexión no llegó a establecerse. Un circuit breaker
+    compartido (API_BREAKER_FAILURES, API_BREAKER_RESET) corta las peticiones
+    mientras el backend no responde.
+
+    Las respuestas de GET se guardan en una caché compartida por token y URL
+    durante API_CACHE_TTL segundos (0 la desactiva); cualquier escritura exitosa
+    invalida las entradas de ese token.
+    """
+
+    _client: Optional[httpx.AsyncClient] = None
+    _breaker = CircuitBreaker(
+        failure_threshold=int(os.getenv("API_BREAKER_FAILURES", "5")),
+        reset_timeout=float(os.getenv("API_BREAKER_RESET", "30"))
+    )
+    _counters: Dict[str, int] = {
+        "requests": 0,
+        "retries": 0,
+        "failures": 0,
+        "circuit_rejections": 0,
+        "cache_hits": 0,
+        "cache_misses": 0
+    }
+    # (token, url) -> (expira en, respuesta)
+    _cache: Dict[Tuple[str, str], Tuple[float, Any]] = {}
+    # Escrituras por token; una lectura que empezó antes de una escritura no se guarda
+    _cache_generation: Dict[str, int] = {}
+    cache_ttl = float(os.getenv("API_CACHE_TTL", "30"))
+    cache_max_entries = int(os.getenv("API_CACHE_MAX_ENTRIES", "256"))
+    max_retries = int(os.getenv("API_MAX_RETRIES", "2"))
+    retry_backoff = float(os.getenv("API_RETRY_BACKOFF", "0.5"))
+    retry_max_backoff = float(os.getenv("API_RETRY_MAX_BACKOFF", "5"))
     
-    def __init__(self):
+    def __init__(self, token: Optional[str] = None):
         self.base_url = os.getenv("API_BASE_URL", "http://localhost:8000/api/v1")
-        self.token = os.getenv("API_TOKEN", "")
-        self.headers = {
+        self.token = token if token is not None else os.getenv("API_TOKEN", "")
+    
+    @property
+    def headers(self) -> Dict[str, str]:
+        """Cabeceras con el token actual (se puede cambiar después de crear el cliente)"""
+        return {
             "Authorization": f"Bearer {self.token}",
             "Content-Type": "application/json"
         }
     
-    async def _request(self, method: str, endpoint: str, data: Optional[Dict] = None) -> Any:
-        """Realizar petición HTTP al backend"""
-        async with httpx.AsyncClient() as client:
-            url = f"{self.base_url}{endpoint}"
-            response = await client.request(
-                method=method,
-                url=url,
-                headers=self.headers,
-                json=data,
-                timeout=30.0
+    @classmethod
+    def http_client(cls) -> httpx.AsyncClient:
+        """Obtener (o crear la primera vez) el cliente HTTP compartido"""
+        if cls._client is None or cls._client.is_closed:
+            limits = httpx.Limits(
+                max_connections=int(os.getenv("API_MAX_CONNECTIONS", "20")),
+                max_keepalive_connections=int(os.getenv("API_MAX_KEEPALIVE", "10")),
+                keepalive_expiry=float(os.getenv("API_KEEPALIVE_EXPIRY", "30"))
+            )
+            timeout = httpx.Timeout(
+                float(os.getenv("API_READ_TIMEOUT", "10")),
+                connect=float(os.getenv("API_CONNECT_TIMEOUT", "3"))
             )
-            response.raise_for_status()
-            return response.json()
+            http2 = _env_flag("API_HTTP2")
+            if http2:
+                try:
+                    import h2  # noqa: F401
+                except ImportError:
+                    logger.warning("API_HTTP2 activo pero falta el paquete h2 (httpx[http2]); se usa HTTP/1.1")
+                    http2 = False
+            cls._client = httpx.AsyncClient(limits=limits, http2=http2, timeout=timeout)
+        return cls._client
+    
+    @classmethod
+    async def aclose(cls) -> None:
+        """Cerrar el cliente HTTP compartido (al apagar el proceso)"""
+        if cls._client is not None:
+            await cls._client.aclose()
+            cls._client = None
+    
+    @classmethod
+    def metrics(cls) -> Dict[str, Any]:
+        """Contadores de peticiones, reintentos y fallas, y estado del circuit breaker"""
+        return {**cls._counters, "circuit_state": cls._breaker.state}
+    
+    @classmethod
+    def invalidate_cache(cls, token: Optional[str] = None) -> None:
+        """Descartar las respuestas guardadas de un token (o todas)"""
+        if token is None:
+            cls._cache.clear()
+            cls._cache_generation.clear()
+            return
+        cls._cache_generation[token] = cls._cache_generation.get(token, 0) + 1
+        for key in [key for key in cls._cache if key[0] == token]:
+            del cls._cache[key]
+    
+    def _backoff(self, attempt: int) -> float:
+        """Espera antes del reintento `attempt` (full jitter)"""
+        return random.uniform(0, min(self.retry_max_backoff, self.retry_backoff * 2 ** attempt))
+    
+    async def _request(
+        self,
+        method: str,
+        endpoint: str,
+        data: Optional[Dict] = None,
+        idempotency_key: Optional[str] = None
+    ) -> Any:
+        """Realizar petición HTTP al backend, usando la caché en las lecturas"""
+        method = method.upper()
+        if method != "GET":
+            result = await self._send(method, endpoint, data, idempotency_key)
+            self.invalidate_cache(self.token)
+            return result
+        if self.cache_ttl <= 0:
+            return await self._send(method, endpoint)
+        
+        key = (self.token, f"{self.base_url}{endpoint}")
+        cached = self._cache.get(key)
+        if cached is not None and cached[0] > time.monotonic():
+            self._counters["cache_hits"] += 1
+            return copy.deepcopy(cached[1])
+        self._counters["cache_misses"] += 1
+        generation = self._cache_generation.get(self.token, 0)
+        result = await self._send(method, endpoint)
+        if self._cache_generation.get(self.token, 0) != generation:
+            return result
+        self._cache.pop(key, None)
+        if len(self._cache) >= self.cache_max_entries:
+            # La entrada más antigua es la primera del diccionario
+            del self._cache[next(iter(self._cache))]
+        self._cache[key] = (time.monotonic() + self.cache_ttl, copy.deepcopy(result))
+        return result
+    
+    async def _send(
+        self,
+        method: str,
+        endpoint: str,
+        data: Optional[Dict] = None,
+        idempotency_key: Optional[str] = None
+    ) -> Any:
+        """Enviar la petición con reintentos y circuit breaker"""
+        counters = self._counters
+        # Con Idempotency-Key el backend descarta las repeticiones: se puede reintentar
+        idempotent = method in IDEMPOTENT_METHODS or idempotency_key is not None
+        headers = self.headers
+        if idempotency_key is not None:
+            headers["Idempotency-Key"] = idempotency_key
+        # Si un intento anterior pudo llegar al backend (timeout de lectura o 5xx)
+        maybe_applied = False
+        attempt = 0
+        while True:
+            try:
+                probe = self._breaker.before_request()
+            except CircuitOpenError:
+                counters["circuit_rejections"] += 1
+                raise
+            counters["requests"] += 1
+            try:
+                try:
+                    response = await self.http_client().request(
+                        method=method,
+                        url=f"{self.base_url}{endpoint}",
+                        headers=headers,
+                        json=data
+                    )
+                except httpx.TransportError as e:
+                    self._breaker.record_failure()
+                    # Sin conexión el backend no recibió nada: se puede repetir incluso un POST
+                    connect_failed = isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout))
+                    if not connect_failed:
+                        maybe_applied = True
+                    if not (idempotent or connect_failed) or attempt >= self.max_retries:
+                        counters["failures"] += 1
+                        raise
+                else:
+                    if response.status_code < 500:
+                        self._breaker.record_success()
+                        # DELETE repetido: 404 significa que el intento anterior ya lo eliminó
+                        if method == "DELETE" and maybe_applied and response.status_code == 404:
+                            return None
+                        # 409 con clave: la petición original sigue en proceso, se espera y se repite
+                        in_progress = idempotency_key is not None and response.status_code == 409
+                        if not in_progress or attempt >= self.max_retries:
+                            response.raise_for_status()
+                            if response.status_code == 204 or not response.content:
+                                return None
+                            return response.json()
+                    else:
+                        self._breaker.record_failure()
+                        maybe_applied = True
+                        if not (idempotent and response.status_code in RETRYABLE_STATUS) or attempt >= self.max_retries:
+                            counters["failures"] += 1
+                            response.raise_for_status()
+            finally:
+                if probe:
+                    self._breaker.end_probe()
+            counters["retries"] += 1
+            delay = self._backoff(attempt)
+            attempt += 1
+            logger.warning(f"Reintentando {method} {endpoint} ({attempt}/{self.max_retries}) en {delay:.2f}s")
+            await asyncio.sleep(delay)
+    
+    # === AUTENTICACIÓN ===
+    
+    async def login(self, email: str, password: str) -> str:
+        """Iniciar sesión; guarda y retorna el token de acceso"""
+        result = await self._request("POST", "/auth/login", {"email": email, "password": password})
+        self.token = result["access_token"]
+        return self.token
     
     # === GASTOS ===
     
@@ -43,9 +306,13 @@ class APIClient:
         payment_type: str,
         category: Optional[str] = None,
         notes: Optional[str] = None,
-        date: Optional[str] = None
+        date: Optional[str] = None,
+        idempotency_key: Optional[str] = None
     ) -> Dict[str, Any]:
-        """Crear un nuevo gasto"""
+        """
+        Crear un nuevo gasto
+        `idempotency_key` identifica el alta (por defecto una clave nueva por llamada)
+        """
         data = {
             "description": description,
             "amount": amount,
@@ -55,11 +322,15 @@ class APIClient:
         }
         if date:
             data["date"] = date
-        return await self._request("POST", "/expenses", data)
+        return await self._request("POST", "/expenses", data, idempotency_key or str(uuid.uuid4()))
     
-    async def get_expenses(self, limit: int = 10) -> List[Dict[str, Any]]:
-        """Obtener lista de gastos"""
-        result = await self._request("GET", f"/expenses?limit={limit}")
+    async def get_expenses(self, limit: int = 10, fields: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Obtener lista de gastos
+        `fields` pide solo esos campos (ej. "amount,description")
+        """
+        query = f"?limit={limit}&fields={fields}" if fields else f"?limit={limit}"
+        result = await self._request("GET", f"/expenses{query}")
         return result if isinstance(result, list) else []
     
     async def delete_expense(self, expense_id: str) -> None:
@@ -75,9 +346,13 @@ class APIClient:
         source: Optional[str] = None,
         is_recurring: bool = False,
         notes: Optional[str] = None,
-        date: Optional[str] = None
+        date: Optional[str] = None,
+        idempotency_key: Optional[str] = None
     ) -> Dict[str, Any]:
-        """Crear un nuevo ingreso"""
+        """
+        Crear un nuevo ingreso
+        `idempotency_key` identifica el alta (por defecto una clave nueva por llamada)
+        """
         data = {
             "description": description,
             "amount": amount,
@@ -87,11 +362,15 @@ class APIClient:
         }
         if date:
             data["date"] = date
-        return await self._request("POST", "/incomes", data)
+        return await self._request("POST", "/incomes", data, idempotency_key or str(uuid.uuid4()))
     
-    async def get_incomes(self, limit: int = 10) -> List[Dict[str, Any]]:
-        """Obtener lista de ingresos"""
-        result = await self._request("GET", f"/incomes?limit={limit}")
+    async def get_incomes(self, limit: int = 10, fields: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Obtener lista de ingresos
+        `fields` pide solo esos campos (ej. "amount,description")
+        """
+        query = f"?limit={limit}&fields={fields}" if fields else f"?limit={limit}"
+        result = await self._request("GET", f"/incomes{query}")
         return result if isinstance(result, list) else []
     
     async def delete_income(self, income_id: str) -> None:
@@ -107,9 +386,13 @@ class APIClient:
         transaction_type: str = "deposito",
         goal_amount: Optional[float] = None,
         notes: Optional[str] = None,
-        date: Optional[str] = None
+        date: Optional[str] = None,
+        idempotency_key: Optional[str] = None
     ) -> Dict[str, Any]:
-        """Crear un nuevo ahorro o retiro"""
+        """
+        Crear un nuevo ahorro o retiro
+        `idempotency_key` identifica el alta (por defecto una clave nueva por llamada)
+        """
         data = {
             "amount": amount,
             "transaction_type": transaction_type,
@@ -119,23 +402,64 @@ class APIClient:
         }
         if date:
             data["date"] = date
-        return await self._request("POST", "/savings", data)
+        return await self._request("POST", "/savings", data, idempotency_key or str(uuid.uuid4()))
     
-    async def get_savings(self, limit: int = 10) -> List[Dict[str, Any]]:
-        """Obtener lista de ahorros"""
-        result = await self._request("GET", f"/savings?limit={limit}")
+    async def get_savings(self, limit: int = 10, fields: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Obtener lista de ahorros
+        `fields` pide solo esos campos (ej. "amount,description")
+        """
+        query = f"?limit={limit}&fields={fields}" if fields else f"?limit={limit}"
+        result = await self._request("GET", f"/savings{query}")
         return result if isinstance(result, list) else []
     
     async def delete_saving(self, saving_id: str) -> None:
         """Eliminar un ahorro"""
         await self._request("DELETE", f"/savings/{saving_id}")
     
+    # === ALTAS MASIVAS ===
+    
+    async def create_bulk(self, endpoint: str, items: List[Dict[str, Any]], ordered: bool = False) -> Dict[str, Any]:
+        """
+        Crear varios registros en una sola petición (POST {endpoint}/bulk)
+        Retorna {"created", "failed", "results": [{"index", "status", "id", "error"}]}
+        """
+        return await self._request("POST", f"{endpoint}/bulk", {"items": items, "ordered": ordered})
+    
+    async def create_expenses_bulk(self, items: List[Dict[str, Any]], ordered: bool = False) -> Dict[str, Any]:
+        """Crear varios gastos en una sola petición"""
+        return await self.create_bulk("/expenses", items, ordered)
+    
+    async def create_incomes_bulk(self, items: List[Dict[str, Any]], ordered: bool = False) -> Dict[str, Any]:
+        """Crear varios ingresos en una sola petición"""
+        return await self.create_bulk("/incomes", items, ordered)
+    
+    async def create_savings_bulk(self, items: List[Dict[str, Any]], ordered: bool = False) -> Dict[str, Any]:
+        """Crear varios ahorros o retiros en una sola petición"""
+        return await self.create_bulk("/savings", items, ordered)
+    
     # === ESTADÍSTICAS ===
     
     async def get_summary(self) -> Dict[str, Any]:
         """Obtener resumen financiero general"""
         return await self._request("GET", "/stats/summary")
     
-    async def get_monthly_report(self, year: int, month: int) -> Dict[str, Any]:
-        """Obtener reporte mensual"""
-        return await self._request("GET", f"/stats/monthly/{year}/{month}")
+    async def get_monthly_report(
+        self,
+        year: int,
+        month: int,
+        include: Optional[str] = None,
+        page: int = 1,
+        limit: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Obtener reporte mensual
+        `include` limita las secciones (ej. "totals,stats") y `limit` pagina los movimientos
+        """
+        params = []
+        if include:
+            params.append(f"include={include}")
+        if limit:
+            params.append(f"page={page}&limit={limit}")
+        query = f"?{'&'.join(params)}" if params else ""
+        return await self._request("GET", f"/stats/monthly/{year}/{month}{query}")
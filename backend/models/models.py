@@ -2,7 +2,8 @@
 Modelos de datos para la aplicación
 Utilizamos ODMantic que es un ODM moderno para MongoDB con soporte completo de tipos
 """
-from odmantic import Model, Field, ObjectId
+from odmantic import Model, Field, ObjectId, Index
+from odmantic.query import desc
 from pydantic import EmailStr, validator
 from typing import Optional
 from datetime import datetime
@@ -32,7 +33,7 @@ class User(Model):
     Incluye campos básicos para autenticación y perfil
     """
     email: EmailStr = Field(unique=True)
-    username: str = Field(min_length=3, max_length=50)
+    username: str = Field(min_length=3, max_length=50, unique=True)
     full_name: str = Field(min_length=1, max_length=100)
     hashed_password: str
     is_active: bool = Field(default=True)
@@ -54,6 +55,13 @@ class Expense(Model):
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
     
+    # Índice para listados paginados por cursor, reportes mensuales y agregaciones por usuario
+    model_config = {
+        "indexes": lambda: [
+            Index(Expense.user_id, desc(Expense.date), desc(Expense.id), name="user_id_date_id")
+        ]
+    }
+    
     @validator('amount')
     def validate_amount(cls, v):
         """Validar que el monto sea positivo y tenga máximo 2 decimales"""
@@ -78,6 +86,13 @@ class Income(Model):
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
     
+    # Índice para listados paginados por cursor, reportes mensuales y agregaciones por usuario
+    model_config = {
+        "indexes": lambda: [
+            Index(Income.user_id, desc(Income.date), desc(Income.id), name="user_id_date_id")
+        ]
+    }
+    
     @validator('amount')
     def validate_amount(cls, v):
         """Validar que el monto sea positivo y tenga máximo 2 decimales"""
@@ -102,6 +117,13 @@ class Saving(Model):
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
     
+    # Índice para listados paginados por cursor, reportes mensuales y agregaciones por usuario
+    model_config = {
+        "indexes": lambda: [
+            Index(Saving.user_id, desc(Saving.date), desc(Saving.id), name="user_id_date_id")
+        ]
+    }
+    
     @validator('amount', 'goal_amount')
     def validate_amounts(cls, v):
         """Validar que los montos sean positivos y tengan máximo 2 decimales"""
@@ -3,9 +3,10 @@ Esquemas Pydantic para validación de entrada y salida de la API
 Separamos los modelos de base de datos de los esquemas de API para mayor flexibilidad
 """
 from pydantic import BaseModel, EmailStr, Field, validator
-from typing import Optional, List
+from typing import Any, Dict, Optional, List
 from datetime import datetime
 from models.models import PaymentType, SavingType
+from core.config import settings
 
 # === ESQUEMAS DE USUARIO ===
 
@@ -269,6 +270,30 @@ class SavingResponse(BaseModel):
     class Config:
         from_attributes = True
 
+# === ESQUEMAS DE ALTAS MASIVAS ===
+
+class BulkCreate(BaseModel):
+    """
+    Esquema para altas masivas de gastos, ingresos o ahorros
+    Los elementos se validan uno por uno en el servicio, de modo que un
+    elemento inválido no rechaza todo el lote
+    """
+    items: List[Dict[str, Any]] = Field(min_length=1, max_length=settings.bulk_max_items)
+    ordered: bool = Field(default=False)  # Detener el lote en el primer elemento inválido o error de escritura
+
+class BulkItemResult(BaseModel):
+    """Resultado de un elemento del lote"""
+    index: int
+    status: str  # created, invalid, error o skipped
+    id: Optional[str] = None
+    error: Optional[str] = None
+
+class BulkCreateResponse(BaseModel):
+    """Esquema de respuesta de un alta masiva"""
+    created: int
+    failed: int
+    results: List[BulkItemResult]
+
 # === ESQUEMAS DE RESUMEN Y ESTADÍSTICAS ===
 
 class FinancialSummary(BaseModel):
@@ -0,0 +1,62 @@
+"""
+Herramienta de mantenimiento de los acumulados financieros (user_rollups)
+
+Uso:
+    python rollups.py rebuild [--email usuario@example.com]
+    python rollups.py verify [--email usuario@example.com]
+
+`rebuild` recalcula los acumulados desde los datos crudos y los guarda.
+`verify` los compara contra los datos crudos, reporta las diferencias y
+termina con código 1 si encontró alguna.
+"""
+import argparse
+import asyncio
+import logging
+import sys
+from db.database import connect_to_mongo, close_mongo_connection, get_database
+from models.models import User
+from services.stats_service import StatsService
+
+logging.basicConfig(
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    level=logging.INFO
+)
+logger = logging.getLogger(__name__)
+
+async def run(command: str, email: str = None) -> int:
+    """Ejecutar el comando sobre todos los usuarios (o solo sobre uno)"""
+    await connect_to_mongo(create_indexes=False)
+    try:
+        db = get_database()
+        stats_service = StatsService(db)
+        users = db.find(User, User.email == email) if email else db.find(User)
+
+        users_processed = 0
+        users_with_drift = 0
+        async for user in users:
+            users_processed += 1
+            if command == "rebuild":
+                await stats_service.rebuild_rollup(user.id)
+                logger.info(f"Acumulados reconstruidos: {user.email}")
+                continue
+
+            drift = await stats_service.verify_rollup(user.id)
+            if drift:
+                users_with_drift += 1
+                logger.warning(f"Diferencias en acumulados de {user.email}:")
+                for key, stored, expected in drift:
+                    logger.warning(f"   {key}: guardado={stored} esperado={expected}")
+
+        logger.info(f"Usuarios procesados: {users_processed}")
+        if command == "verify":
+            logger.info(f"Usuarios con diferencias: {users_with_drift}")
+        return 1 if users_with_drift else 0
+    finally:
+        await close_mongo_connection()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mantenimiento de acumulados financieros")
+    parser.add_argument("command", choices=["rebuild", "verify"])
+    parser.add_argument("--email", help="Procesar solo el usuario con este email")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args.command, args.email)))
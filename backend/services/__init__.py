@@ -6,10 +6,12 @@ from .user_service import UserService
 from .expense_service import ExpenseService
 from .income_service import IncomeService
 from .saving_service import SavingService
+from .stats_service import StatsService
 
 __all__ = [
     "UserService",
     "ExpenseService", 
     "IncomeService",
-    "SavingService"
+    "SavingService",
+    "StatsService"
 ]
\ No newline at end of file
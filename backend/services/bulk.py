@@ -0,0 +1,96 @@
+"""
+Utilidades para altas masivas de gastos, ingresos y ahorros
+Cada elemento se valida por separado y los válidos se escriben con un solo
+insert_many, sin construir un modelo ODMantic ni hacer un save por registro
+"""
+from typing import Any, Callable, Dict, List, Tuple
+from motor.motor_asyncio import AsyncIOMotorCollection
+from odmantic import ObjectId
+from pydantic import BaseModel, ValidationError
+from pymongo.errors import BulkWriteError
+
+# Estados posibles de cada elemento del lote
+CREATED = "created"
+INVALID = "invalid"
+ERROR = "error"
+SKIPPED = "skipped"
+
+def _format_validation_error(error: ValidationError) -> str:
+    """Resumir los errores de validación de un elemento en una línea"""
+    return "; ".join(
+        f"{'.'.join(str(part) for part in item['loc']) or 'item'}: {item['msg']}"
+        for item in error.errors()
+    )
+
+def validate_items(
+    schema: type,
+    items: List[Dict[str, Any]],
+    to_document: Callable[[BaseModel], Dict[str, Any]],
+    ordered: bool = False
+) -> Tuple[List[Tuple[int, Dict[str, Any]]], List[Dict[str, Any]]]:
+    """
+    Validar los elementos con el esquema de alta y convertirlos en documentos
+
+    Con ordered=True el lote se corta en el primer elemento inválido: los
+    siguientes se marcan como omitidos y no se escriben.
+    Retorna (documentos válidos con su posición original, resultados de los no escritos)
+    """
+    documents = []
+    invalid = []
+    for index, item in enumerate(items):
+        try:
+            data = schema.model_validate(item)
+        except ValidationError as e:
+            invalid.append({"index": index, "status": INVALID, "error": _format_validation_error(e)})
+            if ordered:
+                invalid.extend(
+                    {"index": skipped, "status": SKIPPED}
+                    for skipped in range(index + 1, len(items))
+                )
+                break
+            continue
+        document = to_document(data)
+        document["_id"] = ObjectId()
+        documents.append((index, document))
+    return documents, invalid
+
+async def insert_documents(
+    collection: AsyncIOMotorCollection,
+    documents: List[Tuple[int, Dict[str, Any]]],
+    ordered: bool
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Escribir los documentos con insert_many
+
+    Con ordered=True la escritura se detiene en el primer error y los
+    documentos siguientes se marcan como omitidos.
+    Retorna (documentos insertados, resultados de todos los documentos)
+    """
+    if not documents:
+        return [], []
+
+    write_errors: Dict[int, str] = {}
+    try:
+        await collection.insert_many([document for _, document in documents], ordered=ordered)
+    except BulkWriteError as e:
+        for write_error in e.details.get("writeErrors", []):
+            write_errors[write_error["index"]] = write_error.get("errmsg", "Error de escritura")
+
+    first_error = min(write_errors) if write_errors else len(documents)
+    inserted = []
+    results = []
+    for position, (index, document) in enumerate(documents):
+        if position in write_errors:
+            results.append({"index": index, "status": ERROR, "error": write_errors[position]})
+        elif ordered and position > first_error:
+            results.append({"index": index, "status": SKIPPED})
+        else:
+            inserted.append(document)
+            results.append({"index": index, "status": CREATED, "id": str(document["_id"])})
+    return inserted, results
+
+def build_response(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Armar la respuesta del lote con los resultados en el orden recibido"""
+    results.sort(key=lambda result: result["index"])
+    created = sum(1 for result in results if result["status"] == CREATED)
+    return {"created": created, "failed": len(results) - created, "results": results}
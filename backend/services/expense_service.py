@@ -3,15 +3,25 @@ Servicios para gestión de gastos
 Contiene toda la lógica de negocio relacionada con gastos
 """
 from datetime import datetime
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from fastapi import HTTPException, status
 from odmantic import AIOEngine, ObjectId
 from models.models import Expense, User
-from models.schemas import ExpenseCreate, ExpenseUpdate, ExpenseResponse
+from models.schemas import BulkCreate, BulkCreateResponse, ExpenseCreate, ExpenseUpdate, ExpenseResponse
+from services.rollup_service import RollupService
+from services.bulk import validate_items, insert_documents, build_response
+from services.ownership import update_owned, delete_owned, raise_not_owned
+from core.pagination import keyset_filter, keyset_sort
+from core.fields import find_projected
+from core.serialization import SchemaEncoder
+from core.metrics import track_db_operation
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Codificador de listados: documento de MongoDB → ExpenseResponse
+RESPONSE_ENCODER = SchemaEncoder(ExpenseResponse, Expense)
+
 class ExpenseService:
     """
     Servicio para operaciones con gastos
@@ -19,7 +29,9 @@ class ExpenseService:
     
     def __init__(self, db: AIOEngine):
         self.db = db
+        self.rollups = RollupService(db)
     
+    @track_db_operation
     async def create_expense(self, expense_data: ExpenseCreate, user: User) -> ExpenseResponse:
         """
         Crear un nuevo gasto
@@ -42,8 +54,10 @@ class ExpenseService:
             }
             new_expense = Expense.model_validate(expense_data_dict)
             
-            # Guardar en base de datos
-            saved_expense = await self.db.save(new_expense)
+            # Guardar en base de datos (el alta queda pendiente en los acumulados hasta aplicar su delta)
+            async with self.rollups.pending(user.id) as rollup:
+                saved_expense = await self.db.save(new_expense)
+                await rollup.apply(RollupService.expense_delta(saved_expense))
             
             logger.info(f"Gasto creado exitosamente para usuario {user.email}: ${saved_expense.amount}")
             
@@ -67,37 +81,88 @@ class ExpenseService:
                 detail="Error interno del servidor"
             )
     
-    async def get_user_expenses(self, user: User, skip: int = 0, limit: int = 100) -> List[ExpenseResponse]:
+    @track_db_operation
+    async def create_expenses_bulk(self, bulk_data: BulkCreate, user: User) -> BulkCreateResponse:
         """
-        Obtener gastos del usuario
+        Crear muchos gastos en un solo lote
+        
+        Los elementos inválidos se reportan sin detener el lote (salvo con ordered); los válidos se
+        escriben con un solo insert_many y los acumulados se actualizan una vez
         """
         try:
-            expenses = await self.db.find(
-                Expense, 
-                Expense.user_id == user.id,
-                skip=skip, 
-                limit=limit
+            now = datetime.utcnow()
+            documents, results = validate_items(
+                ExpenseCreate,
+                bulk_data.items,
+                lambda data: {
+                    "user_id": user.id,
+                    "date": data.date if data.date else now,
+                    "description": data.description,
+                    "amount": data.amount,
+                    "payment_type": data.payment_type.value,
+                    "category": data.category,
+                    "notes": data.notes,
+                    "created_at": now,
+                    "updated_at": now
+                },
+                ordered=bulk_data.ordered
             )
             
-            # Ordenar por fecha (más recientes primero)
-            expenses = sorted(expenses, key=lambda x: x.date, reverse=True)
-            
-            return [
-                ExpenseResponse(
-                    id=str(expense.id),
-                    user_id=str(expense.user_id),
-                    date=expense.date,
-                    description=expense.description,
-                    amount=expense.amount,
-                    payment_type=expense.payment_type,
-                    category=expense.category,
-                    notes=expense.notes,
-                    created_at=expense.created_at,
-                    updated_at=expense.updated_at
+            async with self.rollups.pending(user.id) as rollup:
+                inserted, written = await insert_documents(
+                    self.db.get_collection(Expense), documents, bulk_data.ordered
                 )
-                for expense in expenses
-            ]
+                await rollup.apply(
+                    RollupService.merge_deltas(*(RollupService.expense_delta(document) for document in inserted))
+                )
+            results.extend(written)
+            
+            response = BulkCreateResponse(**build_response(results))
+            logger.info(
+                f"Alta masiva de gastos para usuario {user.email}: "
+                f"{response.created} creados, {response.failed} fallidos"
+            )
+            return response
+            
+        except Exception as e:
+            logger.error(f"Error en alta masiva de gastos: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Error interno del servidor"
+            )
+    
+    @track_db_operation
+    async def get_user_expenses(
+        self,
+        user: User,
+        skip: int = 0,
+        limit: int = 100,
+        after: Optional[str] = None,
+        fields: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Obtener gastos del usuario, más recientes primero
+        
+        Con `after` (cursor de la página anterior) la consulta continúa sobre el
+        índice desde esa posición en lugar de omitir registros con skip.
+        Los registros se retornan como diccionarios con la forma de ExpenseResponse
+        (o solo con `fields`), leídos directamente de los documentos de MongoDB
+        """
+        try:
+            return await find_projected(
+                self.db,
+                Expense,
+                Expense.user_id == user.id,
+                *keyset_filter(Expense, after),
+                encoder=RESPONSE_ENCODER,
+                fields=fields,
+                sort=keyset_sort(Expense),
+                skip=skip,
+                limit=limit
+            )
             
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Error obteniendo gastos: {e}")
             raise HTTPException(
@@ -105,6 +170,7 @@ class ExpenseService:
                 detail="Error interno del servidor"
             )
     
+    @track_db_operation
     async def get_expense_by_id(self, expense_id: str, user: User) -> ExpenseResponse:
         """
         Obtener un gasto específico por ID
@@ -147,26 +213,12 @@ class ExpenseService:
                 detail="Error interno del servidor"
             )
     
+    @track_db_operation
     async def update_expense(self, expense_id: str, update_data: ExpenseUpdate, user: User) -> ExpenseResponse:
         """
         Actualizar un gasto
         """
         try:
-            expense = await self.db.find_one(Expense, Expense.id == ObjectId(expense_id))
-            
-            if not expense:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail="Gasto no encontrado"
-                )
-            
-            # Verificar que el gasto pertenece al usuario
-            if expense.user_id != user.id:
-                raise HTTPException(
-                    status_code=status.HTTP_403_FORBIDDEN,
-                    detail="No tienes permisos para modificar este gasto"
-                )
-            
             # Actualizar campos que no son None
             update_fields = {}
             if update_data.date is not None:
@@ -185,11 +237,24 @@ class ExpenseService:
             if update_fields:
                 update_fields["updated_at"] = datetime.utcnow()
                 
-                # Actualizar gasto
-                for field, value in update_fields.items():
-                    setattr(expense, field, value)
+                # Actualizar solo los campos modificados, verificando la pertenencia en el mismo filtro
+                collection = self.db.get_collection(Expense)
+                async with self.rollups.pending(user.id) as rollup:
+                    previous = await update_owned(collection, ObjectId(expense_id), user.id, update_fields)
+                    if previous is not None:
+                        updated_expense = Expense.model_validate_doc({**previous, **update_fields})
+                        await rollup.apply(
+                            RollupService.merge_deltas(
+                                RollupService.expense_delta(previous, -1),
+                                RollupService.expense_delta(updated_expense)
+                            )
+                        )
+                if previous is None:
+                    await raise_not_owned(
+                        collection, ObjectId(expense_id),
+                        "Gasto no encontrado", "No tienes permisos para modificar este gasto"
+                    )
                 
-                updated_expense = await self.db.save(expense)
                 logger.info(f"Gasto actualizado exitosamente: {expense_id}")
                 
                 return ExpenseResponse(
@@ -217,28 +282,23 @@ class ExpenseService:
                 detail="Error interno del servidor"
             )
     
+    @track_db_operation
     async def delete_expense(self, expense_id: str, user: User) -> bool:
         """
         Eliminar un gasto
         """
         try:
-            expense = await self.db.find_one(Expense, Expense.id == ObjectId(expense_id))
-            
-            if not expense:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail="Gasto no encontrado"
-                )
-            
-            # Verificar que el gasto pertenece al usuario
-            if expense.user_id != user.id:
-                raise HTTPException(
-                    status_code=status.HTTP_403_FORBIDDEN,
-                    detail="No tienes permisos para eliminar este gasto"
+            # Eliminar gasto, verificando la pertenencia en el mismo filtro
+            collection = self.db.get_collection(Expense)
+            async with self.rollups.pending(user.id) as rollup:
+                deleted = await delete_owned(collection, ObjectId(expense_id), user.id)
+                if deleted is not None:
+                    await rollup.apply(RollupService.expense_delta(deleted, -1))
+            if deleted is None:
+                await raise_not_owned(
+                    collection, ObjectId(expense_id),
+                    "Gasto no encontrado", "No tienes permisos para eliminar este gasto"
                 )
-            
-            # Eliminar gasto
-            await self.db.delete(expense)
             logger.info(f"Gasto eliminado exitosamente: {expense_id}")
             
             return True
@@ -0,0 +1,152 @@
+"""
+Servicios para exportar el historial completo de un usuario
+Los registros se leen de un cursor de Motor por lotes y se escriben como CSV o
+NDJSON en fragmentos, de modo que la memoria no depende del tamaño del historial
+"""
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from enum import Enum
+from typing import Any, AsyncIterator, Dict, List, Optional
+from odmantic import AIOEngine
+from models.models import Expense, Income, Saving, User
+from core.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Tamaño aproximado de cada fragmento enviado al cliente
+CHUNK_SIZE = 64 * 1024
+
+class ExportKind(str, Enum):
+    """Colecciones que se pueden exportar"""
+    EXPENSES = "expenses"
+    INCOMES = "incomes"
+    SAVINGS = "savings"
+
+class ExportFormat(str, Enum):
+    """Formatos de exportación"""
+    CSV = "csv"
+    NDJSON = "ndjson"
+
+# Modelo y columnas exportadas de cada colección (sin user_id)
+EXPORTS = {
+    ExportKind.EXPENSES: (Expense, ["id", "date", "description", "amount", "payment_type", "category", "notes", "created_at", "updated_at"]),
+    ExportKind.INCOMES: (Income, ["id", "date", "description", "amount", "source", "is_recurring", "notes", "created_at", "updated_at"]),
+    ExportKind.SAVINGS: (Saving, ["id", "date", "amount", "transaction_type", "purpose", "goal_amount", "notes", "created_at", "updated_at"]),
+}
+
+MEDIA_TYPES = {
+    ExportFormat.CSV: "text/csv",
+    ExportFormat.NDJSON: "application/x-ndjson",
+}
+
+def _naive(value: Optional[datetime]) -> Optional[datetime]:
+    """Convertir a datetime naive (ODMantic guarda fechas naive)"""
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(None).replace(tzinfo=None)
+    return value
+
+def _row(document: Dict[str, Any], columns: List[str]) -> Dict[str, Any]:
+    """Convertir un documento crudo en una fila con valores serializables"""
+    row = {}
+    for column in columns:
+        value = document.get("_id" if column == "id" else column)
+        if column == "id":
+            value = str(value)
+        elif isinstance(value, datetime):
+            value = value.isoformat()
+        row[column] = value
+    return row
+
+class ExportService:
+    """
+    Servicio para exportar gastos, ingresos y ahorros
+    """
+
+    def __init__(self, db: AIOEngine):
+        self.db = db
+
+    def _cursor(self, kind: ExportKind, user: User, start_date: Optional[datetime], end_date: Optional[datetime]):
+        """
+        Cursor ordenado cronológicamente sobre el índice (user_id, date, _id)
+        """
+        model, columns = EXPORTS[kind]
+        query: Dict[str, Any] = {"user_id": user.id}
+        date_range = {}
+        if start_date:
+            date_range["$gte"] = _naive(start_date)
+        if end_date:
+            date_range["$lte"] = _naive(end_date)
+        if date_range:
+            query["date"] = date_range
+
+        projection = {column: 1 for column in columns if column != "id"}
+        return self.db.get_collection(model).find(
+            query,
+            projection,
+            sort=[("date", 1), ("_id", 1)],
+            batch_size=settings.export_batch_size
+        )
+
+    async def _lines(self, kind: ExportKind, export_format: ExportFormat, cursor) -> AsyncIterator[str]:
+        """
+        Fragmentos de texto en el formato pedido, de hasta CHUNK_SIZE caracteres
+        """
+        _, columns = EXPORTS[kind]
+        buffer = io.StringIO()
+
+        if export_format == ExportFormat.CSV:
+            writer = csv.DictWriter(buffer, fieldnames=columns)
+            writer.writeheader()
+            write = writer.writerow
+        else:
+            def write(row: Dict[str, Any]) -> None:
+                buffer.write(json.dumps(row, ensure_ascii=False))
+                buffer.write("\n")
+
+        async for document in cursor:
+            write(_row(document, columns))
+            if buffer.tell() >= CHUNK_SIZE:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+
+        if buffer.tell():
+            yield buffer.getvalue()
+
+    async def stream(
+        self,
+        kind: ExportKind,
+        user: User,
+        export_format: ExportFormat = ExportFormat.CSV,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        compress: bool = False
+    ) -> AsyncIterator[bytes]:
+        """
+        Exportar una colección del usuario como flujo de bytes
+
+        Con compress=True la salida se comprime con gzip conforme se genera
+        """
+        cursor = self._cursor(kind, user, start_date, end_date)
+        compressor = zlib.compressobj(wbits=31) if compress else None
+        try:
+            async for text in self._lines(kind, export_format, cursor):
+                data = text.encode("utf-8")
+                if compressor:
+                    data = compressor.compress(data)
+                if data:
+                    yield data
+            if compressor:
+                yield compressor.flush()
+        except Exception as e:
+            # Los headers ya se enviaron: solo queda registrar y cortar el flujo
+            logger.error(f"Error exportando {kind.value} del usuario {user.email}: {e}")
+            raise
+        finally:
+            await cursor.close()
+
+        logger.info(f"Exportación de {kind.value} ({export_format.value}) completada para usuario {user.email}")
@@ -0,0 +1,158 @@
+"""
+Claves de idempotencia para las altas (header Idempotency-Key)
+La primera petición con una clave guarda su respuesta; las repeticiones con la
+misma clave y el mismo cuerpo reciben esa respuesta sin volver a escribir en
+las colecciones de gastos, ingresos o ahorros ni en los acumulados
+"""
+import hashlib
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional
+from fastapi import HTTPException, status
+from fastapi.encoders import jsonable_encoder
+from odmantic import AIOEngine
+from pydantic import BaseModel
+from pymongo.errors import DuplicateKeyError
+from core.cache import TTLCache
+from core.config import settings
+from core.metrics import Counter, Gauge, registry
+from core.serialization import json_response
+from models.models import User
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Colección con las claves recibidas (índice TTL sobre created_at, ver db.indexes)
+IDEMPOTENCY_COLLECTION = "idempotency_keys"
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+# Header que indica que la respuesta es una repetición guardada
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+# Claves en modo memory (un solo proceso)
+_memory_keys = TTLCache(maxsize=settings.idempotency_cache_size, ttl=settings.idempotency_ttl_seconds)
+
+idempotency_requests_total = registry.register(Counter(
+    "idempotency_requests_total", "Altas con Idempotency-Key por resultado", ("scope", "outcome")
+))
+registry.register(Gauge(
+    "idempotency_memory_keys", "Estado de las claves de idempotencia en memoria", ("stat",),
+    callback=lambda: {(stat,): value for stat, value in _memory_keys.stats().items()}
+))
+
+class IdempotencyService:
+    """
+    Servicio para ejecutar altas una sola vez por clave
+
+    Cada clave se reserva antes de escribir: una repetición con la clave aún en
+    proceso recibe 409, y una clave reutilizada con otro cuerpo recibe 422. Si el
+    alta falla la reserva se libera para que el cliente pueda reintentar.
+    """
+
+    def __init__(self, db: AIOEngine):
+        self.collection = db.database[IDEMPOTENCY_COLLECTION]
+        self.use_memory = settings.idempotency_store == "memory"
+
+    @staticmethod
+    def fingerprint(payload: BaseModel) -> str:
+        """Huella del cuerpo de la petición, para detectar claves reutilizadas"""
+        return hashlib.sha256(payload.model_dump_json().encode()).hexdigest()
+
+    async def _reserve(self, key: str, fingerprint: str) -> Optional[Dict[str, Any]]:
+        """
+        Reservar la clave; retorna None si se reservó o el registro existente
+        Una reserva sin respuesta más antigua que idempotency_lock_seconds se retoma
+        """
+        now = datetime.utcnow()
+        record = {"_id": key, "fingerprint": fingerprint, "created_at": now, "status_code": None, "response": None}
+        stale_before = now - timedelta(seconds=settings.idempotency_lock_seconds)
+
+        if self.use_memory:
+            existing = _memory_keys.get(key)
+            if existing is None or (existing["response"] is None and existing["created_at"] < stale_before):
+                _memory_keys.set(key, record)
+                return None
+            return existing
+
+        try:
+            await self.collection.insert_one(record)
+            return None
+        except DuplicateKeyError:
+            pass
+        taken = await self.collection.find_one_and_replace(
+            {"_id": key, "response": None, "created_at": {"$lt": stale_before}},
+            record
+        )
+        if taken is not None:
+            return None
+        existing = await self.collection.find_one({"_id": key})
+        # Si expiró entre ambas consultas se trata como en proceso; el cliente reintenta
+        return existing or {**record, "created_at": now}
+
+    async def _complete(self, key: str, status_code: int, response: Any) -> None:
+        if self.use_memory:
+            record = _memory_keys.get(key)
+            if record is not None:
+                _memory_keys.set(key, {**record, "status_code": status_code, "response": response})
+            return
+        await self.collection.update_one(
+            {"_id": key},
+            {"$set": {"status_code": status_code, "response": response}}
+        )
+
+    async def _release(self, key: str) -> None:
+        if self.use_memory:
+            _memory_keys.pop(key)
+            return
+        await self.collection.delete_one({"_id": key, "response": None})
+
+    async def run(
+        self,
+        idempotency_key: Optional[str],
+        user: User,
+        scope: str,
+        payload: BaseModel,
+        create: Callable[[], Awaitable[Any]],
+        status_code: int = status.HTTP_201_CREATED
+    ) -> Any:
+        """
+        Ejecutar `create` una sola vez por (usuario, scope, clave)
+
+        Sin clave se ejecuta directamente. Con una clave ya completada se retorna
+        la respuesta guardada con el header Idempotent-Replayed.
+        """
+        if not idempotency_key:
+            return await create()
+
+        key = f"{user.id}:{scope}:{idempotency_key}"
+        fingerprint = self.fingerprint(payload)
+        existing = await self._reserve(key, fingerprint)
+
+        if existing is not None:
+            if existing["fingerprint"] != fingerprint:
+                idempotency_requests_total.inc(scope=scope, outcome="mismatch")
+                raise HTTPException(
+                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    detail=f"La clave {IDEMPOTENCY_HEADER} ya se usó con otro contenido"
+                )
+            if existing["response"] is None:
+                idempotency_requests_total.inc(scope=scope, outcome="in_progress")
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="Una petición con la misma clave sigue en proceso"
+                )
+            idempotency_requests_total.inc(scope=scope, outcome="replayed")
+            logger.info(f"Respuesta repetida por {IDEMPOTENCY_HEADER} para usuario {user.email} ({scope})")
+            return json_response(
+                existing["response"],
+                headers={REPLAYED_HEADER: "true"},
+                status_code=existing["status_code"]
+            )
+
+        try:
+            result = await create()
+        except BaseException:
+            await self._release(key)
+            raise
+
+        await self._complete(key, status_code, jsonable_encoder(result))
+        idempotency_requests_total.inc(scope=scope, outcome="created")
+        return result
@@ -0,0 +1,431 @@
+"""
+Servicios para importar estados de cuenta bancarios (CSV u OFX)
+El archivo fluye por etapas encadenadas con generadores asíncronos:
+lectura → parseo → normalización → clasificación → inserción por lotes,
+de modo que solo un fragmento del archivo y un lote viven en memoria a la vez
+"""
+import codecs
+import csv
+import re
+from datetime import datetime
+from enum import Enum
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from fastapi import UploadFile
+from odmantic import AIOEngine, ObjectId
+from pydantic import ValidationError
+from models.models import Expense, Income, User, PaymentType
+from models.schemas import ExpenseCreate, IncomeCreate
+from services.rollup_service import RollupService
+from services.bulk import insert_documents, CREATED
+from mcp_utils.utils import infer_category, infer_payment_type, is_recurring, to_number
+from core.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Tamaño de cada lectura del archivo subido
+READ_SIZE = 64 * 1024
+
+# Errores que se conservan para el reporte final
+MAX_REPORTED_ERRORS = 100
+
+class ImportFormat(str, Enum):
+    """Formatos de estado de cuenta soportados"""
+    CSV = "csv"
+    OFX = "ofx"
+
+# Nombres de columna aceptados en CSV (en minúsculas) para cada campo
+CSV_COLUMNS = {
+    "date": ("date", "fecha", "fecha operación", "fecha operacion"),
+    "description": ("description", "descripción", "descripcion", "concepto", "name"),
+    "amount": ("amount", "monto", "importe"),
+    "debit": ("debit", "cargo", "cargos", "retiro"),
+    "credit": ("credit", "abono", "abonos", "deposito", "depósito"),
+    "type": ("type", "tipo"),
+    "category": ("category", "categoría", "categoria"),
+    "payment_type": ("payment_type", "tipo de pago", "método de pago", "metodo de pago"),
+    "notes": ("notes", "notas", "memo"),
+}
+
+# Valores de la columna "tipo" que indican un ingreso
+INCOME_TYPES = {"ingreso", "income", "abono", "credit", "deposito", "depósito"}
+
+# Formatos de fecha probados antes de recurrir a dateutil
+DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%Y/%m/%d", "%d/%m/%y")
+
+# Etiquetas de OFX 1.x (SGML): <TAG>valor, con o sin etiqueta de cierre
+_OFX_TAG = re.compile(r"<(/?)([A-Za-z0-9.]+)>([^<]*)")
+
+# Importe sin símbolo ni signo: dígitos con separadores "." o ","
+_NUMBER = re.compile(r"\d+(?:[.,]\d+)*")
+
+class ImportRowError(ValueError):
+    """Error de una fila del archivo"""
+
+class ImportErrors:
+    """
+    Conteo de filas fallidas; solo se conservan las primeras MAX_REPORTED_ERRORS
+    para que la memoria no crezca con archivos muy dañados
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.items: List[Dict[str, Any]] = []
+
+    def add(self, row: int, error: str) -> None:
+        self.count += 1
+        if len(self.items) < MAX_REPORTED_ERRORS:
+            self.items.append({"row": row, "error": error})
+
+def _parse_date(value: str) -> datetime:
+    """Convertir una fecha de estado de cuenta a datetime naive"""
+    value = value.strip()
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format)
+        except ValueError:
+            continue
+    try:
+        from dateutil import parser
+        parsed = parser.parse(value, dayfirst=True)
+    except (ValueError, OverflowError):
+        raise ImportRowError(f"Fecha inválida: {value!r}")
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(None).replace(tzinfo=None)
+    return parsed
+
+def _parse_ofx_date(value: str) -> datetime:
+    """Convertir una fecha OFX (YYYYMMDD[HHMMSS[.XXX]][[tz]]) a datetime"""
+    digits = value.strip()[:14]
+    try:
+        return datetime.strptime(digits, "%Y%m%d%H%M%S" if len(digits) == 14 else "%Y%m%d")
+    except ValueError:
+        raise ImportRowError(f"Fecha OFX inválida: {value!r}")
+
+def _parse_number(value: str) -> float:
+    """
+    Convertir un importe con símbolo, signo o paréntesis (negativo) a float
+    Los separadores siguen la misma regla que el asistente (ver to_number), así
+    que se aceptan tanto "1,500.50" como "1.500,50"
+    """
+    cleaned = value.strip().replace("$", "").replace(" ", "")
+    negative = cleaned.startswith("(") and cleaned.endswith(")")
+    cleaned = cleaned.strip("()")
+    if cleaned[:1] in ("-", "+"):
+        negative = negative or cleaned[0] == "-"
+        cleaned = cleaned[1:]
+    if not _NUMBER.fullmatch(cleaned):
+        raise ImportRowError(f"Monto inválido: {value!r}")
+    number = to_number(cleaned)
+    return -number if negative else number
+
+# === ETAPA 1: LECTURA ===
+
+async def read_text(upload: UploadFile, encoding: str = "utf-8-sig") -> AsyncIterator[str]:
+    """
+    Leer el archivo subido en fragmentos de texto sin cargarlo completo
+    """
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    while True:
+        chunk = await upload.read(READ_SIZE)
+        if not chunk:
+            break
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+# === ETAPA 2: PARSEO ===
+
+async def parse_csv(chunks: AsyncIterator[str]) -> AsyncIterator[Tuple[int, Dict[str, str]]]:
+    """
+    Filas del CSV como diccionarios campo → valor, con su número de línea
+
+    Las columnas se reconocen por los nombres de CSV_COLUMNS; un registro con
+    comillas puede abarcar varias líneas
+    """
+    columns: Optional[Dict[str, int]] = None
+    pending = ""
+    line_number = 0
+    record_line = 0
+
+    async def records() -> AsyncIterator[Tuple[int, str]]:
+        nonlocal pending, line_number, record_line
+        tail = ""
+        async for chunk in chunks:
+            lines = (tail + chunk).split("\n")
+            tail = lines.pop()
+            for line in lines:
+                line_number += 1
+                if not pending:
+                    record_line = line_number
+                pending += line + "\n"
+                # Un número impar de comillas indica un campo que continúa en la siguiente línea
+                if pending.count('"') % 2 == 0:
+                    yield record_line, pending
+                    pending = ""
+        if tail or pending:
+            line_number += 1
+            yield record_line if pending else line_number, pending + tail
+
+    async for number, record in records():
+        if not record.strip():
+            continue
+        values = next(csv.reader([record]))
+        if columns is None:
+            header = [value.strip().lower() for value in values]
+            columns = {}
+            for field, aliases in CSV_COLUMNS.items():
+                for alias in aliases:
+                    if alias in header:
+                        columns[field] = header.index(alias)
+                        break
+            if "date" not in columns or not ({"amount", "debit", "credit"} & set(columns)):
+                raise ImportRowError("El CSV debe tener columnas de fecha y monto (o cargo/abono)")
+            continue
+        yield number, {
+            field: values[index].strip()
+            for field, index in columns.items()
+            if index < len(values) and values[index].strip()
+        }
+
+async def parse_ofx(chunks: AsyncIterator[str]) -> AsyncIterator[Tuple[int, Dict[str, str]]]:
+    """
+    Transacciones (<STMTTRN>) de un archivo OFX, numeradas desde 1
+    Acepta OFX 1.x (SGML, sin etiquetas de cierre) y OFX 2.x (XML)
+    """
+    transaction: Optional[Dict[str, str]] = None
+    number = 0
+
+    async def texts() -> AsyncIterator[str]:
+        buffer = ""
+        async for chunk in chunks:
+            buffer += chunk
+            # Conservar la última etiqueta, que puede estar incompleta
+            cut = buffer.rfind("<")
+            if cut > 0:
+                yield buffer[:cut]
+                buffer = buffer[cut:]
+        yield buffer
+
+    async for text in texts():
+        for closing, tag, value in _OFX_TAG.findall(text):
+            tag = tag.upper()
+            if tag == "STMTTRN":
+                if closing and transaction is not None:
+                    number += 1
+                    yield number, transaction
+                    transaction = None
+                elif not closing:
+                    transaction = {}
+            elif transaction is not None and not closing and value.strip():
+                transaction[tag] = value.strip()
+
+# === ETAPA 3: NORMALIZACIÓN ===
+
+def normalize_csv_row(row: Dict[str, str]) -> Dict[str, Any]:
+    """
+    Fila de CSV → registro con fecha, descripción, monto con signo y pistas opcionales
+    Los montos negativos (o en la columna de cargo) son gastos
+    """
+    if "amount" in row:
+        amount = _parse_number(row["amount"])
+    elif "debit" in row:
+        amount = -abs(_parse_number(row["debit"]))
+    elif "credit" in row:
+        amount = abs(_parse_number(row["credit"]))
+    else:
+        raise ImportRowError("Fila sin monto")
+
+    kind = row.get("type", "").lower()
+    if kind:
+        amount = abs(amount) if kind in INCOME_TYPES else -abs(amount)
+
+    return {
+        "date": _parse_date(row["date"]) if "date" in row else None,
+        "description": row.get("description") or "Movimiento importado",
+        "amount": amount,
+        "category": row.get("category"),
+        "payment_type": row.get("payment_type"),
+        "notes": row.get("notes"),
+    }
+
+def normalize_ofx_transaction(transaction: Dict[str, str]) -> Dict[str, Any]:
+    """
+    Transacción OFX → registro con fecha, descripción y monto con signo
+    """
+    if "TRNAMT" not in transaction:
+        raise ImportRowError("Transacción sin TRNAMT")
+    description = transaction.get("NAME") or transaction.get("MEMO") or "Movimiento importado"
+    memo = transaction.get("MEMO")
+    return {
+        "date": _parse_ofx_date(transaction["DTPOSTED"]) if "DTPOSTED" in transaction else None,
+        "description": description,
+        "amount": _parse_number(transaction["TRNAMT"]),
+        "category": None,
+        "payment_type": None,
+        "notes": memo if memo and memo != description else None,
+    }
+
+async def normalize(
+    rows: AsyncIterator[Tuple[int, Dict[str, str]]],
+    import_format: ImportFormat,
+    errors: ImportErrors
+) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+    """
+    Normalizar las filas; las inválidas se registran en `errors` y se omiten
+    """
+    normalizer = normalize_csv_row if import_format == ImportFormat.CSV else normalize_ofx_transaction
+    async for number, row in rows:
+        try:
+            record = normalizer(row)
+        except ImportRowError as e:
+            errors.add(number, str(e))
+            continue
+        if record["amount"] == 0:
+            errors.add(number, "Monto igual a cero")
+            continue
+        yield number, record
+
+# === ETAPA 4: CLASIFICACIÓN ===
+
+async def classify(
+    records: AsyncIterator[Tuple[int, Dict[str, Any]]],
+    errors: ImportErrors
+) -> AsyncIterator[Tuple[int, str, Any]]:
+    """
+    Decidir si cada registro es gasto o ingreso, inferir categoría y tipo de
+    pago con las mismas reglas que el asistente, y validar con los esquemas de alta
+
+    La inferencia usa la descripción junto con las notas: en OFX muchos bancos
+    ponen el comercio o la tarjeta en MEMO y no en NAME
+    """
+    payment_types = {payment_type.value for payment_type in PaymentType}
+    async for number, record in records:
+        description = record["description"][:200]
+        text = f"{description} {record['notes'] or ''}"
+        amount = round(abs(record["amount"]), 2)
+        try:
+            if record["amount"] < 0:
+                payment_type = record["payment_type"]
+                if payment_type not in payment_types:
+                    payment_type = infer_payment_type(f"{text} {payment_type or ''}")
+                yield number, "expense", ExpenseCreate(
+                    date=record["date"],
+                    description=description,
+                    amount=amount,
+                    payment_type=payment_type,
+                    category=(record["category"] or infer_category(text) or None),
+                    notes=record["notes"]
+                )
+            else:
+                yield number, "income", IncomeCreate(
+                    date=record["date"],
+                    description=description,
+                    amount=amount,
+                    is_recurring=is_recurring(text),
+                    notes=record["notes"]
+                )
+        except ValidationError as e:
+            errors.add(number, "; ".join(item["msg"] for item in e.errors()))
+
+class ImportService:
+    """
+    Servicio para importar estados de cuenta como gastos e ingresos
+    """
+
+    def __init__(self, db: AIOEngine):
+        self.db = db
+        self.rollups = RollupService(db)
+
+    @staticmethod
+    def detect_format(filename: Optional[str]) -> Optional[ImportFormat]:
+        """Detectar el formato por la extensión del archivo"""
+        extension = (filename or "").rsplit(".", 1)[-1].lower()
+        if extension in ("ofx", "qfx"):
+            return ImportFormat.OFX
+        if extension in ("csv", "txt"):
+            return ImportFormat.CSV
+        return None
+
+    async def _insert_batch(self, kind: str, batch: List[Dict[str, Any]], user: User, errors: ImportErrors) -> int:
+        """
+        Insertar un lote de documentos y actualizar los acumulados una sola vez
+        Retorna el número de documentos insertados
+        """
+        model, delta = (Expense, RollupService.expense_delta) if kind == "expense" else (Income, RollupService.income_delta)
+        async with self.rollups.pending(user.id) as rollup:
+            inserted, results = await insert_documents(
+                self.db.get_collection(model),
+                [(document.pop("_row"), document) for document in batch],
+                ordered=False
+            )
+            await rollup.apply(RollupService.merge_deltas(*(delta(document) for document in inserted)))
+        for result in results:
+            if result["status"] != CREATED:
+                errors.add(result["index"], result.get("error", "Error de escritura"))
+        return len(inserted)
+
+    async def run(self, upload: UploadFile, import_format: ImportFormat, user: User) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Importar el archivo y emitir el progreso después de cada lote
+
+        Cada evento es un diccionario con "event" = "progress" y, al final, "done"
+        o "error" si el archivo no se pudo procesar, con los primeros errores por fila
+        """
+        errors = ImportErrors()
+        parser = parse_csv if import_format == ImportFormat.CSV else parse_ofx
+        stages = classify(normalize(parser(read_text(upload)), import_format, errors), errors)
+
+        batch_size = settings.import_batch_size
+        batches: Dict[str, List[Dict[str, Any]]] = {"expense": [], "income": []}
+        counts = {"rows": 0, "expenses": 0, "incomes": 0}
+
+        def progress(event: str) -> Dict[str, Any]:
+            return {"event": event, **counts, "failed": errors.count}
+
+        async def flush(kind: str) -> None:
+            created = await self._insert_batch(kind, batches[kind], user, errors)
+            counts["expenses" if kind == "expense" else "incomes"] += created
+            batches[kind] = []
+
+        now = datetime.utcnow()
+        try:
+            async for number, kind, data in stages:
+                counts["rows"] += 1
+                document = {
+                    "_id": ObjectId(),
+                    "_row": number,
+                    "user_id": user.id,
+                    "date": data.date or now,
+                    "description": data.description,
+                    "amount": data.amount,
+                    "notes": data.notes,
+                    "created_at": now,
+                    "updated_at": now
+                }
+                if kind == "expense":
+                    document.update(payment_type=data.payment_type.value, category=data.category)
+                else:
+                    document.update(source=data.source, is_recurring=bool(data.is_recurring))
+                batches[kind].append(document)
+
+                if len(batches[kind]) >= batch_size:
+                    await flush(kind)
+                    yield progress("progress")
+
+            for kind in batches:
+                if batches[kind]:
+                    await flush(kind)
+        except ImportRowError as e:
+            yield {**progress("error"), "detail": str(e), "errors": errors.items}
+            return
+
+        summary = progress("done")
+        logger.info(
+            f"Importación {import_format.value} para usuario {user.email}: "
+            f"{summary['expenses']} gastos, {summary['incomes']} ingresos, {summary['failed']} fallidos"
+        )
+        yield {**summary, "errors": errors.items}
@@ -3,15 +3,25 @@ Servicios para gestión de ingresos
 Contiene toda la lógica de negocio relacionada con ingresos
 """
 from datetime import datetime
-from typing import List
+from typing import Any, Dict, List, Optional
 from fastapi import HTTPException, status
 from odmantic import AIOEngine, ObjectId
 from models.models import Income, User
-from models.schemas import IncomeCreate, IncomeUpdate, IncomeResponse
+from models.schemas import BulkCreate, BulkCreateResponse, IncomeCreate, IncomeUpdate, IncomeResponse
+from services.rollup_service import RollupService
+from services.bulk import validate_items, insert_documents, build_response
+from services.ownership import update_owned, delete_owned, raise_not_owned
+from core.pagination import keyset_filter, keyset_sort
+from core.fields import find_projected
+from core.serialization import SchemaEncoder
+from core.metrics import track_db_operation
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Codificador de listados: documento de MongoDB → IncomeResponse
+RESPONSE_ENCODER = SchemaEncoder(IncomeResponse, Income)
+
 class IncomeService:
     """
     Servicio para operaciones con ingresos
@@ -19,7 +29,9 @@ class IncomeService:
     
     def __init__(self, db: AIOEngine):
         self.db = db
+        self.rollups = RollupService(db)
     
+    @track_db_operation
     async def create_income(self, income_data: IncomeCreate, user: User) -> IncomeResponse:
         """
         Crear un nuevo ingreso
@@ -42,8 +54,10 @@ class IncomeService:
             }
             new_income = Income.model_validate(income_data_dict)
             
-            # Guardar en base de datos
-            saved_income = await self.db.save(new_income)
+            # Guardar en base de datos (el alta queda pendiente en los acumulados hasta aplicar su delta)
+            async with self.rollups.pending(user.id) as rollup:
+                saved_income = await self.db.save(new_income)
+                await rollup.apply(RollupService.income_delta(saved_income))
             
             logger.info(f"Ingreso creado exitosamente para usuario {user.email}: ${saved_income.amount}")
             
@@ -67,37 +81,88 @@ class IncomeService:
                 detail="Error interno del servidor"
             )
     
-    async def get_user_incomes(self, user: User, skip: int = 0, limit: int = 100) -> List[IncomeResponse]:
+    @track_db_operation
+    async def create_incomes_bulk(self, bulk_data: BulkCreate, user: User) -> BulkCreateResponse:
         """
-        Obtener ingresos del usuario
+        Crear muchos ingresos en un solo lote
+        
+        Los elementos inválidos se reportan sin detener el lote (salvo con ordered); los válidos se
+        escriben con un solo insert_many y los acumulados se actualizan una vez
         """
         try:
-            incomes = await self.db.find(
-                Income, 
-                Income.user_id == user.id,
-                skip=skip, 
-                limit=limit
+            now = datetime.utcnow()
+            documents, results = validate_items(
+                IncomeCreate,
+                bulk_data.items,
+                lambda data: {
+                    "user_id": user.id,
+                    "date": data.date if data.date else now,
+                    "description": data.description,
+                    "amount": data.amount,
+                    "source": data.source,
+                    "is_recurring": data.is_recurring if data.is_recurring is not None else False,
+                    "notes": data.notes,
+                    "created_at": now,
+                    "updated_at": now
+                },
+                ordered=bulk_data.ordered
             )
             
-            # Ordenar por fecha (más recientes primero)
-            incomes = sorted(incomes, key=lambda x: x.date, reverse=True)
-            
-            return [
-                IncomeResponse(
-                    id=str(income.id),
-                    user_id=str(income.user_id),
-                    date=income.date,
-                    description=income.description,
-                    amount=income.amount,
-                    source=income.source,
-                    is_recurring=getattr(income, 'is_recurring', False),
-                    notes=income.notes,
-                    created_at=income.created_at,
-                    updated_at=income.updated_at
+            async with self.rollups.pending(user.id) as rollup:
+                inserted, written = await insert_documents(
+                    self.db.get_collection(Income), documents, bulk_data.ordered
                 )
-                for income in incomes
-            ]
+                await rollup.apply(
+                    RollupService.merge_deltas(*(RollupService.income_delta(document) for document in inserted))
+                )
+            results.extend(written)
+            
+            response = BulkCreateResponse(**build_response(results))
+            logger.info(
+                f"Alta masiva de ingresos para usuario {user.email}: "
+                f"{response.created} creados, {response.failed} fallidos"
+            )
+            return response
+            
+        except Exception as e:
+            logger.error(f"Error en alta masiva de ingresos: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Error interno del servidor"
+            )
+    
+    @track_db_operation
+    async def get_user_incomes(
+        self,
+        user: User,
+        skip: int = 0,
+        limit: int = 100,
+        after: Optional[str] = None,
+        fields: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Obtener ingresos del usuario, más recientes primero
+        
+        Con `after` (cursor de la página anterior) la consulta continúa sobre el
+        índice desde esa posición en lugar de omitir registros con skip.
+        Los registros se retornan como diccionarios con la forma de IncomeResponse
+        (o solo con `fields`), leídos directamente de los documentos de MongoDB
+        """
+        try:
+            return await find_projected(
+                self.db,
+                Income,
+                Income.user_id == user.id,
+                *keyset_filter(Income, after),
+                encoder=RESPONSE_ENCODER,
+                fields=fields,
+                sort=keyset_sort(Income),
+                skip=skip,
+                limit=limit
+            )
             
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Error obteniendo ingresos: {e}")
             raise HTTPException(
@@ -105,6 +170,7 @@ class IncomeService:
                 detail="Error interno del servidor"
             )
     
+    @track_db_operation
     async def get_income_by_id(self, income_id: str, user: User) -> IncomeResponse:
         """
         Obtener un ingreso específico por ID
@@ -147,26 +213,12 @@ class IncomeService:
                 detail="Error interno del servidor"
             )
     
+    @track_db_operation
     async def update_income(self, income_id: str, update_data: IncomeUpdate, user: User) -> IncomeResponse:
         """
         Actualizar un ingreso
         """
         try:
-            income = await self.db.find_one(Income, Income.id == ObjectId(income_id))
-            
-            if not income:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail="Ingreso no encontrado"
-                )
-            
-            # Verificar que el ingreso pertenece al usuario
-            if income.user_id != user.id:
-                raise HTTPException(
-                    status_code=status.HTTP_403_FORBIDDEN,
-                    detail="No tienes permisos para modificar este ingreso"
-                )
-            
             # Actualizar campos que no son None
             update_fields = {}
             if update_data.date is not None:
@@ -185,11 +237,24 @@ class IncomeService:
             if update_fields:
                 update_fields["updated_at"] = datetime.utcnow()
                 
-                # Actualizar ingreso
-                for field, value in update_fields.items():
-                    setattr(income, field, value)
+                # Actualizar solo los campos modificados, verificando la pertenencia en el mismo filtro
+                collection = self.db.get_collection(Income)
+                async with self.rollups.pending(user.id) as rollup:
+                    previous = await update_owned(collection, ObjectId(income_id), user.id, update_fields)
+                    if previous is not None:
+                        updated_income = Income.model_validate_doc({**previous, **update_fields})
+                        await rollup.apply(
+                            RollupService.merge_deltas(
+                                RollupService.income_delta(previous, -1),
+                                RollupService.income_delta(updated_income)
+                            )
+                        )
+                if previous is None:
+                    await raise_not_owned(
+                        collection, ObjectId(income_id),
+                        "Ingreso no encontrado", "No tienes permisos para modificar este ingreso"
+                    )
                 
-                updated_income = await self.db.save(income)
                 logger.info(f"Ingreso actualizado exitosamente: {income_id}")
                 
                 return IncomeResponse(
@@ -217,28 +282,23 @@ class IncomeService:
                 detail="Error interno del servidor"
             )
     
+    @track_db_operation
     async def delete_income(self, income_id: str, user: User) -> bool:
         """
         Eliminar un ingreso
         """
         try:
-            income = await self.db.find_one(Income, Income.id == ObjectId(income_id))
-            
-            if not income:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail="Ingreso no encontrado"
-                )
-            
-            # Verificar que el ingreso pertenece al usuario
-            if income.user_id != user.id:
-                raise HTTPException(
-                    status_code=status.HTTP_403_FORBIDDEN,
-                    detail="No tienes permisos para eliminar este ingreso"
+            # Eliminar ingreso, verificando la pertenencia en el mismo filtro
+            collection = self.db.get_collection(Income)
+            async with self.rollups.pending(user.id) as rollup:
+                deleted = await delete_owned(collection, ObjectId(income_id), user.id)
+                if deleted is not None:
+                    await rollup.apply(RollupService.income_delta(deleted, -1))
+            if deleted is None:
+                await raise_not_owned(
+                    collection, ObjectId(income_id),
+                    "Ingreso no encontrado", "No tienes permisos para eliminar este ingreso"
                 )
-            
-            # Eliminar ingreso
-            await self.db.delete(income)
             logger.info(f"Ingreso eliminado exitosamente: {income_id}")
             
             return True
@@ -0,0 +1,61 @@
+"""
+Escrituras atómicas sobre registros de un usuario
+El filtro incluye {_id, user_id}, de modo que la verificación de pertenencia y
+la escritura ocurren en una sola ida a la base de datos
+"""
+from typing import Any, Dict, NoReturn, Optional
+from fastapi import HTTPException, status
+from motor.motor_asyncio import AsyncIOMotorCollection
+from odmantic import ObjectId
+from pymongo import ReturnDocument
+
+async def update_owned(
+    collection: AsyncIOMotorCollection,
+    object_id: ObjectId,
+    user_id: ObjectId,
+    fields: Dict[str, Any]
+) -> Optional[Dict[str, Any]]:
+    """
+    Aplicar $set solo con los campos modificados si el registro pertenece al usuario
+
+    Retorna el documento anterior a la actualización (necesario para los acumulados)
+    o None si no existe o es de otro usuario
+    """
+    return await collection.find_one_and_update(
+        {"_id": object_id, "user_id": user_id},
+        {"$set": {field: getattr(value, "value", value) for field, value in fields.items()}},
+        return_document=ReturnDocument.BEFORE
+    )
+
+async def delete_owned(
+    collection: AsyncIOMotorCollection,
+    object_id: ObjectId,
+    user_id: ObjectId
+) -> Optional[Dict[str, Any]]:
+    """
+    Eliminar el registro si pertenece al usuario
+
+    Retorna el documento eliminado (necesario para los acumulados) o None si no
+    existe o es de otro usuario
+    """
+    return await collection.find_one_and_delete({"_id": object_id, "user_id": user_id})
+
+async def raise_not_owned(
+    collection: AsyncIOMotorCollection,
+    object_id: ObjectId,
+    not_found_detail: str,
+    forbidden_detail: str
+) -> NoReturn:
+    """
+    Responder 404 o 403 cuando una escritura atómica no encontró el registro
+    Solo se consulta en la ruta de error, para distinguir ambos casos
+    """
+    if await collection.find_one({"_id": object_id}, {"_id": 1}) is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=not_found_detail
+        )
+    raise HTTPException(
+        status_code=status.HTTP_403_FORBIDDEN,
+        detail=forbidden_detail
+    )
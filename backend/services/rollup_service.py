@@ -0,0 +1,349 @@
+"""
+Servicios para los acumulados financieros por usuario (user_rollups)
+Mantiene un documento por usuario con totales, desgloses y cubetas mensuales
+que se actualiza de forma atómica con $inc en cada alta, edición o baja
+
+Cada escritura se anuncia antes de tocar los datos crudos (RollupService.pending):
+queda registrada en `pending` e incrementa `version`, y el $inc con su delta la
+retira. La reconstrucción desde los datos crudos espera a que no haya escrituras
+pendientes y solo reemplaza el documento si `version` no cambió mientras
+agregaba, de modo que ningún registro queda fuera ni se cuenta dos veces.
+
+Una escritura pendiente más antigua que rollup_pending_lease_seconds se da por
+abandonada y la reconstrucción la descarta; si su delta llega después ya no se
+aplica (no se sabe si la reconstrucción incluyó el registro) y el documento se
+marca para reconstruirse. Solo los documentos con `rebuilt_at` están completos.
+"""
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from odmantic import AIOEngine, ObjectId
+from pymongo.errors import DuplicateKeyError
+from models.models import SavingType
+from core.config import settings
+from core.metrics import Counter, registry, track_db_operation
+import logging
+
+logger = logging.getLogger(__name__)
+
+rollup_apply_failures_total = registry.register(Counter(
+    "rollup_apply_failures_total", "Deltas de acumulados que no se pudieron aplicar"
+))
+
+# Nombre de la colección de acumulados
+ROLLUP_COLLECTION = "user_rollups"
+
+# Categoría usada cuando un gasto no tiene categoría asignada
+DEFAULT_CATEGORY = "Sin categoría"
+
+# Llaves de control del documento que no son acumulados
+CONTROL_FIELDS = ("_id", "version", "pending", "rebuilt_at", "updated_at")
+
+# Diferencia máxima tolerada al verificar acumulados (errores de punto flotante)
+DRIFT_TOLERANCE = 0.005
+
+# MongoDB no admite "." ni "$" en las llaves de los mapas; se sustituyen por
+# sus equivalentes de ancho completo y se restauran al leer
+_KEY_ESCAPES = (("$", "＄"), (".", "．"))
+
+def escape_key(key: str) -> str:
+    """Convertir un valor libre (p. ej. una categoría) en una llave válida de MongoDB"""
+    for original, replacement in _KEY_ESCAPES:
+        key = key.replace(original, replacement)
+    return key
+
+def unescape_key(key: str) -> str:
+    """Restaurar una llave guardada con escape_key"""
+    for original, replacement in _KEY_ESCAPES:
+        key = key.replace(replacement, original)
+    return key
+
+def month_key(date: datetime) -> str:
+    """Llave de la cubeta mensual de una fecha (YYYY-MM)"""
+    return date.strftime("%Y-%m")
+
+def _field(source: Any, name: str, default: Any = None) -> Any:
+    """Leer un campo de un modelo ODMantic o de un documento crudo de MongoDB"""
+    if isinstance(source, dict):
+        value = source.get(name, default)
+    else:
+        value = getattr(source, name, default)
+    # Los enums se guardan por su valor
+    return getattr(value, "value", value)
+
+def empty_rollup() -> Dict[str, Any]:
+    """Documento de acumulados vacío"""
+    return {
+        "total_expenses": 0,
+        "expenses_count": 0,
+        "total_incomes": 0,
+        "incomes_count": 0,
+        "total_savings": 0,
+        "savings_count": 0,
+        "expenses_by_category": {},
+        "expenses_by_payment_type": {},
+        "months": {}
+    }
+
+class PendingRollup:
+    """
+    Escritura anunciada en los acumulados (ver RollupService.pending)
+    """
+
+    def __init__(self, service: "RollupService", user_id: ObjectId, token: Optional[str]):
+        self.service = service
+        self.user_id = user_id
+        self.token = token
+        self.applied = False
+
+    async def apply(self, delta: Dict[str, float]) -> None:
+        """Aplicar el delta de la escritura y retirarla de las pendientes"""
+        self.applied = True
+        await self.service.apply(self.user_id, delta, self.token)
+
+class RollupService:
+    """
+    Servicio para leer y mantener los acumulados financieros por usuario
+    """
+
+    def __init__(self, db: AIOEngine):
+        self.db = db
+        self.collection = db.database[ROLLUP_COLLECTION]
+
+    # === DELTAS ===
+
+    @staticmethod
+    def expense_delta(expense: Any, sign: int = 1) -> Dict[str, float]:
+        """
+        Incrementos que produce un gasto (sign=1 al crear, sign=-1 al eliminar)
+        """
+        amount = sign * _field(expense, "amount")
+        category = escape_key(_field(expense, "category") or DEFAULT_CATEGORY)
+        payment_type = escape_key(_field(expense, "payment_type"))
+        month = month_key(_field(expense, "date"))
+        return {
+            "total_expenses": amount,
+            "expenses_count": sign,
+            f"expenses_by_category.{category}.total": amount,
+            f"expenses_by_category.{category}.count": sign,
+            f"expenses_by_payment_type.{payment_type}.total": amount,
+            f"expenses_by_payment_type.{payment_type}.count": sign,
+            f"months.{month}.expenses": amount,
+            f"months.{month}.expenses_count": sign
+        }
+
+    @staticmethod
+    def income_delta(income: Any, sign: int = 1) -> Dict[str, float]:
+        """
+        Incrementos que produce un ingreso (sign=1 al crear, sign=-1 al eliminar)
+        """
+        amount = sign * _field(income, "amount")
+        month = month_key(_field(income, "date"))
+        return {
+            "total_incomes": amount,
+            "incomes_count": sign,
+            f"months.{month}.incomes": amount,
+            f"months.{month}.incomes_count": sign
+        }
+
+    @staticmethod
+    def saving_delta(saving: Any, sign: int = 1) -> Dict[str, float]:
+        """
+        Incrementos que produce un movimiento de ahorro (sign=1 al crear, sign=-1 al eliminar)
+        """
+        amount = sign * _field(saving, "amount")
+        month = month_key(_field(saving, "date"))
+        is_withdrawal = _field(saving, "transaction_type") == SavingType.RETIRO.value
+        bucket = "savings_withdrawals" if is_withdrawal else "savings_deposits"
+        return {
+            "total_savings": -amount if is_withdrawal else amount,
+            "savings_count": sign,
+            f"months.{month}.{bucket}": amount,
+            f"months.{month}.savings_count": sign
+        }
+
+    @staticmethod
+    def merge_deltas(*deltas: Dict[str, float]) -> Dict[str, float]:
+        """
+        Combinar varios deltas en uno solo, descartando los que se anulan
+        """
+        merged: Dict[str, float] = {}
+        for delta in deltas:
+            for key, value in delta.items():
+                merged[key] = merged.get(key, 0) + value
+        return {key: value for key, value in merged.items() if value != 0}
+
+    # === ESCRITURA ===
+
+    @asynccontextmanager
+    async def pending(self, user_id: ObjectId) -> AsyncIterator[PendingRollup]:
+        """
+        Anunciar una escritura antes de tocar los datos crudos
+
+            async with rollups.pending(user.id) as rollup:
+                saved = await db.save(expense)
+                await rollup.apply(RollupService.expense_delta(saved))
+
+        Si el bloque termina sin aplicar un delta (nada que escribir) la escritura
+        se retira; si termina con una excepción no se sabe si los datos crudos
+        cambiaron y el documento se marca para reconstruirse.
+        """
+        token = await self._begin(user_id)
+        write = PendingRollup(self, user_id, token)
+        try:
+            yield write
+        except BaseException:
+            if not write.applied:
+                await self._release(user_id, token, invalidate=True)
+            raise
+        if not write.applied:
+            await self._release(user_id, token)
+
+    async def _begin(self, user_id: ObjectId) -> Optional[str]:
+        token = str(ObjectId())
+        try:
+            await self.collection.update_one(
+                {"_id": user_id},
+                {"$set": {f"pending.{token}": datetime.utcnow()}, "$inc": {"version": 1}},
+                upsert=True
+            )
+        except Exception:
+            rollup_apply_failures_total.inc()
+            logger.exception(f"Error registrando escritura pendiente en acumulados del usuario {user_id}")
+            return None
+        return token
+
+    async def _release(self, user_id: ObjectId, token: Optional[str], invalidate: bool = False) -> None:
+        update: Dict[str, Any] = {"$unset": {}}
+        if token is not None:
+            update["$unset"][f"pending.{token}"] = ""
+        if invalidate:
+            update["$unset"]["rebuilt_at"] = ""
+            update["$inc"] = {"version": 1}
+        if not update["$unset"]:
+            return
+        try:
+            await self.collection.update_one({"_id": user_id}, update)
+        except Exception:
+            rollup_apply_failures_total.inc()
+            logger.exception(f"Error liberando escritura pendiente en acumulados del usuario {user_id}")
+
+    @track_db_operation
+    async def apply(self, user_id: ObjectId, delta: Dict[str, float], token: Optional[str] = None) -> None:
+        """
+        Aplicar un delta de forma atómica con $inc (e incrementar `version`)
+
+        Con `token` (ver pending) el delta solo se aplica si la escritura sigue
+        pendiente; si una reconstrucción la descartó por vieja el documento se
+        marca para reconstruirse. Sin `token` no hay forma de saber si una
+        reconstrucción concurrente incluyó el registro, así que también se marca.
+        Un fallo al actualizar no interrumpe la operación principal: se registra
+        en el log y en la métrica rollup_apply_failures_total.
+        """
+        if not delta:
+            await self._release(user_id, token)
+            return
+        now = datetime.utcnow()
+        try:
+            if token is None:
+                await self.collection.update_one(
+                    {"_id": user_id},
+                    {"$inc": {**delta, "version": 1}, "$set": {"updated_at": now}, "$unset": {"rebuilt_at": ""}},
+                    upsert=True
+                )
+                return
+            result = await self.collection.update_one(
+                {"_id": user_id, f"pending.{token}": {"$exists": True}},
+                {"$inc": {**delta, "version": 1}, "$set": {"updated_at": now}, "$unset": {f"pending.{token}": ""}}
+            )
+            if result.matched_count == 0:
+                logger.warning(f"Escritura en acumulados del usuario {user_id} descartada por vieja; se reconstruirán")
+                await self._release(user_id, None, invalidate=True)
+        except Exception:
+            rollup_apply_failures_total.inc()
+            logger.exception(f"Error actualizando acumulados del usuario {user_id}; ejecutar rollups.py rebuild")
+
+    @track_db_operation
+    async def replace(self, user_id: ObjectId, rollup: Dict[str, Any], version: Optional[int]) -> bool:
+        """
+        Reemplazar el documento de acumulados si su `version` sigue siendo `version`
+
+        `version` es la leída antes de recalcular (None si no había documento).
+        Retorna False si otra escritura lo modificó entretanto; hay que recalcular.
+        """
+        now = datetime.utcnow()
+        document = {**rollup, "version": (version or 0) + 1, "rebuilt_at": now, "updated_at": now}
+        if version is None:
+            try:
+                await self.collection.insert_one({"_id": user_id, **document})
+            except DuplicateKeyError:
+                return False
+            return True
+        result = await self.collection.replace_one({"_id": user_id, "version": version}, document)
+        return result.matched_count == 1
+
+    # === LECTURA ===
+
+    @track_db_operation
+    async def get(self, user_id: ObjectId) -> Optional[Dict[str, Any]]:
+        """
+        Obtener el documento de acumulados de un usuario (una sola lectura)
+        """
+        return await self.collection.find_one({"_id": user_id})
+
+    @staticmethod
+    def has_active_writes(rollup: Optional[Dict[str, Any]]) -> bool:
+        """Si hay escrituras pendientes dentro del plazo rollup_pending_lease_seconds"""
+        if rollup is None:
+            return False
+        lease_start = datetime.utcnow() - timedelta(seconds=settings.rollup_pending_lease_seconds)
+        return any(started > lease_start for started in rollup.get("pending", {}).values())
+
+    @staticmethod
+    def is_complete(rollup: Optional[Dict[str, Any]]) -> bool:
+        """Si el documento viene de una reconstrucción (no solo de deltas con upsert)"""
+        return rollup is not None and "rebuilt_at" in rollup
+
+    @staticmethod
+    def breakdown(rollup: Dict[str, Any], field: str) -> Dict[str, Dict[str, float]]:
+        """
+        Desglose de un mapa del acumulado con las llaves restauradas,
+        omitiendo las entradas que quedaron vacías tras eliminar registros
+        """
+        return {
+            unescape_key(key): values
+            for key, values in rollup.get(field, {}).items()
+            if values.get("count", 0) > 0
+        }
+
+    # === VERIFICACIÓN ===
+
+    @staticmethod
+    def diff(stored: Dict[str, Any], expected: Dict[str, Any]) -> List[Tuple[str, Any, Any]]:
+        """
+        Comparar un acumulado guardado contra el recalculado desde los datos crudos
+
+        Retorna una lista de (llave, valor guardado, valor esperado) con las diferencias
+        """
+        def flatten(document: Dict[str, Any], prefix: str = "") -> Dict[str, Any]:
+            flat = {}
+            for key, value in document.items():
+                if key in CONTROL_FIELDS:
+                    continue
+                path = f"{prefix}{key}"
+                if isinstance(value, dict):
+                    flat.update(flatten(value, f"{path}."))
+                else:
+                    flat[path] = value
+            return flat
+
+        stored_flat = flatten(stored)
+        expected_flat = flatten(expected)
+
+        drift = []
+        for key in sorted(set(stored_flat) | set(expected_flat)):
+            stored_value = stored_flat.get(key, 0)
+            expected_value = expected_flat.get(key, 0)
+            if abs(stored_value - expected_value) > DRIFT_TOLERANCE:
+                drift.append((key, stored_value, expected_value))
+        return drift
@@ -3,15 +3,25 @@ Servicios para gestión de ahorros
 Contiene toda la lógica de negocio relacionada con ahorros
 """
 from datetime import datetime
-from typing import List
+from typing import Any, Dict, List, Optional
 from fastapi import HTTPException, status
 from odmantic import AIOEngine, ObjectId
 from models.models import Saving, User, SavingType
-from models.schemas import SavingCreate, SavingUpdate, SavingResponse
+from models.schemas import BulkCreate, BulkCreateResponse, SavingCreate, SavingUpdate, SavingResponse
+from services.rollup_service import RollupService
+from services.bulk import validate_items, insert_documents, build_response
+from services.ownership import update_owned, delete_owned, raise_not_owned
+from core.pagination import keyset_filter, keyset_sort
+from core.fields import find_projected
+from core.serialization import SchemaEncoder
+from core.metrics import track_db_operation
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Codificador de listados: documento de MongoDB → SavingResponse
+RESPONSE_ENCODER = SchemaEncoder(SavingResponse, Saving)
+
 class SavingService:
     """
     Servicio para operaciones con ahorros
@@ -19,7 +29,9 @@ class SavingService:
     
     def __init__(self, db: AIOEngine):
         self.db = db
+        self.rollups = RollupService(db)
     
+    @track_db_operation
     async def create_saving(self, saving_data: SavingCreate, user: User) -> SavingResponse:
         """
         Crear un nuevo ahorro
@@ -42,8 +54,10 @@ class SavingService:
             }
             new_saving = Saving.model_validate(saving_data_dict)
             
-            # Guardar en base de datos
-            saved_saving = await self.db.save(new_saving)
+            # Guardar en base de datos (el alta queda pendiente en los acumulados hasta aplicar su delta)
+            async with self.rollups.pending(user.id) as rollup:
+                saved_saving = await self.db.save(new_saving)
+                await rollup.apply(RollupService.saving_delta(saved_saving))
             
             logger.info(f"Ahorro creado exitosamente para usuario {user.email}: ${saved_saving.amount}")
             
@@ -67,37 +81,88 @@ class SavingService:
                 detail="Error interno del servidor"
             )
     
-    async def get_user_savings(self, user: User, skip: int = 0, limit: int = 100) -> List[SavingResponse]:
+    @track_db_operation
+    async def create_savings_bulk(self, bulk_data: BulkCreate, user: User) -> BulkCreateResponse:
         """
-        Obtener ahorros del usuario
+        Crear muchos ahorros en un solo lote
+        
+        Los elementos inválidos se reportan sin detener el lote (salvo con ordered); los válidos se
+        escriben con un solo insert_many y los acumulados se actualizan una vez
         """
         try:
-            savings = await self.db.find(
-                Saving, 
-                Saving.user_id == user.id,
-                skip=skip, 
-                limit=limit
+            now = datetime.utcnow()
+            documents, results = validate_items(
+                SavingCreate,
+                bulk_data.items,
+                lambda data: {
+                    "user_id": user.id,
+                    "date": data.date if data.date else now,
+                    "amount": data.amount,
+                    "transaction_type": (data.transaction_type or SavingType.DEPOSITO).value,
+                    "purpose": data.purpose,
+                    "goal_amount": data.goal_amount,
+                    "notes": data.notes,
+                    "created_at": now,
+                    "updated_at": now
+                },
+                ordered=bulk_data.ordered
             )
             
-            # Ordenar por fecha (más recientes primero)
-            savings = sorted(savings, key=lambda x: x.date, reverse=True)
-            
-            return [
-                SavingResponse(
-                    id=str(saving.id),
-                    user_id=str(saving.user_id),
-                    date=saving.date,
-                    amount=saving.amount,
-                    transaction_type=getattr(saving, 'transaction_type', SavingType.DEPOSITO),
-                    purpose=saving.purpose,
-                    goal_amount=saving.goal_amount,
-                    notes=saving.notes,
-                    created_at=saving.created_at,
-                    updated_at=saving.updated_at
+            async with self.rollups.pending(user.id) as rollup:
+                inserted, written = await insert_documents(
+                    self.db.get_collection(Saving), documents, bulk_data.ordered
                 )
-                for saving in savings
-            ]
+                await rollup.apply(
+                    RollupService.merge_deltas(*(RollupService.saving_delta(document) for document in inserted))
+                )
+            results.extend(written)
+            
+            response = BulkCreateResponse(**build_response(results))
+            logger.info(
+                f"Alta masiva de ahorros para usuario {user.email}: "
+                f"{response.created} creados, {response.failed} fallidos"
+            )
+            return response
+            
+        except Exception as e:
+            logger.error(f"Error en alta masiva de ahorros: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Error interno del servidor"
+            )
+    
+    @track_db_operation
+    async def get_user_savings(
+        self,
+        user: User,
+        skip: int = 0,
+        limit: int = 100,
+        after: Optional[str] = None,
+        fields: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Obtener ahorros del usuario, más recientes primero
+        
+        Con `after` (cursor de la página anterior) la consulta continúa sobre el
+        índice desde esa posición en lugar de omitir registros con skip.
+        Los registros se retornan como diccionarios con la forma de SavingResponse
+        (o solo con `fields`), leídos directamente de los documentos de MongoDB
+        """
+        try:
+            return await find_projected(
+                self.db,
+                Saving,
+                Saving.user_id == user.id,
+                *keyset_filter(Saving, after),
+                encoder=RESPONSE_ENCODER,
+                fields=fields,
+                sort=keyset_sort(Saving),
+                skip=skip,
+                limit=limit
+            )
             
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Error obteniendo ahorros: {e}")
             raise HTTPException(
@@ -105,6 +170,7 @@ class SavingService:
                 detail="Error interno del servidor"
             )
     
+    @track_db_operation
     async def get_saving_by_id(self, saving_id: str, user: User) -> SavingResponse:
         """
         Obtener un ahorro específico por ID
@@ -147,26 +213,12 @@ class SavingService:
                 detail="Error interno del servidor"
             )
     
+    @track_db_operation
     async def update_saving(self, saving_id: str, update_data: SavingUpdate, user: User) -> SavingResponse:
         """
         Actualizar un ahorro
         """
         try:
-            saving = await self.db.find_one(Saving, Saving.id == ObjectId(saving_id))
-            
-            if not saving:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail="Ahorro no encontrado"
-                )
-            
-            # Verificar que el ahorro pertenece al usuario
-            if saving.user_id != user.id:
-                raise HTTPException(
-                    status_code=status.HTTP_403_FORBIDDEN,
-                    detail="No tienes permisos para modificar este ahorro"
-                )
-            
             # Actualizar campos que no son None
             update_fields = {}
             if update_data.date is not None:
@@ -185,11 +237,24 @@ class SavingService:
             if update_fields:
                 update_fields["updated_at"] = datetime.utcnow()
                 
-                # Actualizar ahorro
-                for field, value in update_fields.items():
-                    setattr(saving, field, value)
+                # Actualizar solo los campos modificados, verificando la pertenencia en el mismo filtro
+                collection = self.db.get_collection(Saving)
+                async with self.rollups.pending(user.id) as rollup:
+                    previous = await update_owned(collection, ObjectId(saving_id), user.id, update_fields)
+                    if previous is not None:
+                        updated_saving = Saving.model_validate_doc({**previous, **update_fields})
+                        await rollup.apply(
+                            RollupService.merge_deltas(
+                                RollupService.saving_delta(previous, -1),
+                                RollupService.saving_delta(updated_saving)
+                            )
+                        )
+                if previous is None:
+                    await raise_not_owned(
+                        collection, ObjectId(saving_id),
+                        "Ahorro no encontrado", "No tienes permisos para modificar este ahorro"
+                    )
                 
-                updated_saving = await self.db.save(saving)
                 logger.info(f"Ahorro actualizado exitosamente: {saving_id}")
                 
                 return SavingResponse(
@@ -217,28 +282,23 @@ class SavingService:
                 detail="Error interno del servidor"
             )
     
+    @track_db_operation
     async def delete_saving(self, saving_id: str, user: User) -> bool:
         """
         Eliminar un ahorro
         """
         try:
-            saving = await self.db.find_one(Saving, Saving.id == ObjectId(saving_id))
-            
-            if not saving:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail="Ahorro no encontrado"
-                )
-            
-            # Verificar que el ahorro pertenece al usuario
-            if saving.user_id != user.id:
-                raise HTTPException(
-                    status_code=status.HTTP_403_FORBIDDEN,
-                    detail="No tienes permisos para eliminar este ahorro"
+            # Eliminar ahorro, verificando la pertenencia en el mismo filtro
+            collection = self.db.get_collection(Saving)
+            async with self.rollups.pending(user.id) as rollup:
+                deleted = await delete_owned(collection, ObjectId(saving_id), user.id)
+                if deleted is not None:
+                    await rollup.apply(RollupService.saving_delta(deleted, -1))
+            if deleted is None:
+                await raise_not_owned(
+                    collection, ObjectId(saving_id),
+                    "Ahorro no encontrado", "No tienes permisos para eliminar este ahorro"
                 )
-            
-            # Eliminar ahorro
-            await self.db.delete(saving)
             logger.info(f"Ahorro eliminado exitosamente: {saving_id}")
             
             return True
@@ -0,0 +1,533 @@
+"""
+Servicios para estadísticas y resúmenes financieros
+Calcula los agregados directamente en MongoDB mediante pipelines de agregación
+"""
+from datetime import datetime
+from typing import Any, Awaitable, Dict, List, Optional, Set, Tuple
+from fastapi import HTTPException, status
+from odmantic import AIOEngine, ObjectId
+from models.models import Expense, Income, Saving, SavingType, User
+from models.schemas import FinancialSummary, ExpenseResponse, IncomeResponse, SavingResponse
+from services.rollup_service import RollupService, DEFAULT_CATEGORY, empty_rollup, escape_key
+from core.config import settings
+from core.pagination import keyset_sort
+from core.metrics import track_db_operation
+import asyncio
+import calendar
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Intentos de reconstrucción de acumulados antes de rendirse por escrituras concurrentes
+ROLLUP_REBUILD_ATTEMPTS = 10
+# Espera base entre intentos mientras hay escrituras pendientes (crece con cada intento)
+ROLLUP_REBUILD_WAIT_SECONDS = 0.05
+
+# Expresión que reemplaza categorías nulas o vacías por la categoría por defecto
+_CATEGORY_EXPR = {
+    "$cond": [
+        {"$gt": [{"$ifNull": ["$category", ""]}, ""]},
+        "$category",
+        DEFAULT_CATEGORY
+    ]
+}
+
+# Monto con signo de un movimiento de ahorro: depósitos suman, retiros restan
+_SIGNED_SAVING_EXPR = {
+    "$cond": [
+        {"$eq": ["$transaction_type", SavingType.RETIRO.value]},
+        {"$multiply": ["$amount", -1]},
+        "$amount"
+    ]
+}
+
+_TOTAL_AND_COUNT = {"total": {"$sum": "$amount"}, "count": {"$sum": 1}}
+
+# Llave de la cubeta mensual (YYYY-MM) de cada registro
+_MONTH_EXPR = {"$dateToString": {"format": "%Y-%m", "date": "$date"}}
+
+# Secciones del reporte mensual que se pueden pedir con include=
+REPORT_SECTIONS = frozenset({"totals", "stats", "expenses", "incomes", "savings"})
+
+# Modelo de cada lista de movimientos del reporte mensual
+_REPORT_MODELS = {"expenses": Expense, "incomes": Income, "savings": Saving}
+
+# Conversión de cada modelo a su esquema de respuesta
+_REPORT_RESPONSES = {
+    "expenses": lambda expense: ExpenseResponse(
+        id=str(expense.id),
+        user_id=str(expense.user_id),
+        date=expense.date,
+        description=expense.description,
+        amount=expense.amount,
+        payment_type=expense.payment_type,
+        category=expense.category,
+        notes=expense.notes,
+        created_at=expense.created_at,
+        updated_at=expense.updated_at
+    ),
+    "incomes": lambda income: IncomeResponse(
+        id=str(income.id),
+        user_id=str(income.user_id),
+        date=income.date,
+        description=income.description,
+        amount=income.amount,
+        source=income.source,
+        is_recurring=income.is_recurring,
+        notes=income.notes,
+        created_at=income.created_at,
+        updated_at=income.updated_at
+    ),
+    "savings": lambda saving: SavingResponse(
+        id=str(saving.id),
+        user_id=str(saving.user_id),
+        date=saving.date,
+        amount=saving.amount,
+        transaction_type=saving.transaction_type,
+        purpose=saving.purpose,
+        goal_amount=saving.goal_amount,
+        notes=saving.notes,
+        created_at=saving.created_at,
+        updated_at=saving.updated_at
+    )
+}
+
+class StatsService:
+    """
+    Servicio para estadísticas financieras
+    Las lecturas usan los acumulados por usuario; cuando hay que recalcularlos
+    todas las sumas se resuelven en MongoDB y solo viaja el documento de resultado
+    """
+
+    def __init__(self, db: AIOEngine):
+        self.db = db
+        self.rollups = RollupService(db)
+
+    async def _fan_out(self, queries: Dict[str, Awaitable[Any]]) -> Tuple[Dict[str, Any], List[str]]:
+        """
+        Ejecutar consultas independientes en paralelo, cada una con su propio tiempo límite
+
+        Retorna (resultados por nombre, nombres de las consultas que fallaron o expiraron);
+        una consulta fallida no cancela a las demás
+        """
+        timeout = settings.stats_query_timeout_seconds
+        outcomes = await asyncio.gather(
+            *(asyncio.wait_for(query, timeout) for query in queries.values()),
+            return_exceptions=True
+        )
+
+        results: Dict[str, Any] = {}
+        failed: List[str] = []
+        for name, outcome in zip(queries, outcomes):
+            if isinstance(outcome, Exception):
+                logger.error(f"Consulta de estadísticas '{name}' falló: {type(outcome).__name__} {outcome}")
+                failed.append(name)
+            elif isinstance(outcome, BaseException):
+                raise outcome
+            else:
+                results[name] = outcome
+        return results, failed
+
+    async def _aggregate_one(self, model, pipeline: list) -> Dict[str, Any]:
+        """
+        Ejecutar un pipeline que produce un único documento de resultado
+        """
+        collection = self.db.get_collection(model)
+        result = await collection.aggregate(pipeline).to_list(length=1)
+        return result[0] if result else {}
+
+    @track_db_operation
+    async def expense_breakdown(self, user_id: ObjectId) -> Dict[str, Any]:
+        """
+        Total de gastos y desglose por categoría y tipo de pago en una sola agregación
+        """
+        pipeline = [
+            {"$match": {"user_id": user_id}},
+            {"$facet": {
+                "totals": [
+                    {"$group": {"_id": None, **_TOTAL_AND_COUNT}}
+                ],
+                "by_category": [
+                    {"$group": {"_id": _CATEGORY_EXPR, **_TOTAL_AND_COUNT}}
+                ],
+                "by_payment_type": [
+                    {"$group": {"_id": "$payment_type", **_TOTAL_AND_COUNT}}
+                ],
+                "by_month": [
+                    {"$group": {"_id": _MONTH_EXPR, **_TOTAL_AND_COUNT}}
+                ]
+            }}
+        ]
+        facets = await self._aggregate_one(Expense, pipeline)
+        totals = (facets.get("totals") or [{}])[0]
+
+        return {
+            "total": totals.get("total", 0),
+            "count": totals.get("count", 0),
+            "by_category": {
+                row["_id"]: {"total": row["total"], "count": row["count"]}
+                for row in facets.get("by_category", [])
+            },
+            "by_payment_type": {
+                row["_id"]: {"total": row["total"], "count": row["count"]}
+                for row in facets.get("by_payment_type", [])
+            },
+            "by_month": {
+                row["_id"]: {"total": row["total"], "count": row["count"]}
+                for row in facets.get("by_month", [])
+            }
+        }
+
+    @track_db_operation
+    async def income_totals(self, user_id: ObjectId) -> Dict[str, Any]:
+        """
+        Total y número de ingresos del usuario, con desglose mensual
+        """
+        pipeline = [
+            {"$match": {"user_id": user_id}},
+            {"$group": {"_id": _MONTH_EXPR, **_TOTAL_AND_COUNT}}
+        ]
+        collection = self.db.get_collection(Income)
+        by_month = {
+            row["_id"]: {"total": row["total"], "count": row["count"]}
+            for row in await collection.aggregate(pipeline).to_list(length=None)
+        }
+        return {
+            "total": sum(values["total"] for values in by_month.values()),
+            "count": sum(values["count"] for values in by_month.values()),
+            "by_month": by_month
+        }
+
+    @track_db_operation
+    async def saving_totals(self, user_id: ObjectId) -> Dict[str, Any]:
+        """
+        Ahorro neto (depósitos - retiros) y número de movimientos del usuario,
+        con depósitos y retiros por mes
+        """
+        is_withdrawal = {"$eq": ["$transaction_type", SavingType.RETIRO.value]}
+        pipeline = [
+            {"$match": {"user_id": user_id}},
+            {"$group": {
+                "_id": _MONTH_EXPR,
+                "total": {"$sum": _SIGNED_SAVING_EXPR},
+                "deposits": {"$sum": {"$cond": [is_withdrawal, 0, "$amount"]}},
+                "withdrawals": {"$sum": {"$cond": [is_withdrawal, "$amount", 0]}},
+                "count": {"$sum": 1}
+            }}
+        ]
+        collection = self.db.get_collection(Saving)
+        by_month = {
+            row.pop("_id"): row
+            for row in await collection.aggregate(pipeline).to_list(length=None)
+        }
+        return {
+            "total": sum(values["total"] for values in by_month.values()),
+            "count": sum(values["count"] for values in by_month.values()),
+            "by_month": by_month
+        }
+
+    # === ACUMULADOS ===
+
+    async def compute_rollup(self, user_id: ObjectId) -> Dict[str, Any]:
+        """
+        Recalcular el documento de acumulados de un usuario desde los datos crudos
+        """
+        results, failed = await self._fan_out({
+            "expenses": self.expense_breakdown(user_id),
+            "incomes": self.income_totals(user_id),
+            "savings": self.saving_totals(user_id)
+        })
+        # Un acumulado parcial no se puede guardar: las tres agregaciones son necesarias
+        if failed:
+            raise RuntimeError(f"No se pudieron recalcular los acumulados ({', '.join(failed)})")
+        expenses, incomes, savings = results["expenses"], results["incomes"], results["savings"]
+
+        rollup = empty_rollup()
+        rollup.update({
+            "total_expenses": expenses["total"],
+            "expenses_count": expenses["count"],
+            "total_incomes": incomes["total"],
+            "incomes_count": incomes["count"],
+            "total_savings": savings["total"],
+            "savings_count": savings["count"],
+            "expenses_by_category": {
+                escape_key(category): values
+                for category, values in expenses["by_category"].items()
+            },
+            "expenses_by_payment_type": {
+                escape_key(payment_type): values
+                for payment_type, values in expenses["by_payment_type"].items()
+            }
+        })
+
+        months = rollup["months"]
+        for month, values in expenses["by_month"].items():
+            bucket = months.setdefault(month, {})
+            bucket["expenses"] = values["total"]
+            bucket["expenses_count"] = values["count"]
+        for month, values in incomes["by_month"].items():
+            bucket = months.setdefault(month, {})
+            bucket["incomes"] = values["total"]
+            bucket["incomes_count"] = values["count"]
+        for month, values in savings["by_month"].items():
+            bucket = months.setdefault(month, {})
+            bucket["savings_deposits"] = values["deposits"]
+            bucket["savings_withdrawals"] = values["withdrawals"]
+            bucket["savings_count"] = values["count"]
+
+        return rollup
+
+    async def rebuild_rollup(self, user_id: ObjectId) -> Dict[str, Any]:
+        """
+        Recalcular y guardar el documento de acumulados de un usuario
+
+        Espera a que terminen las escrituras pendientes, lee `version` antes de
+        agregar y el reemplazo solo se aplica si no cambió; si una escritura
+        empezó o terminó entretanto se vuelve a calcular.
+        """
+        for attempt in range(1, ROLLUP_REBUILD_ATTEMPTS + 1):
+            current = await self.rollups.get(user_id)
+            if self.rollups.has_active_writes(current):
+                await asyncio.sleep(ROLLUP_REBUILD_WAIT_SECONDS * attempt)
+                continue
+            version = current.get("version") if current is not None else None
+            rollup = await self.compute_rollup(user_id)
+            if await self.rollups.replace(user_id, rollup, version):
+                return rollup
+            logger.info(f"Acumulados del usuario {user_id} modificados durante la reconstrucción (intento {attempt})")
+        raise RuntimeError(f"No se pudieron reconstruir los acumulados del usuario {user_id}: escrituras concurrentes")
+
+    async def verify_rollup(self, user_id: ObjectId) -> List[Tuple[str, Any, Any]]:
+        """
+        Comparar el acumulado guardado contra los datos crudos y reportar diferencias
+        """
+        stored = await self.rollups.get(user_id) or {}
+        expected = await self.compute_rollup(user_id)
+        return self.rollups.diff(stored, expected)
+
+    @track_db_operation
+    async def get_rollup(self, user_id: ObjectId) -> Dict[str, Any]:
+        """
+        Obtener el acumulado de un usuario, construyéndolo si aún no existe
+        (o si solo tiene los deltas aplicados antes de la primera reconstrucción)
+        """
+        rollup = await self.rollups.get(user_id)
+        if not self.rollups.is_complete(rollup):
+            rollup = await self.rebuild_rollup(user_id)
+        return rollup
+
+    async def get_financial_summary(self, user: User) -> FinancialSummary:
+        """
+        Obtener resumen financiero general del usuario
+        """
+        try:
+            rollup = await self.get_rollup(user.id)
+
+            total_expenses = rollup["total_expenses"]
+            total_incomes = rollup["total_incomes"]
+            total_savings = rollup["total_savings"]
+
+            balance = total_incomes - total_expenses  # Balance = Ingresos - Gastos (los ahorros no se restan)
+
+            return FinancialSummary(
+                total_incomes=round(total_incomes, 2),
+                total_expenses=round(total_expenses, 2),
+                total_savings=round(total_savings, 2),
+                balance=round(balance, 2),
+                expenses_by_category={
+                    category: round(values["total"], 2)
+                    for category, values in self.rollups.breakdown(rollup, "expenses_by_category").items()
+                },
+                expenses_by_payment_type={
+                    payment_type: round(values["total"], 2)
+                    for payment_type, values in self.rollups.breakdown(rollup, "expenses_by_payment_type").items()
+                }
+            )
+
+        except Exception as e:
+            logger.error(f"Error obteniendo resumen financiero: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Error interno del servidor"
+            )
+
+    async def get_monthly_report(
+        self,
+        user: User,
+        year: int,
+        month: int,
+        include: Optional[Set[str]] = None,
+        page: int = 1,
+        limit: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Obtener reporte mensual detallado
+
+        - include: secciones a incluir (ver REPORT_SECTIONS); por defecto todas.
+          Las listas que no se piden no se consultan en MongoDB
+        - page/limit: página de cada lista de movimientos (más recientes primero);
+          sin limit se devuelven todos los movimientos del mes
+
+        Los totales y conteos se calculan con agregaciones, sin traer los documentos.
+        Todas las consultas corren en paralelo; si alguna falla o expira, el reporte
+        se entrega sin esa parte y se indica en `failed_sections` (con los nombres
+        de `include`). Los totales y estadísticas que no se pudieron calcular van
+        en null, nunca en 0
+        """
+        include = REPORT_SECTIONS if include is None else include
+        try:
+            # Calcular fechas de inicio y fin del mes
+            start_date = datetime(year, month, 1)
+            last_day = calendar.monthrange(year, month)[1]
+            end_date = datetime(year, month, last_day, 23, 59, 59)
+
+            def month_filter(model) -> tuple:
+                return (model.user_id == user.id, model.date >= start_date, model.date <= end_date)
+
+            def month_totals(model):
+                pipeline = [
+                    {"$match": {"user_id": user.id, "date": {"$gte": start_date, "$lte": end_date}}},
+                    {"$group": {"_id": None, **_TOTAL_AND_COUNT}}
+                ]
+                return self._aggregate_one(model, pipeline)
+
+            def month_page(model):
+                # Un registro extra indica si hay más páginas
+                return self.db.find(
+                    model,
+                    *month_filter(model),
+                    sort=keyset_sort(model),
+                    skip=(page - 1) * limit if limit else 0,
+                    limit=limit + 1 if limit else None
+                )
+
+            queries = {}
+            for section, model in _REPORT_MODELS.items():
+                if include & {"totals", "stats"}:
+                    queries[f"{section}_totals"] = month_totals(model)
+                if section in include:
+                    queries[section] = month_page(model)
+
+            results, failed = await self._fan_out(queries)
+            if queries and not results:
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="No se pudo obtener el reporte mensual, intenta de nuevo"
+                )
+
+            report: Dict[str, Any] = {
+                "month": calendar.month_name[month],
+                "year": year
+            }
+
+            if include & {"totals", "stats"}:
+                # Secciones cuyo total no se pudo calcular: sus valores van en None
+                totals = {
+                    section: results.get(f"{section}_totals")
+                    for section in _REPORT_MODELS
+                }
+
+                def value(section: str, key: str) -> Optional[float]:
+                    return None if totals[section] is None else totals[section].get(key, 0)
+
+                def average(section: str) -> Optional[float]:
+                    total, count = value(section, "total"), value(section, "count")
+                    if total is None:
+                        return None
+                    return round(total / count, 2) if count else 0
+
+                def rounded(amount: Optional[float]) -> Optional[float]:
+                    return None if amount is None else round(amount, 2)
+
+                total_expenses = value("expenses", "total")
+                total_incomes = value("incomes", "total")
+                total_savings = value("savings", "total")
+
+                if "totals" in include:
+                    report.update({
+                        "total_incomes": rounded(total_incomes),
+                        "total_expenses": rounded(total_expenses),
+                        "total_savings": rounded(total_savings),
+                        "balance": (
+                            None if None in (total_incomes, total_expenses, total_savings)
+                            else round(total_incomes - total_expenses - total_savings, 2)
+                        )
+                    })
+
+                if "stats" in include:
+                    report["stats"] = {
+                        "expenses_count": value("expenses", "count"),
+                        "incomes_count": value("incomes", "count"),
+                        "savings_count": value("savings", "count"),
+                        "average_expense": average("expenses"),
+                        "average_income": average("incomes"),
+                        "average_saving": average("savings")
+                    }
+
+            pagination: Dict[str, Any] = {}
+            for section in _REPORT_MODELS:
+                if section not in include:
+                    continue
+                items = results.get(section, [])
+                has_more = bool(limit) and len(items) > limit
+                if has_more:
+                    items = items[:limit]
+                report[section] = [_REPORT_RESPONSES[section](item) for item in items]
+                pagination[section] = {"has_more": has_more}
+
+            if limit and pagination:
+                report["pagination"] = {"page": page, "limit": limit, **pagination}
+
+            # Nombres públicos (los de include) de las secciones afectadas
+            failed_sections: List[str] = []
+            for query_name in failed:
+                if query_name.endswith("_totals"):
+                    failed_sections.extend(section for section in ("totals", "stats") if section in include)
+                else:
+                    failed_sections.append(query_name)
+
+            report["partial"] = bool(failed)
+            report["failed_sections"] = list(dict.fromkeys(failed_sections))
+            return report
+
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Error obteniendo reporte mensual: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Error interno del servidor"
+            )
+
+    async def get_category_stats(self, user: User) -> Dict[str, Any]:
+        """
+        Obtener estadísticas de gastos por categoría, ordenadas por total gastado
+        """
+        try:
+            rollup = await self.get_rollup(user.id)
+
+            category_stats = {
+                category: {
+                    "total_amount": round(values["total"], 2),
+                    "count": values["count"],
+                    "average": round(values["total"] / values["count"], 2)
+                }
+                for category, values in self.rollups.breakdown(rollup, "expenses_by_category").items()
+            }
+
+            # Ordenar por total gastado
+            sorted_categories = dict(
+                sorted(category_stats.items(), key=lambda x: x[1]["total_amount"], reverse=True)
+            )
+
+            return {
+                "categories": sorted_categories,
+                "total_categories": len(sorted_categories)
+            }
+
+        except Exception as e:
+            logger.error(f"Error obteniendo categorías: {e}")
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Error interno del servidor"
+            )
@@ -8,8 +8,9 @@ from fastapi import HTTPException, status
 from odmantic import AIOEngine
 from models.models import User
 from models.schemas import UserCreate, UserResponse, Token, UserUpdate
-from core.security import security_utils, authenticate_user
+from core.security import security_utils, authenticate_user, invalidate_cached_user
 from core.config import settings
+from core.metrics import track_db_operation
 import logging
 
 logger = logging.getLogger(__name__)
@@ -23,6 +24,7 @@ class UserService:
     def __init__(self, db: AIOEngine):
         self.db = db
     
+    @track_db_operation
     async def create_user(self, user_data: UserCreate) -> UserResponse:
         """
         Crear un nuevo usuario
@@ -45,7 +47,7 @@ class UserService:
                 )
             
             # Crear hash de la contraseña
-            hashed_password = security_utils.get_password_hash(user_data.password)
+            hashed_password = await security_utils.get_password_hash_async(user_data.password)
             
             # Crear nuevo usuario usando model_validate
             user_data_dict = {
@@ -82,6 +84,7 @@ class UserService:
                 detail="Error interno del servidor"
             )
     
+    @track_db_operation
     async def login_user(self, email: str, password: str) -> Token:
         """
         Iniciar sesión de usuario
@@ -148,6 +151,7 @@ class UserService:
             created_at=user.created_at
         )
     
+    @track_db_operation
     async def update_user_profile(self, user: User, update_data: UserUpdate) -> UserResponse:
         """
         Actualizar perfil de usuario
@@ -175,11 +179,11 @@ class UserService:
             if update_fields:
                 update_fields["updated_at"] = datetime.utcnow()
                 
-                # Actualizar usuario
-                for field, value in update_fields.items():
-                    setattr(user, field, value)
-                
-                updated_user = await self.db.save(user)
+                # Actualizar una copia: el usuario recibido no cambia si el guardado falla
+                try:
+                    updated_user = await self.db.save(user.model_copy(update=update_fields))
+                finally:
+                    invalidate_cached_user(user.id)
                 logger.info(f"Usuario actualizado exitosamente: {updated_user.email}")
                 
                 return UserResponse(
@@ -203,30 +207,35 @@ class UserService:
                 detail="Error interno del servidor"
             )
     
+    @track_db_operation
     async def change_password(self, user: User, current_password: str, new_password: str) -> dict:
         """
         Cambiar contraseña del usuario
         """
         try:
             # Verificar que la contraseña actual sea correcta
-            if not security_utils.verify_password(current_password, user.hashed_password):
+            if not await security_utils.verify_password_async(current_password, user.hashed_password):
                 raise HTTPException(
                     status_code=status.HTTP_401_UNAUTHORIZED,
                     detail="La contraseña actual es incorrecta"
                 )
             
             # Verificar que la nueva contraseña sea diferente
-            if security_utils.verify_password(new_password, user.hashed_password):
+            if await security_utils.verify_password_async(new_password, user.hashed_password):
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
                     detail="La nueva contraseña debe ser diferente a la actual"
                 )
             
-            # Actualizar contraseña
-            user.hashed_password = security_utils.get_password_hash(new_password)
-            user.updated_at = datetime.utcnow()
-            
-            await self.db.save(user)
+            # Actualizar contraseña (en una copia, como en update_user_profile)
+            hashed_password = await security_utils.get_password_hash_async(new_password)
+            try:
+                await self.db.save(user.model_copy(update={
+                    "hashed_password": hashed_password,
+                    "updated_at": datetime.utcnow()
+                }))
+            finally:
+                invalidate_cached_user(user.id)
             logger.info(f"Contraseña actualizada exitosamente para: {user.email}")
             
             return {"message": "Contraseña actualizada exitosamente"}
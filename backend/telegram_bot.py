@@ -5,25 +5,32 @@ Bot que permite gestionar finanzas personales mediante mensajes de Telegram
 import os
 import asyncio
 import logging
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Dict, Optional
+import httpx
 from telegram import Update
 from telegram.ext import (
     Application,
+    BaseUpdateProcessor,
     CommandHandler,
     MessageHandler,
     filters,
     ContextTypes
 )
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
 from dotenv import load_dotenv
 
 # Importar utilidades del MCP
-from mcp_utils.api_client import APIClient
+from mcp_utils.api_client import APIClient, CircuitOpenError
+from telegram_sessions import Session, create_session_store
 from mcp_utils.utils import (
-    parse_amount,
-    infer_payment_type,
-    infer_category,
+    classify_message,
     format_currency,
-    is_recurring,
-    parse_transaction_type
+    parse_transactions,
+    submit_transactions
 )
 
 # Configurar logging
@@ -35,14 +42,61 @@ logger = logging.getLogger(__name__)
 
 load_dotenv()
 
-# Almacenar tokens de usuarios autenticados
-# En producción, usar Redis o base de datos
-user_tokens = {}
+LOGIN_REQUIRED = "❌ Debes iniciar sesión primero con `/login email password`"
+SESSION_EXPIRED = "⌛ Tu sesión expiró. Vuelve a iniciar sesión con `/login email password`"
+
+class PerChatUpdateProcessor(BaseUpdateProcessor):
+    """
+    Procesa updates de forma concurrente (hasta `max_concurrent_updates` a la vez)
+    pero en orden dentro de cada chat: los mensajes de un mismo usuario esperan
+    su turno, mientras que los de otros usuarios no se bloquean entre sí
+
+    El turno del chat se toma antes que el cupo de concurrencia, así que los
+    updates en espera de un chat lento no ocupan cupos de los demás chats.
+    """
+    
+    def __init__(self, max_concurrent_updates: int):
+        super().__init__(max_concurrent_updates)
+        # chat_id -> [lock, updates esperando o en proceso]
+        self._chat_locks: Dict[int, list] = {}
+    
+    async def process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        chat = update.effective_chat if isinstance(update, Update) else None
+        if chat is None:
+            await super().process_update(update, coroutine)
+            return
+        
+        entry = self._chat_locks.setdefault(chat.id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                # El cupo (semáforo de BaseUpdateProcessor) se pide ya con el turno del chat
+                await super().process_update(update, coroutine)
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._chat_locks[chat.id]
+    
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        await coroutine
+    
+    async def initialize(self) -> None:
+        """No requiere recursos"""
+    
+    async def shutdown(self) -> None:
+        """No requiere recursos"""
 
 class TelegramBot:
     def __init__(self):
         self.telegram_token = os.getenv("TELEGRAM_BOT_TOKEN")
         self.api_base_url = os.getenv("API_BASE_URL", "http://localhost:8000/api/v1")
+        self.max_workers = int(os.getenv("TELEGRAM_MAX_WORKERS", "32"))
+        # Webhook: URL pública donde Telegram envía los updates (sin ella se usa polling)
+        self.webhook_url = os.getenv("TELEGRAM_WEBHOOK_URL")
+        self.webhook_path = os.getenv("TELEGRAM_WEBHOOK_PATH", "/telegram")
+        self.webhook_secret = os.getenv("TELEGRAM_WEBHOOK_SECRET")
+        # Tokens de los usuarios autenticados (ver telegram_sessions)
+        self.sessions = create_session_store()
         
         if not self.telegram_token:
             raise ValueError("TELEGRAM_BOT_TOKEN no configurado en variables de entorno")
@@ -94,32 +148,23 @@ Soy tu asistente financiero personal. Puedo ayudarte a:
         
         try:
             # Llamar al endpoint de login del backend
-            import httpx
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.api_base_url}/users/login",
-                    json={"email": email, "password": password}
-                )
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    token = data.get("access_token")
-                    
-                    # Guardar token del usuario
-                    user_tokens[user_id] = token
-                    
-                    await update.message.reply_text(
-                        "✅ **Sesión iniciada correctamente**\n\n"
-                        "Ahora puedes enviarme mensajes como:\n"
-                        "• 'Gasté $50 en café'\n"
-                        "• '¿Cuál es mi balance?'\n"
-                        "• 'Ahorra $1000 para vacaciones'",
-                        parse_mode='Markdown'
-                    )
-                else:
-                    await update.message.reply_text(
-                        "❌ Error al iniciar sesión. Verifica tu email y contraseña."
-                    )
+            token = await APIClient().login(email, password)
+            
+            # Guardar token del usuario
+            await self.sessions.set(user_id, Session.from_token(token))
+            
+            await update.message.reply_text(
+                "✅ **Sesión iniciada correctamente**\n\n"
+                "Ahora puedes enviarme mensajes como:\n"
+                "• 'Gasté $50 en café'\n"
+                "• '¿Cuál es mi balance?'\n"
+                "• 'Ahorra $1000 para vacaciones'",
+                parse_mode='Markdown'
+            )
+        except httpx.HTTPStatusError:
+            await update.message.reply_text(
+                "❌ Error al iniciar sesión. Verifica tu email y contraseña."
+            )
         except Exception as e:
             logger.error(f"Error en login: {e}")
             await update.message.reply_text(
@@ -132,8 +177,7 @@ Soy tu asistente financiero personal. Puedo ayudarte a:
             return
         
         user_id = update.effective_user.id
-        if user_id in user_tokens:
-            del user_tokens[user_id]
+        if await self.sessions.delete(user_id):
             await update.message.reply_text("✅ Sesión cerrada correctamente")
         else:
             await update.message.reply_text("No tenías una sesión activa")
@@ -168,28 +212,46 @@ Soy tu asistente financiero personal. Puedo ayudarte a:
 • "Muestra mis últimos gastos"
 • "Dame un resumen"
 
+**Varios movimientos a la vez (uno por línea):**
+• "gasté $200 en gasolina
+   recibí 15 mil de sueldo
+   ahorra 1k para vacaciones"
+
 💡 **Tip:** Escribe en lenguaje natural, el bot entenderá tu intención.
 """
         await update.message.reply_text(help_text, parse_mode='Markdown')
     
+    async def get_api(self, update: Update) -> Optional[APIClient]:
+        """
+        APIClient con el token del usuario
+        Si no hay sesión o ya expiró, pide iniciar sesión y retorna None
+        """
+        user_id = update.effective_user.id
+        session = await self.sessions.get(user_id)
+        if session is None:
+            await update.message.reply_text(LOGIN_REQUIRED, parse_mode='Markdown')
+            return None
+        if session.is_expired:
+            await self.sessions.delete(user_id)
+            await update.message.reply_text(SESSION_EXPIRED, parse_mode='Markdown')
+            return None
+        return APIClient(token=session.token)
+    
+    async def handle_unauthorized(self, update: Update) -> None:
+        """El backend rechazó el token (expirado o revocado): descartar la sesión"""
+        await self.sessions.delete(update.effective_user.id)
+        await update.message.reply_text(SESSION_EXPIRED, parse_mode='Markdown')
+    
     async def balance(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Comando /balance - Ver balance rápido"""
         if not update.message or not update.effective_user:
             return
         
-        user_id = update.effective_user.id
-        
-        if user_id not in user_tokens:
-            await update.message.reply_text(
-                "❌ Debes iniciar sesión primero con `/login`",
-                parse_mode='Markdown'
-            )
+        api = await self.get_api(update)
+        if api is None:
             return
         
         try:
-            api = APIClient()
-            api.token = user_tokens[user_id]
-            
             summary = await api.get_summary()
             
             balance_icon = "✅" if summary['balance'] >= 0 else "⚠️"
@@ -205,7 +267,12 @@ Soy tu asistente financiero personal. Puedo ayudarte a:
 """
             await update.message.reply_text(message, parse_mode='Markdown')
             
+        except CircuitOpenError as e:
+            await update.message.reply_text(f"⚠️ {e}")
         except Exception as e:
+            if isinstance(e, httpx.HTTPStatusError) and e.response.status_code == 401:
+                await self.handle_unauthorized(update)
+                return
             logger.error(f"Error al obtener balance: {e}")
             await update.message.reply_text(
                 "❌ Error al obtener tu balance. Intenta más tarde."
@@ -216,53 +283,60 @@ Soy tu asistente financiero personal. Puedo ayudarte a:
         if not update.message or not update.effective_user or not update.message.text:
             return
         
-        user_id = update.effective_user.id
         message = update.message.text.lower()
         
         # Verificar autenticación
-        if user_id not in user_tokens:
-            await update.message.reply_text(
-                "❌ Debes iniciar sesión primero con `/login email password`",
-                parse_mode='Markdown'
-            )
+        api = await self.get_api(update)
+        if api is None:
             return
         
         try:
-            # Procesar el mensaje con NLP
-            result = await self.process_nlp(user_id, message)
+            # Varias líneas: registrar el lote con una petición masiva por tipo
+            if len([line for line in update.message.text.splitlines() if line.strip()]) > 1:
+                result = await submit_transactions(api, parse_transactions(update.message.text))
+            else:
+                # Procesar el mensaje con NLP; la clave evita duplicados si Telegram reenvía el update
+                result = await self.process_nlp(api, message, f"telegram-{update.update_id}")
             await update.message.reply_text(result, parse_mode='Markdown')
             
+        except CircuitOpenError as e:
+            await update.message.reply_text(f"⚠️ {e}")
         except Exception as e:
+            if isinstance(e, httpx.HTTPStatusError) and e.response.status_code == 401:
+                await self.handle_unauthorized(update)
+                return
             logger.error(f"Error procesando mensaje: {e}")
             await update.message.reply_text(
                 "❌ No pude procesar tu mensaje. Usa `/ayuda` para ver ejemplos.",
                 parse_mode='Markdown'
             )
     
-    async def process_nlp(self, user_id: int, message: str) -> str:
-        """Procesar mensaje con NLP y ejecutar acción correspondiente"""
+    async def process_nlp(self, api: APIClient, message: str, idempotency_key: Optional[str] = None) -> str:
+        """
+        Procesar mensaje con NLP y ejecutar acción correspondiente con el API client del usuario
+        `idempotency_key` se envía en las altas para que un mismo mensaje se registre una sola vez
+        """
         
-        # Configurar API client con el token del usuario
-        api = APIClient()
-        api.token = user_tokens[user_id]
+        # Detectar intención, categoría, tipo de pago y monto en una sola pasada
+        parsed = classify_message(message)
+        amount = parsed.amount
         
-        # Detectar intención
-        if any(word in message for word in ['gast', 'compré', 'pagué', 'compr']):
+        if parsed.intent == "gasto":
             # REGISTRAR GASTO
-            amount = parse_amount(message)
             if not amount:
                 return "❌ No pude detectar el monto. Ejemplo: 'Gasté $200 en gasolina'"
             
-            payment_type = infer_payment_type(message)
-            category = infer_category(message)
+            payment_type = parsed.payment_type
+            category = parsed.category
             description = message.replace('gasté', '').replace('compré', '').replace('pagué', '')
-            description = description.replace(str(amount), '').replace('$', '').strip()
+            description = description.replace(parsed.amount_text, '').replace('$', '').strip()
             
             result = await api.create_expense(
                 description=description or "Gasto desde Telegram",
                 amount=amount,
                 payment_type=payment_type,
-                category=category
+                category=category,
+                idempotency_key=idempotency_key
             )
             
             return f"""
@@ -274,20 +348,20 @@ Soy tu asistente financiero personal. Puedo ayudarte a:
 📂 Categoría: {category}
 """
         
-        elif any(word in message for word in ['ingreso', 'recib', 'cobr', 'salario', 'sueldo']):
+        elif parsed.intent == "ingreso":
             # REGISTRAR INGRESO
-            amount = parse_amount(message)
             if not amount:
                 return "❌ No pude detectar el monto. Ejemplo: 'Recibí $5000 de salario'"
             
-            is_rec = is_recurring(message)
+            is_rec = parsed.is_recurring
             description = message.replace('recibí', '').replace('cobré', '').replace('ingreso', '')
-            description = description.replace(str(amount), '').replace('$', '').strip()
+            description = description.replace(parsed.amount_text, '').replace('$', '').strip()
             
             result = await api.create_income(
                 description=description or "Ingreso desde Telegram",
                 amount=amount,
-                is_recurring=is_rec
+                is_recurring=is_rec,
+                idempotency_key=idempotency_key
             )
             
             recurring_text = "📅 Recurrente mensual" if is_rec else "📅 Ingreso único"
@@ -300,25 +374,25 @@ Soy tu asistente financiero personal. Puedo ayudarte a:
 {recurring_text}
 """
         
-        elif any(word in message for word in ['ahorro', 'ahorra', 'deposita', 'retira', 'retiro']):
+        elif parsed.intent == "ahorro":
             # REGISTRAR AHORRO
-            amount = parse_amount(message)
             if not amount:
                 return "❌ No pude detectar el monto. Ejemplo: 'Ahorra $1000 para vacaciones'"
             
-            trans_type = parse_transaction_type(message)
+            trans_type = parsed.transaction_type
             is_withdrawal = trans_type == "retiro"
             
             # Extraer propósito
             purpose = message
-            for word in ['ahorra', 'ahorro', 'deposita', 'retira', 'retiro', 'para', str(amount), '$']:
+            for word in ['ahorra', 'ahorro', 'deposita', 'retira', 'retiro', 'para', parsed.amount_text, '$']:
                 purpose = purpose.replace(word, '')
             purpose = purpose.strip() or "Ahorro desde Telegram"
             
             result = await api.create_saving(
                 amount=amount,
                 purpose=purpose,
-                transaction_type=trans_type
+                transaction_type=trans_type,
+                idempotency_key=idempotency_key
             )
             
             action = "💸 Retiro" if is_withdrawal else "💰 Depósito"
@@ -330,7 +404,7 @@ Soy tu asistente financiero personal. Puedo ayudarte a:
 🎯 Propósito: {purpose}
 """
         
-        elif any(word in message for word in ['balance', 'finanzas', 'resumen', 'cómo van']):
+        elif parsed.intent == "resumen":
             # CONSULTAR RESUMEN
             summary = await api.get_summary()
             
@@ -346,9 +420,9 @@ Soy tu asistente financiero personal. Puedo ayudarte a:
 💰 Ahorros: {format_currency(summary['total_savings'])}
 """
         
-        elif any(word in message for word in ['últimos gastos', 'gastos recientes', 'mis gastos']):
+        elif parsed.intent == "listar_gastos":
             # LISTAR GASTOS
-            expenses = await api.get_expenses(limit=5)
+            expenses = await api.get_expenses(limit=5, fields="amount,description")
             
             if not expenses:
                 return "📋 No tienes gastos registrados aún."
@@ -369,12 +443,21 @@ Soy tu asistente financiero personal. Puedo ayudarte a:
 Usa `/ayuda` para ver más ejemplos.
 """
     
-    def run(self):
-        """Iniciar el bot"""
-        if not self.telegram_token:
-            raise ValueError("TELEGRAM_BOT_TOKEN no configurado")
-        
-        application = Application.builder().token(self.telegram_token).build()
+    async def shutdown(self, application: Application):
+        """Cerrar el cliente HTTP compartido al detener el bot"""
+        logger.info(f"Métricas del cliente API: {APIClient.metrics()}")
+        await APIClient.aclose()
+        await self.sessions.close()
+    
+    def build_application(self) -> Application:
+        """Crear la aplicación de Telegram con sus handlers"""
+        application = (
+            Application.builder()
+            .token(self.telegram_token)
+            .concurrent_updates(PerChatUpdateProcessor(self.max_workers))
+            .post_shutdown(self.shutdown)
+            .build()
+        )
         
         # Comandos
         application.add_handler(CommandHandler("start", self.start))
@@ -387,11 +470,90 @@ Usa `/ayuda` para ver más ejemplos.
         application.add_handler(
             MessageHandler(filters.TEXT & ~filters.COMMAND, self.process_message)
         )
+        return application
+    
+    def create_webhook_app(self) -> Starlette:
+        """
+        Aplicación ASGI para el modo webhook
+        
+        Cada POST a TELEGRAM_WEBHOOK_PATH se encola y se responde de inmediato; los
+        updates se procesan en segundo plano con PerChatUpdateProcessor. Si
+        TELEGRAM_WEBHOOK_URL no está configurada no se registra el webhook en
+        Telegram, lo que permite probar localmente enviando updates con curl.
+        """
+        application = self.build_application()
+        
+        @asynccontextmanager
+        async def lifespan(app: Starlette):
+            await application.initialize()
+            if self.webhook_url:
+                await application.bot.set_webhook(
+                    url=f"{self.webhook_url.rstrip('/')}{self.webhook_path}",
+                    secret_token=self.webhook_secret,
+                    allowed_updates=Update.ALL_TYPES
+                )
+            await application.start()
+            logger.info("🤖 Bot de Telegram iniciado (webhook)")
+            try:
+                yield
+            finally:
+                await application.stop()
+                await application.shutdown()
+                # post_shutdown solo lo llaman run_polling/run_webhook
+                await self.shutdown(application)
+        
+        async def telegram_update(request: Request) -> Response:
+            if self.webhook_secret and request.headers.get("X-Telegram-Bot-Api-Secret-Token") != self.webhook_secret:
+                return Response(status_code=403)
+            try:
+                data = await request.json()
+            except ValueError:
+                return Response(status_code=400)
+            if not isinstance(data, dict):
+                return Response(status_code=400)
+            update = Update.de_json(data, application.bot)
+            await application.update_queue.put(update)
+            return Response(status_code=200)
+        
+        async def health(request: Request) -> JSONResponse:
+            return JSONResponse({
+                "status": "healthy",
+                "pending_updates": application.update_queue.qsize(),
+                "api_client": APIClient.metrics()
+            })
+        
+        return Starlette(
+            routes=[
+                Route(self.webhook_path, telegram_update, methods=["POST"]),
+                Route("/health", health, methods=["GET"])
+            ],
+            lifespan=lifespan
+        )
+    
+    def run(self):
+        """Iniciar el bot (webhook si hay TELEGRAM_WEBHOOK_URL, polling si no)"""
+        if not self.telegram_token:
+            raise ValueError("TELEGRAM_BOT_TOKEN no configurado")
+        
+        if self.webhook_url:
+            import uvicorn
+            uvicorn.run(
+                self.create_webhook_app(),
+                host=os.getenv("TELEGRAM_WEBHOOK_HOST", "0.0.0.0"),
+                port=int(os.getenv("TELEGRAM_WEBHOOK_PORT", "8443"))
+            )
+            return
+        
+        application = self.build_application()
         
         # Iniciar bot
-        logger.info("🤖 Bot de Telegram iniciado")
+        logger.info("🤖 Bot de Telegram iniciado (polling)")
         application.run_polling(allowed_updates=Update.ALL_TYPES)
 
+def create_webhook_app() -> Starlette:
+    """Factory para servidores ASGI: uvicorn telegram_bot:create_webhook_app --factory"""
+    return TelegramBot().create_webhook_app()
+
 if __name__ == "__main__":
     bot = TelegramBot()
     bot.run()
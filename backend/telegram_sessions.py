@@ -0,0 +1,233 @@
+"""
+Sesiones del bot de Telegram
+Guarda el token JWT de cada usuario de Telegram en un almacén intercambiable:
+memoria (LRU), SQLite local o MongoDB. Con SQLite o MongoDB las sesiones
+sobreviven a reinicios y se comparten entre procesos del bot; una caché local
+en memoria mantiene las consultas por debajo del milisegundo.
+"""
+import asyncio
+import os
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+from jose import JWTError, jwt
+from motor.motor_asyncio import AsyncIOMotorClient
+
+def token_expiry(token: str) -> Optional[float]:
+    """Fecha de expiración (timestamp) del JWT, o None si no la tiene o no se puede leer"""
+    try:
+        exp = jwt.get_unverified_claims(token).get("exp")
+    except JWTError:
+        return None
+    return float(exp) if exp is not None else None
+
+@dataclass
+class Session:
+    """Sesión de un usuario de Telegram"""
+    token: str
+    expires_at: Optional[float] = None
+
+    @classmethod
+    def from_token(cls, token: str) -> "Session":
+        return cls(token=token, expires_at=token_expiry(token))
+
+    @property
+    def is_expired(self) -> bool:
+        return self.expires_at is not None and self.expires_at <= time.time()
+
+class SessionStore(ABC):
+    """Almacén de sesiones por id de usuario de Telegram"""
+
+    @abstractmethod
+    async def get(self, user_id: int) -> Optional[Session]:
+        """Obtener la sesión del usuario (puede estar expirada)"""
+
+    @abstractmethod
+    async def set(self, user_id: int, session: Session) -> None:
+        """Guardar o reemplazar la sesión del usuario"""
+
+    @abstractmethod
+    async def delete(self, user_id: int) -> bool:
+        """Eliminar la sesión; retorna True si existía"""
+
+    async def close(self) -> None:
+        """Liberar recursos del almacén"""
+
+class MemorySessionStore(SessionStore):
+    """Sesiones en memoria del proceso, con tope LRU de entradas"""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._sessions: "OrderedDict[int, Session]" = OrderedDict()
+
+    async def get(self, user_id: int) -> Optional[Session]:
+        session = self._sessions.get(user_id)
+        if session is not None:
+            self._sessions.move_to_end(user_id)
+        return session
+
+    async def set(self, user_id: int, session: Session) -> None:
+        self._sessions[user_id] = session
+        self._sessions.move_to_end(user_id)
+        while len(self._sessions) > self.max_entries:
+            self._sessions.popitem(last=False)
+
+    async def delete(self, user_id: int) -> bool:
+        return self._sessions.pop(user_id, None) is not None
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Sesiones en un archivo SQLite local
+    Sobreviven a reinicios y se comparten entre procesos de la misma máquina
+    """
+
+    def __init__(self, path: str):
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS telegram_sessions ("
+            "user_id INTEGER PRIMARY KEY, token TEXT NOT NULL, expires_at REAL)"
+        )
+        self._lock = asyncio.Lock()
+
+    async def _execute(self, sql: str, params: tuple) -> sqlite3.Cursor:
+        # Una sola conexión: las operaciones se serializan y corren fuera del event loop
+        async with self._lock:
+            return await asyncio.to_thread(self._connection.execute, sql, params)
+
+    async def get(self, user_id: int) -> Optional[Session]:
+        cursor = await self._execute(
+            "SELECT token, expires_at FROM telegram_sessions WHERE user_id = ?", (user_id,)
+        )
+        row = cursor.fetchone()
+        return Session(token=row[0], expires_at=row[1]) if row else None
+
+    async def set(self, user_id: int, session: Session) -> None:
+        await self._execute(
+            "INSERT OR REPLACE INTO telegram_sessions (user_id, token, expires_at) VALUES (?, ?, ?)",
+            (user_id, session.token, session.expires_at)
+        )
+
+    async def delete(self, user_id: int) -> bool:
+        cursor = await self._execute("DELETE FROM telegram_sessions WHERE user_id = ?", (user_id,))
+        return cursor.rowcount > 0
+
+    async def close(self) -> None:
+        self._connection.close()
+
+class MongoSessionStore(SessionStore):
+    """
+    Sesiones en MongoDB, compartidas por todos los procesos del bot
+    Un índice TTL sobre expires_at elimina las sesiones expiradas
+    """
+
+    def __init__(self, mongodb_url: str, database_name: str, collection_name: str = "telegram_sessions"):
+        self._client = AsyncIOMotorClient(mongodb_url)
+        self._collection = self._client[database_name][collection_name]
+        self._index_ready = False
+
+    async def _ensure_index(self) -> None:
+        if not self._index_ready:
+            await self._collection.create_index("expires_at", expireAfterSeconds=0)
+            self._index_ready = True
+
+    async def get(self, user_id: int) -> Optional[Session]:
+        document = await self._collection.find_one({"_id": user_id})
+        if document is None:
+            return None
+        expires_at = document.get("expires_at")
+        return Session(
+            token=document["token"],
+            expires_at=expires_at.replace(tzinfo=timezone.utc).timestamp() if expires_at else None
+        )
+
+    async def set(self, user_id: int, session: Session) -> None:
+        await self._ensure_index()
+        expires_at = (
+            datetime.fromtimestamp(session.expires_at, tz=timezone.utc)
+            if session.expires_at is not None else None
+        )
+        await self._collection.replace_one(
+            {"_id": user_id},
+            {"_id": user_id, "token": session.token, "expires_at": expires_at},
+            upsert=True
+        )
+
+    async def delete(self, user_id: int) -> bool:
+        result = await self._collection.delete_one({"_id": user_id})
+        return result.deleted_count > 0
+
+    async def close(self) -> None:
+        self._client.close()
+
+class CachedSessionStore(SessionStore):
+    """
+    Caché local en memoria delante de un almacén compartido
+
+    Las sesiones encontradas se sirven de memoria durante `ttl` segundos; pasado
+    ese tiempo se vuelve a consultar el almacén, de modo que un logout hecho en
+    otro proceso se refleja como máximo tras `ttl` segundos. Las ausencias no se
+    guardan: un login hecho en otro proceso se ve en el siguiente mensaje.
+    """
+
+    def __init__(self, backend: SessionStore, ttl: float = 30.0, max_entries: int = 10000):
+        self.backend = backend
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # user_id -> (válido hasta, sesión)
+        self._cache: "OrderedDict[int, Tuple[float, Session]]" = OrderedDict()
+
+    def _remember(self, user_id: int, session: Session) -> None:
+        self._cache[user_id] = (time.monotonic() + self.ttl, session)
+        self._cache.move_to_end(user_id)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+    async def get(self, user_id: int) -> Optional[Session]:
+        cached = self._cache.get(user_id)
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[1]
+        session = await self.backend.get(user_id)
+        if session is None:
+            self._cache.pop(user_id, None)
+        else:
+            self._remember(user_id, session)
+        return session
+
+    async def set(self, user_id: int, session: Session) -> None:
+        await self.backend.set(user_id, session)
+        self._remember(user_id, session)
+
+    async def delete(self, user_id: int) -> bool:
+        self._cache.pop(user_id, None)
+        return await self.backend.delete(user_id)
+
+    async def close(self) -> None:
+        await self.backend.close()
+
+def create_session_store() -> SessionStore:
+    """
+    Crear el almacén configurado en TELEGRAM_SESSION_STORE
+
+    - memory (por defecto): solo el proceso actual
+    - sqlite: archivo TELEGRAM_SESSION_SQLITE_PATH
+    - mongo: colección telegram_sessions en MONGODB_URL / DATABASE_NAME
+    Los almacenes compartidos llevan caché local (TELEGRAM_SESSION_CACHE_TTL segundos)
+    """
+    kind = os.getenv("TELEGRAM_SESSION_STORE", "memory").strip().lower()
+    if kind == "memory":
+        return MemorySessionStore()
+    if kind == "sqlite":
+        backend = SQLiteSessionStore(os.getenv("TELEGRAM_SESSION_SQLITE_PATH", "telegram_sessions.db"))
+    elif kind == "mongo":
+        backend = MongoSessionStore(
+            os.getenv("MONGODB_URL", "mongodb://localhost:27017"),
+            os.getenv("DATABASE_NAME", "control_gastos")
+        )
+    else:
+        raise ValueError(f"TELEGRAM_SESSION_STORE no válido: {kind}")
+    return CachedSessionStore(backend, ttl=float(os.getenv("TELEGRAM_SESSION_CACHE_TTL", "30")))
@@ -0,0 +1,16 @@
+"""
+Configuración de pytest: los módulos del backend se importan desde backend/
+(igual que al correr uvicorn main:app desde esa carpeta)
+"""
+import os
+import sys
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+from odmantic import AIOEngine
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture
+def engine() -> AIOEngine:
+    """Base de datos en memoria (mongomock); no admite sesiones, así que usar las colecciones crudas"""
+    return AIOEngine(client=AsyncMongoMockClient(), database="control_gastos_test")
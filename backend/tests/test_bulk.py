@@ -0,0 +1,26 @@
+"""
+Pruebas de las altas masivas con y sin ordered
+"""
+from models.schemas import ExpenseCreate
+from services.bulk import INVALID, SKIPPED, validate_items
+
+ITEMS = [
+    {"description": "Café", "amount": 10, "payment_type": "efectivo", "category": "comida"},
+    {"description": "Sin monto", "payment_type": "efectivo", "category": "comida"},
+    {"description": "Taxi", "amount": 25, "payment_type": "efectivo", "category": "transporte"},
+]
+
+def _to_document(data):
+    return {"description": data.description, "amount": data.amount}
+
+def test_unordered_bulk_continues_after_invalid_item():
+    documents, results = validate_items(ExpenseCreate, ITEMS, _to_document)
+
+    assert [index for index, _ in documents] == [0, 2]
+    assert [(r["index"], r["status"]) for r in results] == [(1, INVALID)]
+
+def test_ordered_bulk_stops_at_first_invalid_item():
+    documents, results = validate_items(ExpenseCreate, ITEMS, _to_document, ordered=True)
+
+    assert [index for index, _ in documents] == [0]
+    assert [(r["index"], r["status"]) for r in results] == [(1, INVALID), (2, SKIPPED)]
@@ -0,0 +1,22 @@
+"""
+Pruebas de la normalización de importes de estados de cuenta
+"""
+import pytest
+from services.import_service import ImportRowError, _parse_number
+
+@pytest.mark.parametrize("value, expected", [
+    ("1.500,50", 1500.50),
+    ("1,500.50", 1500.50),
+    ("45,50", 45.50),
+    ("-120", -120.0),
+    ("$ 1,234", 1234.0),
+    ("(350.00)", -350.0),
+    ("+80", 80.0),
+])
+def test_parse_number_understands_both_decimal_separators(value, expected):
+    assert _parse_number(value) == pytest.approx(expected)
+
+@pytest.mark.parametrize("value", ["", "abc", "1,2,x", "--5"])
+def test_parse_number_rejects_invalid_amounts(value):
+    with pytest.raises(ImportRowError):
+        _parse_number(value)
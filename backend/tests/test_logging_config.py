@@ -0,0 +1,34 @@
+"""
+Pruebas del logging en cola: el formato (traza incluida) lo hace el hilo escritor
+"""
+import json
+import logging
+from core import logging_config
+from core.config import settings
+
+def test_exception_reaches_json_formatter(tmp_path, monkeypatch):
+    log_file = tmp_path / "app.log"
+    monkeypatch.setattr(settings, "log_format", "json")
+    monkeypatch.setattr(settings, "log_file", str(log_file))
+    root = logging.getLogger()
+    previous_handlers, previous_level = root.handlers, root.level
+
+    listener = logging_config.setup_logging()
+    try:
+        try:
+            raise ValueError("monto inválido")
+        except ValueError:
+            logging.getLogger("prueba").exception("Error importando %s", "estado.csv", extra={"rows": 3})
+    finally:
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+        root.handlers, root.level = previous_handlers, previous_level
+
+    lines = log_file.read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 1
+    entry = json.loads(lines[0])
+    assert entry["message"] == "Error importando estado.csv"
+    assert entry["rows"] == 3
+    assert "Traceback" in entry["exception"]
+    assert "ValueError: monto inválido" in entry["exception"]
@@ -0,0 +1,107 @@
+"""
+Pruebas de los acumulados con escrituras concurrentes a una reconstrucción
+"""
+import asyncio
+from datetime import datetime
+from odmantic import ObjectId
+from core.config import settings
+from models.models import Expense
+from services.rollup_service import RollupService
+from services.stats_service import StatsService
+
+def expense_document(user_id: ObjectId, amount: float) -> dict:
+    moment = datetime(2026, 1, 5)
+    return {
+        "_id": ObjectId(),
+        "user_id": user_id,
+        "date": moment,
+        "description": "Gasolina",
+        "amount": amount,
+        "payment_type": "efectivo",
+        "category": "Transporte",
+        "notes": None,
+        "created_at": moment,
+        "updated_at": moment
+    }
+
+async def seed(stats: StatsService, user_id: ObjectId, *amounts: float) -> list:
+    documents = [expense_document(user_id, amount) for amount in amounts]
+    await stats.db.get_collection(Expense).insert_many(documents)
+    await stats.rebuild_rollup(user_id)
+    return documents
+
+def test_rebuild_between_save_and_apply_counts_the_record_once(engine):
+    async def scenario():
+        stats = StatsService(engine)
+        user_id = ObjectId()
+        await seed(stats, user_id, 100)
+
+        document = expense_document(user_id, 25)
+        async with stats.rollups.pending(user_id) as rollup:
+            await engine.get_collection(Expense).insert_one(document)
+            # La reconstrucción empieza con el registro guardado pero sin su delta
+            rebuild = asyncio.create_task(stats.rebuild_rollup(user_id))
+            await asyncio.sleep(0.02)
+            await rollup.apply(RollupService.expense_delta(document))
+        await rebuild
+
+        assert await stats.verify_rollup(user_id) == []
+        assert (await stats.get_rollup(user_id))["total_expenses"] == 125
+
+    asyncio.run(scenario())
+
+def test_rebuild_between_delete_and_apply_subtracts_once(engine):
+    async def scenario():
+        stats = StatsService(engine)
+        user_id = ObjectId()
+        documents = await seed(stats, user_id, 100, 40)
+
+        async with stats.rollups.pending(user_id) as rollup:
+            await engine.get_collection(Expense).delete_one({"_id": documents[1]["_id"]})
+            rebuild = asyncio.create_task(stats.rebuild_rollup(user_id))
+            await asyncio.sleep(0.02)
+            await rollup.apply(RollupService.expense_delta(documents[1], -1))
+        await rebuild
+
+        assert await stats.verify_rollup(user_id) == []
+        assert (await stats.get_rollup(user_id))["total_expenses"] == 100
+
+    asyncio.run(scenario())
+
+def test_abandoned_write_is_rebuilt_instead_of_double_counted(engine, monkeypatch):
+    async def scenario():
+        stats = StatsService(engine)
+        user_id = ObjectId()
+        await seed(stats, user_id, 100)
+
+        # Con plazo 0 la reconstrucción descarta la escritura pendiente y no la espera
+        monkeypatch.setattr(settings, "rollup_pending_lease_seconds", 0)
+        document = expense_document(user_id, 25)
+        async with stats.rollups.pending(user_id) as rollup:
+            await engine.get_collection(Expense).insert_one(document)
+            await stats.rebuild_rollup(user_id)
+            await rollup.apply(RollupService.expense_delta(document))
+
+        assert not RollupService.is_complete(await stats.rollups.get(user_id))
+        assert (await stats.get_rollup(user_id))["total_expenses"] == 125
+        assert await stats.verify_rollup(user_id) == []
+
+    asyncio.run(scenario())
+
+def test_failed_write_marks_rollup_for_rebuild(engine):
+    async def scenario():
+        stats = StatsService(engine)
+        user_id = ObjectId()
+        await seed(stats, user_id, 100)
+
+        try:
+            async with stats.rollups.pending(user_id):
+                await engine.get_collection(Expense).insert_one(expense_document(user_id, 25))
+                raise RuntimeError("se perdió la respuesta de la base de datos")
+        except RuntimeError:
+            pass
+
+        assert (await stats.get_rollup(user_id))["total_expenses"] == 125
+        assert await stats.verify_rollup(user_id) == []
+
+    asyncio.run(scenario())
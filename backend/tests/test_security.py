@@ -0,0 +1,34 @@
+"""
+Pruebas del pool de hash de contraseñas
+"""
+import asyncio
+import time
+from core.security import PasswordHasher, pwd_context
+
+def test_single_hash_on_idle_pool_does_not_queue():
+    async def scenario():
+        hasher = PasswordHasher(max_workers=2)
+        try:
+            hashed = await hasher.run(pwd_context.hash, "secreta123")
+            assert await hasher.run(pwd_context.verify, "secreta123", hashed)
+            return hasher.stats()
+        finally:
+            hasher.shutdown()
+
+    stats = asyncio.run(scenario())
+    assert stats["max_queue_depth"] == 0
+    assert stats["queue_depth"] == 0
+    assert stats["completed"] == 2
+
+def test_queue_depth_counts_operations_waiting_for_a_thread():
+    async def scenario():
+        hasher = PasswordHasher(max_workers=1)
+        try:
+            await asyncio.gather(*(hasher.run(time.sleep, 0.05) for _ in range(3)))
+            return hasher.stats()
+        finally:
+            hasher.shutdown()
+
+    stats = asyncio.run(scenario())
+    assert stats["max_queue_depth"] == 2
+    assert stats["running"] == 0
@@ -0,0 +1,41 @@
+"""
+Pruebas del codificador de listados: debe producir lo mismo que cargar el
+documento con ODMantic y construir el esquema de respuesta con Pydantic
+"""
+from datetime import datetime
+import orjson
+import pytest
+from odmantic import ObjectId
+from models.models import Expense, Income, Saving
+from models.schemas import ExpenseResponse, IncomeResponse, SavingResponse
+from core.serialization import SchemaEncoder
+
+def sparse_document(**fields) -> dict:
+    """Documento con solo los campos obligatorios (p. ej. guardado antes de agregar los opcionales)"""
+    moment = datetime(2025, 11, 3, 14, 30)
+    return {
+        "_id": ObjectId(),
+        "user_id": ObjectId(),
+        "date": moment,
+        "amount": 125.5,
+        "created_at": moment,
+        "updated_at": moment,
+        **fields
+    }
+
+@pytest.mark.parametrize("model, schema, document", [
+    (Expense, ExpenseResponse, sparse_document(description="Gasolina", payment_type="efectivo")),
+    (Income, IncomeResponse, sparse_document(description="Sueldo")),
+    (Saving, SavingResponse, sparse_document(purpose="Vacaciones")),
+])
+def test_encoder_matches_pydantic_on_sparse_document(model, schema, document):
+    instance = model.model_validate_doc(document)
+    expected = schema.model_validate({
+        **instance.model_dump(),
+        "id": str(instance.id),
+        "user_id": str(instance.user_id)
+    }).model_dump(mode="json")
+
+    row = SchemaEncoder(schema, model).row(document)
+
+    assert orjson.loads(orjson.dumps(row)) == expected
@@ -0,0 +1,57 @@
+"""
+Pruebas del procesamiento concurrente de updates y del webhook del bot
+"""
+import asyncio
+import os
+from starlette.testclient import TestClient
+from telegram import Update
+from telegram_bot import PerChatUpdateProcessor, TelegramBot
+
+def make_update(update_id: int, chat_id: int) -> Update:
+    return Update.de_json({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": chat_id, "type": "private"},
+            "text": "hola"
+        }
+    }, None)
+
+def test_slow_chat_does_not_block_other_chats():
+    async def scenario():
+        processor = PerChatUpdateProcessor(2)
+        release = asyncio.Event()
+        processed = []
+
+        async def handle(update: Update):
+            if update.effective_chat.id == 1:
+                await release.wait()
+            processed.append(update.update_id)
+
+        # El chat 1 envía más updates que el límite de concurrencia
+        slow = [
+            asyncio.create_task(processor.process_update(update, handle(update)))
+            for update in (make_update(i, chat_id=1) for i in range(1, 6))
+        ]
+        await asyncio.sleep(0)
+        other = make_update(100, chat_id=2)
+        await asyncio.wait_for(processor.process_update(other, handle(other)), timeout=1)
+        assert processed == [100]
+
+        release.set()
+        await asyncio.gather(*slow)
+        assert processed == [100, 1, 2, 3, 4, 5]
+
+    asyncio.run(scenario())
+
+def test_webhook_rejects_malformed_body(monkeypatch):
+    monkeypatch.setenv("TELEGRAM_BOT_TOKEN", "123:abc")
+    monkeypatch.setenv("TELEGRAM_SESSION_STORE", "memory")
+    monkeypatch.delenv("TELEGRAM_WEBHOOK_SECRET", raising=False)
+    app = TelegramBot().create_webhook_app()
+
+    # Sin `with` no se ejecuta el lifespan (no se contacta a Telegram)
+    client = TestClient(app)
+    assert client.post("/telegram", content=b"{no es json").status_code == 400
+    assert client.post("/telegram", json=[1, 2]).status_code == 400
@@ -0,0 +1,21 @@
+"""
+Pruebas de la caché local delante de un almacén de sesiones compartido
+"""
+import asyncio
+from telegram_sessions import CachedSessionStore, Session, SQLiteSessionStore
+
+def test_login_in_another_process_is_seen_immediately(tmp_path):
+    async def scenario():
+        path = str(tmp_path / "sessions.db")
+        bot_a = CachedSessionStore(SQLiteSessionStore(path), ttl=30)
+        bot_b = CachedSessionStore(SQLiteSessionStore(path), ttl=30)
+        try:
+            assert await bot_a.get(42) is None
+            await bot_b.set(42, Session(token="token-42"))
+            session = await bot_a.get(42)
+            assert session is not None and session.token == "token-42"
+        finally:
+            await bot_a.close()
+            await bot_b.close()
+
+    asyncio.run(scenario())
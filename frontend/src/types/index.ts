@@ -132,12 +132,15 @@ export interface Summary {
 export interface MonthlyReport {
   year: number;
   month: number;
-  total_expenses: number;
-  total_incomes: number;
-  total_savings: number;
-  balance: number;
+  // null cuando no se pudieron calcular (ver partial / failed_sections)
+  total_expenses: number | null;
+  total_incomes: number | null;
+  total_savings: number | null;
+  balance: number | null;
   expenses_by_category: Record<string, number>;
   expenses_by_payment_type: Record<string, number>;
+  partial: boolean;
+  failed_sections: string[];
 }
 
 // Tipos de paginación
@@ -2,8 +2,9 @@
 MCP Server para Control de Gastos
 Servidor de Model Context Protocol para gestión de finanzas personales
 """
+from contextlib import asynccontextmanager
 from fastmcp import FastMCP
-from typing import Optional
+from typing import AsyncIterator, Optional
 from datetime import datetime, timezone
 from zoneinfo import ZoneInfo
 
@@ -16,14 +17,24 @@ from utils import (
     format_date,
     parse_transaction_type,
     is_recurring,
-    extract_purpose
+    extract_purpose,
+    parse_transactions,
+    submit_transactions
 )
 
 # Zona horaria por defecto (México)
 DEFAULT_TIMEZONE = ZoneInfo("America/Mexico_City")
 
+@asynccontextmanager
+async def lifespan(server: FastMCP) -> AsyncIterator[None]:
+    """Cerrar el cliente HTTP compartido al apagar el servidor"""
+    try:
+        yield
+    finally:
+        await APIClient.aclose()
+
 # Inicializar MCP server
-mcp = FastMCP("Control de Gastos")
+mcp = FastMCP("Control de Gastos", lifespan=lifespan)
 
 # Cliente API
 api = APIClient()
@@ -108,7 +119,7 @@ async def listar_gastos(limite: int = 10) -> str:
         Lista formateada de gastos recientes
     """
     try:
-        expenses = await api.get_expenses(limit=limite)
+        expenses = await api.get_expenses(limit=limite, fields="amount,description,payment_type,category")
         
         if not expenses:
             return "📋 No tienes gastos registrados aún."
@@ -210,7 +221,7 @@ async def listar_ingresos(limite: int = 10) -> str:
         Lista formateada de ingresos recientes
     """
     try:
-        incomes = await api.get_incomes(limit=limite)
+        incomes = await api.get_incomes(limit=limite, fields="amount,description,source,is_recurring")
         
         if not incomes:
             return "📋 No tienes ingresos registrados aún."
@@ -310,7 +321,7 @@ async def listar_ahorros(limite: int = 10) -> str:
         Lista formateada de movimientos de ahorro recientes
     """
     try:
-        savings = await api.get_savings(limit=limite)
+        savings = await api.get_savings(limit=limite, fields="amount,transaction_type,purpose")
         
         if not savings:
             return "📋 No tienes ahorros registrados aún."
@@ -338,6 +349,43 @@ async def listar_ahorros(limite: int = 10) -> str:
     except Exception as e:
         return f"❌ Error al listar ahorros: {str(e)}"
 
+# === HERRAMIENTAS PARA LOTES ===
+
+@mcp.tool()
+async def registrar_lote(mensaje: str) -> str:
+    """
+    Registrar varios gastos, ingresos y ahorros a la vez, uno por línea.
+    
+    Ejemplo de mensaje:
+        gasté $200 en gasolina
+        compré comida por 150 con tarjeta de débito
+        recibí 15 mil de sueldo
+        ahorra 1k para vacaciones
+    
+    Cada tipo de movimiento se envía al backend en una sola petición masiva.
+    Las líneas sin monto o que no son movimientos se reportan sin registrarse.
+    
+    Args:
+        mensaje: Texto con un movimiento por línea
+    
+    Returns:
+        Resumen de los movimientos registrados y de las líneas con error
+    """
+    try:
+        transactions = parse_transactions(mensaje)
+        if not transactions:
+            return "❌ El mensaje no contiene movimientos"
+        
+        # Misma fecha/hora local para todo el lote
+        date_str = datetime.now(DEFAULT_TIMEZONE).isoformat()
+        for transaction in transactions:
+            if transaction.error is None:
+                transaction.payload["date"] = date_str
+        
+        return await submit_transactions(api, transactions)
+    except Exception as e:
+        return f"❌ Error al registrar el lote: {str(e)}"
+
 # === HERRAMIENTAS DE CONSULTA ===
 
 @mcp.tool()
@@ -408,27 +456,45 @@ async def reporte_mensual(año: Optional[int] = None, mes: Optional[int] = None)
         año = año or now.year
         mes = mes or now.month
         
-        report = await api.get_monthly_report(año, mes)
+        # Solo se usan totales y conteos: no traer la lista de movimientos
+        report = await api.get_monthly_report(año, mes, include="totals,stats")
+        stats = report.get("stats", {})
         
         month_names = [
             "Enero", "Febrero", "Marzo", "Abril", "Mayo", "Junio",
             "Julio", "Agosto", "Septiembre", "Octubre", "Noviembre", "Diciembre"
         ]
         
-        balance_icon = "✅" if report['balance'] >= 0 else "⚠️"
+        # En un reporte parcial los valores que no se pudieron calcular llegan en null
+        def money(value: Optional[float]) -> str:
+            return format_currency(value) if value is not None else "no disponible"
+        
+        def count(value: Optional[int]) -> str:
+            return str(value) if value is not None else "?"
+        
+        balance = report.get('balance')
+        balance_icon = "✅" if balance is not None and balance >= 0 else "⚠️"
+        
+        warning = ""
+        if report.get("partial"):
+            sections = ", ".join(report.get("failed_sections", [])) or "algunas secciones"
+            warning = (
+                f"\n⚠️ Reporte incompleto: no se pudo obtener {sections}. "
+                "Los valores no disponibles no son cero; intenta de nuevo en unos momentos.\n"
+            )
         
         return f"""📅 REPORTE DE {month_names[mes-1].upper()} {año}
+{warning}
+{balance_icon} Balance del mes: {money(balance)}
 
-{balance_icon} Balance del mes: {format_currency(report['balance'])}
-
-💵 Ingresos: {format_currency(report['total_incomes'])}
-💸 Gastos: {format_currency(report['total_expenses'])}
-💰 Ahorros: {format_currency(report['total_savings'])}
+💵 Ingresos: {money(report.get('total_incomes'))}
+💸 Gastos: {money(report.get('total_expenses'))}
+💰 Ahorros: {money(report.get('total_savings'))}
 
 📊 Total de movimientos:
-   • {len(report.get('incomes', []))} ingresos
-   • {len(report.get('expenses', []))} gastos
-   • {len(report.get('savings', []))} movimientos de ahorro
+   • {count(stats.get('incomes_count', 0))} ingresos
+   • {count(stats.get('expenses_count', 0))} gastos
+   • {count(stats.get('savings_count', 0))} movimientos de ahorro
 """
         
     except Exception as e:
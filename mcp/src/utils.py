@@ -1,65 +1,229 @@
 """
 Utilidades para procesamiento de lenguaje natural y formateo
 """
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
 import re
 
+# Montos en texto libre: "$200", "1,500.50", "1.500,50 MXN", "2k", "3 mil pesos", "USD 40"
+_AMOUNT_PATTERN = re.compile(
+    r"""
+    (?<![\w.,])
+    (?P<prefix>(?:us\$|usd|mxn|\$)\s*)?
+    (?P<number>\d{1,3}(?:[.,]\d{3})+(?:[.,]\d{1,2})?|\d+(?:[.,]\d+)?)
+    (?![\d])
+    (?:\s*(?P<multiplier>k|mil)(?![a-záéíóúñ]))?
+    (?:\s*(?P<suffix>mxn|usd|pesos?|d[óo]lares|dlls?)(?![a-záéíóúñ]))?
+    """,
+    re.IGNORECASE | re.VERBOSE
+)
+_MULTIPLIERS = {"k": 1000, "mil": 1000}
+_USD_MARKERS = ("us$", "usd", "dólares", "dolares", "dll", "dlls")
+
+@dataclass(frozen=True)
+class Amount:
+    """Monto encontrado en un texto"""
+    value: float
+    currency: Optional[str]  # "MXN", "USD" o None si el texto no lo indica
+    text: str  # Fragmento original, para quitarlo de la descripción
+
+def to_number(number: str) -> float:
+    """
+    Convertir un número con separadores a float: el último separador es decimal
+    salvo que le sigan exactamente tres dígitos ("1,500" y "1.500" son mil
+    quinientos; "1.500,50" y "1,500.50" son mil quinientos con cincuenta)
+    """
+    last = max(number.rfind("."), number.rfind(","))
+    if last == -1:
+        return float(number)
+    integer, decimals = number[:last], number[last + 1:]
+    integer = integer.replace(".", "").replace(",", "")
+    if len(decimals) == 3 and (integer or number.count(number[last]) > 1):
+        return float(integer + decimals)
+    return float(f"{integer or '0'}.{decimals}")
+
+def find_amount(text: str) -> Optional[Amount]:
+    """
+    Buscar el monto en un texto en una sola pasada
+
+    Se prefiere el primer número con marca de moneda ($, MXN, USD, pesos,
+    dólares); si ninguno la tiene, el primer número del texto
+    """
+    first: Optional[Amount] = None
+    for match in _AMOUNT_PATTERN.finditer(text):
+        prefix = (match.group("prefix") or "").strip().lower()
+        suffix = (match.group("suffix") or "").lower()
+        value = to_number(match.group("number"))
+        multiplier = match.group("multiplier")
+        if multiplier:
+            value *= _MULTIPLIERS[multiplier.lower()]
+        currency = None
+        if prefix or suffix:
+            currency = "USD" if prefix in _USD_MARKERS or suffix in _USD_MARKERS else "MXN"
+        amount = Amount(value=value, currency=currency, text=match.group(0).strip())
+        if currency:
+            return amount
+        if first is None:
+            first = amount
+    return first
+
 def parse_amount(text: str) -> Optional[float]:
     """
     Extraer monto de un texto
-    Ejemplos: "$500", "500 pesos", "1,500.50"
+    Ejemplos: "$500", "500 pesos", "1,500.50", "1.500,50", "2k", "3 mil", "Gasté $200 en gasolina"
     """
-    # Remover caracteres no numéricos excepto puntos y comas
-    text = text.replace("$", "").replace("pesos", "").replace("MXN", "")
-    text = text.replace(",", "").strip()
-    
-    try:
-        return float(text)
-    except:
-        return None
+    amount = find_amount(text)
+    return amount.value if amount else None
+
+# Palabras clave por dimensión, en orden de prioridad: si el texto contiene
+# palabras de varias etiquetas gana la primera de la lista
+INTENT_KEYWORDS: List[Tuple[str, List[str]]] = [
+    ("gasto", ["gast", "compré", "pagué", "compr"]),
+    ("ingreso", ["ingreso", "recib", "cobr", "salario", "sueldo"]),
+    ("ahorro", ["ahorro", "ahorra", "deposita", "retira", "retiro"]),
+    ("resumen", ["balance", "finanzas", "resumen", "cómo van"]),
+    ("listar_gastos", ["últimos gastos", "gastos recientes", "mis gastos"]),
+]
+
+PAYMENT_TYPE_KEYWORDS: List[Tuple[str, List[str]]] = [
+    ("efectivo", ["efectivo", "cash", "dinero"]),
+    ("tarjeta_debito", ["débito", "debito", "tarjeta de débito"]),
+    ("tarjeta_credito", ["crédito", "credito", "tarjeta de crédito", "tc"]),
+    ("transferencia", ["transferencia", "transfer"]),
+    ("paypal", ["paypal"]),
+]
+
+CATEGORY_KEYWORDS: List[Tuple[str, List[str]]] = [
+    ("Alimentación", ["comida", "restaurante", "super", "supermercado", "mercado", "despensa", "comestibles"]),
+    ("Transporte", ["gasolina", "uber", "taxi", "transporte", "metro", "bus", "camión"]),
+    ("Entretenimiento", ["cine", "teatro", "concierto", "diversión", "salida", "fiesta"]),
+    ("Salud", ["doctor", "medicina", "farmacia", "hospital", "consulta", "médico"]),
+    ("Servicios", ["luz", "agua", "internet", "teléfono", "celular", "netflix", "spotify"]),
+    ("Educación", ["curso", "libro", "escuela", "universidad", "capacitación"]),
+    ("Ropa", ["ropa", "zapatos", "vestuario", "calzado"]),
+    ("Hogar", ["muebles", "decoración", "reparación", "mantenimiento"]),
+]
+
+TRANSACTION_TYPE_KEYWORDS: List[Tuple[str, List[str]]] = [
+    ("retiro", ["retiro", "retirar", "sacar", "emergencia"]),
+]
+
+RECURRING_KEYWORDS: List[Tuple[str, List[str]]] = [
+    ("recurrente", ["mensual", "recurrente", "sueldo", "salario", "nómina", "nomina"]),
+]
+
+def _trie_pattern(keywords: List[str]) -> str:
+    """
+    Alternancia de regex factorizada como trie (com(?:ida|pr(?:é)?)...): en cada
+    posición solo se prueban las ramas que empiezan con el carácter actual y el
+    cuantificador codicioso devuelve la palabra más larga
+    """
+    trie: Dict[str, dict] = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: Dict[str, dict]) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if "" in node:
+            return f"(?:{body})?"
+        return body
+
+    return build(trie)
+
+class KeywordMatcher:
+    """
+    Buscador de palabras clave compilado una sola vez
+
+    Todas las palabras van en una alternancia en forma de trie dentro de un
+    lookahead, de modo que una sola pasada de la regex encuentra cada palabra
+    contenida en el texto (también las que se traslapan), igual que
+    `palabra in texto`. En cada posición la regex toma la palabra más larga; las
+    palabras que son prefijo de ella también coinciden ahí y se agregan al compilar.
+    """
+
+    def __init__(self, dimensions: Dict[str, List[Tuple[str, List[str]]]]):
+        # palabra -> [(dimensión, prioridad, etiqueta)]
+        hits: Dict[str, List[Tuple[str, int, str]]] = {}
+        for dimension, labels in dimensions.items():
+            for priority, (label, keywords) in enumerate(labels):
+                for keyword in keywords:
+                    hits.setdefault(keyword, []).append((dimension, priority, label))
+        self._hits = {
+            keyword: [hit for other in hits if keyword.startswith(other) for hit in hits[other]]
+            for keyword in hits
+        }
+        self._pattern = re.compile(f"(?=({_trie_pattern(list(hits))}))")
+
+    def match(self, text: str) -> Dict[str, str]:
+        """Etiqueta de mayor prioridad encontrada en el texto, por dimensión"""
+        best: Dict[str, Tuple[int, str]] = {}
+        for keyword in set(self._pattern.findall(text.lower())):
+            for dimension, priority, label in self._hits[keyword]:
+                current = best.get(dimension)
+                if current is None or priority < current[0]:
+                    best[dimension] = (priority, label)
+        return {dimension: label for dimension, (_, label) in best.items()}
+
+_KEYWORDS = {
+    "intent": INTENT_KEYWORDS,
+    "payment_type": PAYMENT_TYPE_KEYWORDS,
+    "category": CATEGORY_KEYWORDS,
+    "transaction_type": TRANSACTION_TYPE_KEYWORDS,
+    "recurring": RECURRING_KEYWORDS,
+}
+_MATCHER = KeywordMatcher(_KEYWORDS)
+_DIMENSION_MATCHERS = {dimension: KeywordMatcher({dimension: labels}) for dimension, labels in _KEYWORDS.items()}
+
+@dataclass(frozen=True)
+class MessageClassification:
+    """Resultado de clasificar un mensaje en lenguaje natural"""
+    intent: Optional[str]
+    category: Optional[str]
+    payment_type: str
+    transaction_type: str
+    is_recurring: bool
+    amount: Optional[float]
+    currency: Optional[str]
+    amount_text: Optional[str]  # Fragmento del monto tal como aparece en el texto
+
+def classify_message(text: str) -> MessageClassification:
+    """
+    Clasificar un mensaje en una sola pasada: intención (gasto, ingreso, ahorro,
+    resumen, listar_gastos), categoría, tipo de pago, tipo de movimiento de
+    ahorro, recurrencia y monto
+    """
+    found = _MATCHER.match(text)
+    amount = find_amount(text)
+    return MessageClassification(
+        intent=found.get("intent"),
+        category=found.get("category"),
+        payment_type=found.get("payment_type", "efectivo"),
+        transaction_type=found.get("transaction_type", "deposito"),
+        is_recurring="recurring" in found,
+        amount=amount.value if amount else None,
+        currency=amount.currency if amount else None,
+        amount_text=amount.text if amount else None
+    )
 
 def infer_payment_type(text: str) -> str:
     """
     Inferir tipo de pago del texto
     """
-    text_lower = text.lower()
-    
-    if any(word in text_lower for word in ["efectivo", "cash", "dinero"]):
-        return "efectivo"
-    elif any(word in text_lower for word in ["débito", "debito", "tarjeta de débito"]):
-        return "tarjeta_debito"
-    elif any(word in text_lower for word in ["crédito", "credito", "tarjeta de crédito", "tc"]):
-        return "tarjeta_credito"
-    elif any(word in text_lower for word in ["transferencia", "transfer"]):
-        return "transferencia"
-    elif any(word in text_lower for word in ["paypal"]):
-        return "paypal"
-    else:
-        return "efectivo"  # Por defecto
+    return _DIMENSION_MATCHERS["payment_type"].match(text).get("payment_type", "efectivo")  # Por defecto efectivo
 
 def infer_category(text: str) -> Optional[str]:
     """
     Inferir categoría de gasto del texto
     """
-    text_lower = text.lower()
-    
-    categories = {
-        "Alimentación": ["comida", "restaurante", "super", "supermercado", "mercado", "despensa", "comestibles"],
-        "Transporte": ["gasolina", "uber", "taxi", "transporte", "metro", "bus", "camión"],
-        "Entretenimiento": ["cine", "teatro", "concierto", "diversión", "salida", "fiesta"],
-        "Salud": ["doctor", "medicina", "farmacia", "hospital", "consulta", "médico"],
-        "Servicios": ["luz", "agua", "internet", "teléfono", "celular", "netflix", "spotify"],
-        "Educación": ["curso", "libro", "escuela", "universidad", "capacitación"],
-        "Ropa": ["ropa", "zapatos", "vestuario", "calzado"],
-        "Hogar": ["muebles", "decoración", "reparación", "mantenimiento"],
-    }
-    
-    for category, keywords in categories.items():
-        if any(keyword in text_lower for keyword in keywords):
-            return category
-    
-    return None
+    return _DIMENSION_MATCHERS["category"].match(text).get("category")
 
 def format_currency(amount: float) -> str:
     """Formatear monto como moneda mexicana"""
@@ -77,19 +241,13 @@ def parse_transaction_type(text: str) -> str:
     """
     Determinar si es depósito o retiro
     """
-    text_lower = text.lower()
-    
-    if any(word in text_lower for word in ["retiro", "retirar", "sacar", "emergencia"]):
-        return "retiro"
-    else:
-        return "deposito"
+    return _DIMENSION_MATCHERS["transaction_type"].match(text).get("transaction_type", "deposito")
 
 def is_recurring(text: str) -> bool:
     """
     Determinar si un ingreso es recurrente
     """
-    text_lower = text.lower()
-    return any(word in text_lower for word in ["mensual", "recurrente", "sueldo", "salario", "nómina", "nomina"])
+    return "recurring" in _DIMENSION_MATCHERS["recurring"].match(text)
 
 def extract_purpose(text: str) -> str:
     """
@@ -112,3 +270,127 @@ def extract_purpose(text: str) -> str:
             return purpose.capitalize()
     
     return "Ahorro general"
+
+# === LOTES DE MOVIMIENTOS ===
+
+# Intención de cada línea -> endpoint del backend
+BATCH_ENDPOINTS = {"gasto": "/expenses", "ingreso": "/incomes", "ahorro": "/savings"}
+BATCH_MAX_LINES = 500
+
+_LIST_MARKER = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s+")
+_DESCRIPTION_VERBS = re.compile(
+    r"\b(?:gasté|gaste|compré|compre|pagué|pague|recibí|recibi|cobré|cobre|ingreso de|ingreso"
+    r"|ahorra|ahorro|deposita|retira|retiro)\b",
+    re.IGNORECASE
+)
+_LEADING_CONNECTORS = re.compile(r"^(?:(?:en|de|del|por|con)\s+)+", re.IGNORECASE)
+
+@dataclass
+class ParsedTransaction:
+    """Línea de un lote ya interpretada"""
+    line: int
+    text: str
+    kind: Optional[str] = None  # gasto, ingreso o ahorro
+    payload: Dict[str, Any] = field(default_factory=dict)  # Cuerpo para el endpoint del backend
+    error: Optional[str] = None
+
+def _clean_description(text: str, amount_text: Optional[str]) -> str:
+    """Quitar el monto, el verbo y los conectores iniciales de una línea"""
+    if amount_text:
+        # También el conector que precede al monto ("comida por $150 con tarjeta")
+        text = re.sub(
+            r"(?:\b(?:por|de|en)\s+)?" + re.escape(amount_text), " ", text, count=1, flags=re.IGNORECASE
+        )
+    text = " ".join(_DESCRIPTION_VERBS.sub(" ", text).split())
+    text = _LEADING_CONNECTORS.sub("", text).strip(" ,.;:-")
+    return text[:1].upper() + text[1:]
+
+def parse_transactions(text: str) -> List[ParsedTransaction]:
+    """
+    Interpretar un mensaje de varias líneas, un movimiento por línea
+    Ejemplo: "gasté 200 en gasolina\nrecibí 15 mil de sueldo\nahorra 1k para vacaciones"
+
+    Las líneas sin intención reconocible pero con monto se toman como gastos.
+    Las que no se pueden registrar llevan `error` y no se envían al backend.
+    """
+    transactions = []
+    for number, raw_line in enumerate(text.splitlines(), start=1):
+        line = _LIST_MARKER.sub("", raw_line).strip()
+        if not line:
+            continue
+        transaction = ParsedTransaction(line=number, text=line)
+        transactions.append(transaction)
+        if len(transactions) > BATCH_MAX_LINES:
+            transaction.error = f"Se admiten hasta {BATCH_MAX_LINES} movimientos por lote"
+            continue
+        
+        parsed = classify_message(line)
+        kind = parsed.intent or "gasto"
+        if kind not in BATCH_ENDPOINTS:
+            transaction.error = "No es un gasto, ingreso o ahorro"
+            continue
+        if not parsed.amount:
+            transaction.error = "No se detectó el monto"
+            continue
+        
+        transaction.kind = kind
+        description = _clean_description(line, parsed.amount_text)
+        if kind == "gasto":
+            transaction.payload = {
+                "description": description or "Gasto",
+                "amount": parsed.amount,
+                "payment_type": parsed.payment_type,
+                "category": parsed.category
+            }
+        elif kind == "ingreso":
+            transaction.payload = {
+                "description": description or "Ingreso",
+                "amount": parsed.amount,
+                "is_recurring": parsed.is_recurring
+            }
+        else:
+            purpose = extract_purpose(line.replace(parsed.amount_text or "", " "))
+            if purpose == "Ahorro general":
+                # Sin "para ...": el resto de la línea ("retira $300 de emergencias")
+                purpose = description or purpose
+            transaction.payload = {
+                "amount": parsed.amount,
+                "purpose": purpose,
+                "transaction_type": parsed.transaction_type
+            }
+    return transactions
+
+async def submit_transactions(api: Any, transactions: List[ParsedTransaction]) -> str:
+    """
+    Registrar un lote con una sola petición bulk por tipo de movimiento (en paralelo)
+    y retornar el resumen por línea
+    """
+    groups: Dict[str, List[ParsedTransaction]] = {}
+    for transaction in transactions:
+        if transaction.error is None:
+            groups.setdefault(transaction.kind, []).append(transaction)
+    
+    responses = await asyncio.gather(
+        *(api.create_bulk(BATCH_ENDPOINTS[kind], [t.payload for t in items]) for kind, items in groups.items()),
+        return_exceptions=True
+    )
+    for (kind, items), response in zip(groups.items(), responses):
+        if isinstance(response, BaseException):
+            for transaction in items:
+                transaction.error = f"Error del servidor: {response}"
+            continue
+        for result in response["results"]:
+            if result["status"] != "created":
+                items[result["index"]].error = result.get("error") or "No se registró"
+    
+    created = [t for t in transactions if t.error is None]
+    output = f"📦 **Lote registrado: {len(created)} de {len(transactions)} movimientos**\n\n"
+    icons = {"gasto": "💸", "ingreso": "💵", "ahorro": "💰"}
+    for transaction in transactions:
+        if transaction.error:
+            output += f"❌ Línea {transaction.line}: {transaction.text} ({transaction.error})\n"
+            continue
+        payload = transaction.payload
+        label = payload.get("description") or payload.get("purpose")
+        output += f"{icons[transaction.kind]} {format_currency(payload['amount'])} - {label}\n"
+    return output